@@ -0,0 +1,197 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+from config import get_bool, get_float, get_int
+from fastapi import Request
+from metrics import registry
+
+ADMISSION_ENABLED = get_bool("admission", "enabled", True)
+RETRY_AFTER = get_int("admission", "retry_after", 1)
+
+ADMISSION_SHED = registry.counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control."
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot."
+)
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "admission_in_flight", "Requests holding an admission slot."
+)
+
+
+class Overloaded(Exception):
+    """
+    Запрос отклонён ограничителем: очередь заполнена или ожидание истекло.
+
+    Атрибуты:
+        reason (str): "queue_full" или "timeout"
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Limiter:
+    """
+    Ограничитель числа одновременно обрабатываемых запросов с очередью.
+
+    Не больше concurrency запросов выполняются одновременно, ещё не больше
+    queue_size ждут освобождения места в порядке поступления. Если очередь
+    заполнена, запрос отклоняется сразу, если место не освободилось за
+    queue_timeout секунд - по истечении ожидания.
+
+    Атрибуты:
+        concurrency (int): Количество одновременно выполняемых запросов
+        queue_size (int): Длина очереди ожидания
+        queue_timeout (float): Максимальное время ожидания в очереди
+        active (int): Сколько запросов выполняется сейчас
+    """
+
+    def __init__(self, concurrency: int, queue_size: int, queue_timeout: float) -> None:
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        """
+        Количество запросов в очереди ожидания.
+        """
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        Занимает место, при необходимости дожидаясь его в очереди.
+
+        Raises:
+            Overloaded: Если очередь заполнена или ожидание истекло
+        """
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise Overloaded("queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                raise Overloaded("timeout")
+        except BaseException:
+            # Отмена запроса (клиент отключился): место, переданное
+            # ожидающему одновременно с отменой, возвращается
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter.cancelled():
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        """
+        Освобождает место, передавая его первому ожидающему запросу.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionControl:
+    """
+    Ограничители запросов по маршрутам с отдельными бюджетами чтения и записи.
+
+    Каждый маршрут получает собственный Limiter с параметрами своего класса
+    из секции [admission] (read_* или write_*), поэтому всплеск медленных
+    запросов одного эндпоинта не отнимает места у остальных, а запись
+    (пул из одного соединения) не конкурирует с чтением.
+    """
+
+    def __init__(self) -> None:
+        self._budgets: Dict[str, Tuple[int, int, float]] = {
+            kind: (
+                get_int("admission", f"{kind}_concurrency", default_concurrency),
+                get_int("admission", f"{kind}_queue", default_queue),
+                get_float("admission", "queue_timeout", 2.0),
+            )
+            for kind, default_concurrency, default_queue in (
+                ("read", 16, 64),
+                ("write", 2, 16),
+            )
+        }
+        self.limiters: Dict[Tuple[str, str], Limiter] = {}
+
+    def limiter(self, kind: str, route: str) -> Limiter:
+        """
+        Возвращает ограничитель маршрута, создавая его при первом запросе.
+
+        Args:
+            kind (str): "read" или "write"
+            route (str): Шаблон пути маршрута (например, /recipes/{recipe_id})
+        """
+        limiter = self.limiters.get((kind, route))
+        if limiter is None:
+            limiter = self.limiters[kind, route] = Limiter(*self._budgets[kind])
+        return limiter
+
+    @asynccontextmanager
+    async def admit(self, kind: str, route: str) -> AsyncIterator[None]:
+        """
+        Выполняет блок, заняв место в ограничителе маршрута.
+
+        Raises:
+            Overloaded: Если запрос отклонён (учитывается в admission_shed_total)
+        """
+        limiter = self.limiter(kind, route)
+        try:
+            await limiter.acquire()
+        except Overloaded as exc:
+            ADMISSION_SHED.inc(kind=kind, route=route, reason=exc.reason)
+            raise
+        try:
+            yield
+        finally:
+            limiter.release()
+
+
+admission = AdmissionControl()
+
+
+@registry.add_collector
+def collect_admission_stats() -> None:
+    for (kind, route), limiter in admission.limiters.items():
+        ADMISSION_QUEUE_DEPTH.set(limiter.waiting, kind=kind, route=route)
+        ADMISSION_IN_FLIGHT.set(limiter.active, kind=kind, route=route)
+
+
+async def admit_read(request: Request) -> AsyncIterator[None]:
+    """
+    FastAPI-зависимость: допуск запроса чтения по бюджету read_*.
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    async with admission.admit("read", request.scope["route"].path):
+        yield
+
+
+async def admit_write(request: Request) -> AsyncIterator[None]:
+    """
+    FastAPI-зависимость: допуск запроса записи по бюджету write_*.
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    async with admission.admit("write", request.scope["route"].path):
+        yield
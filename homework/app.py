@@ -1,34 +1,285 @@
-from typing import Annotated, Any, Dict, List, Sequence, Set, Union
+import asyncio
+import csv
+import io
+import json
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import schemas
-from database import engine, session
-from fastapi import FastAPI, Path, Response, status
+from admission import RETRY_AFTER, Overloaded, admit_read, admit_write
+from autocomplete import MAX_SUGGESTIONS, ingredient_autocomplete
+from cache import recipe_cache
+from change_feed import change_feed
+from compression import CompressionMiddleware
+from conditional import (
+    LIST_MAX_AGE,
+    RECIPE_MAX_AGE,
+    cache_headers,
+    is_not_modified,
+    not_modified,
+)
+from config import get_bool, get_int
+from database import (
+    ReadSessionDep,
+    SessionDep,
+    engine,
+    read_session,
+    reader_engine,
+    startup_lock,
+)
+from fastapi import Depends, FastAPI, Path, Query, Request, Response, status
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fill_db import populate_db
-from models import Base, Ingredient, Recipe
-from sqlalchemy import desc
+from ingredient_dictionary import ingredient_dictionary
+from ingredient_index import ingredient_index
+from leaderboard import leaderboard
+from metrics import MetricsMiddleware, instrument_engine, registry
+from migrations import migrate
+from models import Recipe, RecipeIngredient
+from profiling import (
+    PROFILING_ENABLED,
+    ProfilingMiddleware,
+    capture_sql,
+    request_profiler,
+)
+from pydantic import ValidationError
+from search import search_recipes
+from similarity import rank_by_jaccard, similar_recipes
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.future import select
 from utils import (
+    RecipeCursor,
     add_ingredients,
     add_recipe_ingredients,
-    get_ingredients_list,
-    increase_view_count,
+    decode_cursor,
+    dump_json,
+    encode_cursor,
+    get_recipe_with_ingredients,
+    get_recipes_with_ingredients,
+    import_recipes,
+    iter_lines,
+    recipe_detail_json,
+    recipe_page_json,
+    recipes_page_query,
+    stream_recipes,
+)
+from view_counter import view_counter
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+IMPORT_BATCH_SIZE = get_int("import", "batch_size", 500)
+MAX_IMPORT_BATCH_SIZE = get_int("import", "max_batch_size", 5000)
+MAX_IMPORT_LINE_BYTES = get_int("import", "max_line_bytes", 1048576)
+MAX_REPORTED_IMPORT_ERRORS = get_int("import", "max_reported_errors", 100)
+
+EXPORT_BATCH_SIZE = get_int("export", "batch_size", 1000)
+EXPORT_CSV_COLUMNS = (
+    "id",
+    "title",
+    "cooking_time",
+    "views",
+    "description",
+    "list_of_ingredients",
 )
 
+SEED_DATABASE = get_bool("app", "seed", False)
+
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(CompressionMiddleware)
+warm_up_tasks: Set[asyncio.Task] = set()
+
+instrument_engine(engine, "writer")
+if reader_engine is not engine:
+    instrument_engine(reader_engine, "reader")
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+    capture_sql(engine)
+    if reader_engine is not engine:
+        capture_sql(reader_engine)
+
+RECIPE_CACHE = registry.gauge("recipe_cache", "Recipe response cache counters.")
+
+
+@registry.add_collector
+def collect_cache_stats() -> None:
+    for stat, value in recipe_cache.stats().items():
+        RECIPE_CACHE.set(value, stat=stat)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded) -> JSONResponse:
+    """
+    Отвечает 503 с Retry-After на запрос, отклонённый admission control.
+
+    Notes:
+        - Ограничители маршрутов подключены зависимостями admit_read
+          и admit_write (см. admission.py); лучше быстро отказать части
+          запросов, чем довести до таймаута все
+    """
+    return JSONResponse(
+        {"error": "Server is overloaded, retry later"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(RETRY_AFTER)},
+    )
+
+
+LIST_PAGES = registry.counter(
+    "recipe_list_pages_total", "GET /recipes/ pages by source (leaderboard, cache, db)."
+)
+
+
+def invalidate_list_pages() -> None:
+    """
+    Сбрасывает закешированные страницы списка.
+    """
+    recipe_cache.clear("list")
+
+
+view_counter.add_flush_listener(invalidate_list_pages)
+view_counter.add_flush_listener(change_feed.mark_changed)
+view_counter.add_flush_listener(leaderboard.request_refresh)
+view_counter.add_view_listener(leaderboard.add_views)
+
+
+def on_recipes_created(
+    recipes: Mapping[int, Mapping[str, int]], local: bool = True
+) -> None:
+    """
+    Обновляет состояние процесса после фиксации новых рецептов.
+
+    Args:
+        recipes (Mapping[int, Mapping[str, int]]): ID ингредиентов
+            по названиям для каждого созданного рецепта
+        local (bool): False для рецептов, добавленных другим процессом
+            и прочитанных из журнала изменений (change_feed)
+
+    Действия:
+        - Отмечает свои рецепты в change_feed, чтобы не применять
+          их повторно из журнала, и меняет версию каталога (ETag списка).
+        - Сбрасывает закешированные страницы списка.
+        - Добавляет новые ингредиенты в словарь ингредиентов.
+        - Добавляет рецепты в инвертированный индекс ингредиентов
+          и в индексы подсказок ингредиентов и похожих рецептов.
+        - Отключает таблицу популярности до её обновления из БД.
+    """
+    if not recipes:
+        return
+    if local:
+        change_feed.mark_applied(recipes)
+        change_feed.mark_changed()
+    invalidate_list_pages()
+    leaderboard.invalidate()
+    for recipe_id, ingredients_ids in recipes.items():
+        ingredient_dictionary.add(ingredients_ids)
+        ingredient_index.add_recipe(recipe_id, ingredients_ids)
+        ingredient_autocomplete.add_recipe(ingredients_ids)
+        similar_recipes.add_recipe(recipe_id, ingredients_ids.values())
+
+
+def on_views_changed() -> None:
+    """
+    Сбрасывает состояние, зависящее от views, после записи просмотров
+    другим процессом.
+    """
+    invalidate_list_pages()
+    leaderboard.request_refresh()
+
+
+def on_change_log_reset() -> None:
+    """
+    Перестраивает всё состояние процесса, если он отстал от журнала
+    изменений.
+    """
+    recipe_cache.clear()
+    leaderboard.invalidate()
+    warm_up_tasks.add(asyncio.create_task(load_ingredient_dictionary()))
+    warm_up_tasks.add(asyncio.create_task(warm_up()))
+
+
+change_feed.add_recipes_listener(lambda recipes: on_recipes_created(recipes, False))
+change_feed.add_views_listener(on_views_changed)
+change_feed.add_reset_listener(on_change_log_reset)
 
 
 @app.on_event("startup")
 async def startup():
     """
-    Инициализирует базу данных при запуске сервера.
+    Готовит приложение к приёму запросов.
 
     Действия:
-        - Создаёт все таблицы (Base.metadata.create_all).
-        - Заполняет БД тестовыми данными (populate_db()).
+        - Приводит схему БД к актуальной версии (migrate()).
+        - Заполняет пустую БД тестовыми данными, если включено
+          [app] seed (populate_db()).
+        - Запоминает конец журнала изменений (change_feed.seek_to_end()).
+        - Заполняет словарь ингредиентов (load_ingredient_dictionary()).
+        - Запускает фоновое построение индексов в памяти (warm_up()).
+        - Запускает фоновый сброс счётчика просмотров (view_counter.start()).
+        - Запускает заполнение таблицы популярности (leaderboard.start()).
+        - Запускает опрос журнала изменений (change_feed.start()).
+
+    Notes:
+        - При актуальной схеме время запуска зависит только от числа
+          ингредиентов: словарь нужен для записи рецептов, а индексы
+          строятся уже после того, как сервер начал принимать запросы
+        - Воркеры (uvicorn --workers) готовят БД по очереди (startup_lock())
+          и узнают об изменениях друг друга из журнала catalog_changes
+          не позже чем через [workers] poll_interval
     """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        await populate_db()
+    async with startup_lock():
+        async with engine.begin() as conn:
+            await migrate(conn)
+        if SEED_DATABASE:
+            await populate_db()
+    await change_feed.seek_to_end()
+    await load_ingredient_dictionary()
+    warm_up_tasks.add(asyncio.create_task(warm_up()))
+    await view_counter.start()
+    await leaderboard.start()
+    await change_feed.start()
+
+
+async def load_ingredient_dictionary() -> None:
+    """
+    Заполняет словарь ингредиентов (ingredient_dictionary) из БД.
+    """
+    async with read_session() as session:
+        await ingredient_dictionary.load(session)
+
+
+async def warm_up() -> None:
+    """
+    Строит индексы в памяти по данным БД.
+
+    Действия:
+        - Строит инвертированный индекс ингредиентов (ingredient_index.load()).
+        - Строит индекс подсказок ингредиентов (ingredient_autocomplete.load()).
+        - Строит индекс похожих рецептов (similar_recipes.load()).
+    """
+    async with read_session() as session:
+        await ingredient_index.load(session)
+        await ingredient_autocomplete.load(session)
+        await similar_recipes.load(session)
 
 
 @app.on_event("shutdown")
@@ -37,47 +288,530 @@ async def shutdown():
     Корректно закрывает соединения с БД при остановке сервера.
 
     Действия:
-        - Закрывает сессию (session.close()).
-        - Освобождает ресурсы подключения (engine.dispose()).
+        - Останавливает незавершённое построение индексов, обновление
+          таблицы популярности и опрос журнала изменений.
+        - Записывает накопленные просмотры (view_counter.stop()).
+        - Освобождает пулы соединений (engine.dispose()).
     """
-    await session.close()
+    for task in warm_up_tasks:
+        task.cancel()
+    await asyncio.gather(*warm_up_tasks, return_exceptions=True)
+    warm_up_tasks.clear()
+    await change_feed.stop()
+    await leaderboard.stop()
+    await view_counter.stop()
+    await reader_engine.dispose()
     await engine.dispose()
 
 
-@app.get("/recipes/", response_model=List[schemas.RecipeOutShort])
-async def get_all_recipes() -> Sequence[Recipe]:
+@app.get(
+    "/recipes/",
+    response_model=Union[schemas.RecipePage, Dict],
+    dependencies=[Depends(admit_read)],
+)
+async def get_all_recipes(
+    session: ReadSessionDep,
+    request: Request,
+    response: Response,
+    limit: Annotated[
+        int, Query(title="Page size", ge=1, le=MAX_PAGE_SIZE)
+    ] = DEFAULT_PAGE_SIZE,
+    cursor: Annotated[Optional[str], Query(title="Cursor of the page")] = None,
+) -> Union[Response, Dict[str, Any]]:
     """
-    Возвращает список всех рецептов,
+    Возвращает страницу списка рецептов,
     отсортированных по популярности и времени приготовления.
+    Страница берётся из кеша recipe_cache (пространство имён "list"),
+    который сбрасывается при записи просмотров и добавлении рецептов.
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса.
+        request (Request): Запрос (заголовки If-None-Match, If-Modified-Since).
+        response (Response): Объект ответа FastAPI для установки статуса.
+        limit (int, Query): Размер страницы (1..MAX_PAGE_SIZE).
+        cursor (Optional[str], Query): next_cursor предыдущей страницы;
+            без него возвращается первая страница.
 
     Returns:
-        Sequence[Recipe]: Список рецептов в формате:
+        Dict[str, Any]: Страница рецептов в формате:
+            {
+                "items": [
+                    {
+                        "title": str,
+                        "cooking_time": int,
+                        "views": int
+                    },
+                    ...
+                ],
+                "next_cursor": Optional[str]
+            }
+        или {"error": str}, если курсор повреждён.
+
+    Raises:
+        HTTP 304: Если версия списка совпадает с ETag клиента.
+        HTTP 400: Если курсор не удаётся декодировать.
+
+    Notes:
+        - ETag и Last-Modified списка - версия каталога по журналу
+          изменений (change_feed.version), общая для всех воркеров,
+          поэтому 304 отдаётся до чтения страницы любым воркером;
+          незаписанные просмотры этого процесса версию не меняют
+        - Страницы, целиком попадающие в таблицу популярности
+          (leaderboard), отдаются из памяти без запросов к БД; views в них
+          могут опережать сохранённые (см. Leaderboard)
+        - Выбираются только колонки RecipeOutShort, а JSON собирается
+          из строк выборки через orjson (recipe_page_json), минуя
+          объекты ORM и валидацию Pydantic
+    """
+    after: Optional[RecipeCursor] = None
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        if after is None:
+            response.status_code = status.HTTP_400_BAD_REQUEST
+            return {"error": "Invalid cursor"}
+
+    etag = f'W/"{change_feed.version}"'
+    last_modified = change_feed.modified
+    headers: Dict[str, str] = cache_headers(etag, last_modified, LIST_MAX_AGE)
+    if is_not_modified(request.headers, etag, last_modified):
+        return not_modified(headers)
+
+    ranked = leaderboard.page(limit, after)
+    if ranked is not None:
+        LIST_PAGES.inc(source="leaderboard")
+        recipes, has_more = ranked
+        next_cursor: Optional[str] = encode_cursor(recipes[-1]) if has_more else None
+        return Response(
+            content=recipe_page_json(recipes, next_cursor),
+            media_type="application/json",
+            headers=headers,
+        )
+
+    cache_key = f"{limit}:{cursor or ''}"
+    payload: Optional[bytes] = recipe_cache.get("list", cache_key)
+    LIST_PAGES.inc(source="db" if payload is None else "cache")
+    if payload is None:
+        res = await session.execute(recipes_page_query(limit, after))
+        rows: Sequence[Row] = res.all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1])
+        payload = recipe_page_json(rows, next_cursor)
+        recipe_cache.set("list", cache_key, payload)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+async def export_chunks(export_format: str) -> AsyncIterator[str]:
+    """
+    Формирует тело выгрузки каталога порциями.
+
+    Args:
+        export_format (str): "ndjson" или "csv"
+
+    Yields:
+        str: Очередная порция строк выгрузки
+
+    Notes:
+        - Открывает собственную сессию: ответ передаётся уже после
+          завершения обработчика запроса
+    """
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+        yield buffer.getvalue()
+
+    async with read_session() as session:
+        async for records in stream_recipes(session, EXPORT_BATCH_SIZE):
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for record in records:
+                    record["list_of_ingredients"] = ";".join(
+                        record["list_of_ingredients"]
+                    )
+                    writer.writerow(record[column] for column in EXPORT_CSV_COLUMNS)
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(record, ensure_ascii=False) + "\n" for record in records
+                )
+
+
+@app.get(
+    "/recipes/export",
+    response_class=StreamingResponse,
+    dependencies=[Depends(admit_read)],
+)
+async def export_recipes(
+    export_format: Annotated[
+        Literal["ndjson", "csv"], Query(alias="format", title="Export format")
+    ] = "ndjson",
+) -> StreamingResponse:
+    """
+    Выгружает весь каталог рецептов потоком.
+
+    Args:
+        export_format (str, Query "format"): "ndjson" (по умолчанию) или "csv".
+
+    Returns:
+        StreamingResponse: Рецепты по одному на строку в формате:
+            {
+                "id": int,
+                "title": str,
+                "description": str,
+                "cooking_time": int,
+                "views": int,
+                "list_of_ingredients": List[str]
+            }
+        Для CSV ингредиенты перечисляются через ";".
+
+    Notes:
+        - Строки читаются серверным курсором (stream_recipes), поэтому
+          первые байты отправляются сразу, а память не зависит
+          от размера таблицы
+    """
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(export_chunks(export_format), media_type=media_type)
+
+
+@app.get(
+    "/recipes/search",
+    response_model=schemas.RecipeSearchPage,
+    dependencies=[Depends(admit_read)],
+)
+async def search(
+    session: ReadSessionDep,
+    q: Annotated[str, Query(title="Search query", min_length=1)],
+    limit: Annotated[
+        int, Query(title="Page size", ge=1, le=MAX_PAGE_SIZE)
+    ] = DEFAULT_PAGE_SIZE,
+    offset: Annotated[int, Query(title="Results to skip", ge=0)] = 0,
+) -> Response:
+    """
+    Полнотекстовый поиск рецептов по названию и описанию (FTS5).
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса.
+        q (str, Query): Слова для поиска; все слова обязательны,
+            последнее ищется по префиксу.
+        limit (int, Query): Размер страницы (1..MAX_PAGE_SIZE).
+        offset (int, Query): Сколько результатов пропустить.
+
+    Returns:
+        Dict[str, Any]: Страница результатов в формате:
+            {
+                "items": [
+                    {
+                        "id": int,
+                        "title": str,
+                        "cooking_time": int,
+                        "views": int,
+                        "snippet": str,
+                        "rank": float
+                    },
+                    ...
+                ],
+                "next_offset": Optional[int]
+            }
+    """
+    items: List[Dict[str, Any]] = await search_recipes(session, q, limit + 1, offset)
+    next_offset: Optional[int] = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_offset = offset + limit
+    return Response(
+        content=dump_json({"items": items, "next_offset": next_offset}),
+        media_type="application/json",
+    )
+
+
+@app.get(
+    "/recipes/by-ingredients",
+    response_model=Union[schemas.IngredientMatchPage, Dict],
+    dependencies=[Depends(admit_read)],
+)
+async def get_recipes_by_ingredients(
+    session: ReadSessionDep,
+    response: Response,
+    ingredient: Annotated[List[str], Query(title="Ingredient names", min_length=1)],
+    match: Annotated[
+        Literal["all", "any", "missing"], Query(title="Matching mode")
+    ] = "all",
+    max_missing: Annotated[int, Query(title="Allowed missing ingredients", ge=0)] = 0,
+    limit: Annotated[
+        int, Query(title="Page size", ge=1, le=MAX_PAGE_SIZE)
+    ] = DEFAULT_PAGE_SIZE,
+    offset: Annotated[int, Query(title="Results to skip", ge=0)] = 0,
+) -> Union[Response, Dict[str, Any]]:
+    """
+    Ищет рецепты по ингредиентам через инвертированный индекс в памяти.
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса.
+        response (Response): Объект ответа FastAPI для установки статуса.
+        ingredient (List[str], Query): Названия ингредиентов
+            (параметр повторяется: ?ingredient=Eggs&ingredient=Milk).
+        match (str, Query): Режим поиска:
+            - "all": рецепты, содержащие все ингредиенты;
+            - "any": рецепты, содержащие хотя бы один ингредиент;
+            - "missing": рецепты, которые можно приготовить из этих
+              ингредиентов, докупив не больше max_missing.
+        max_missing (int, Query): Допустимое число недостающих ингредиентов
+            для match=missing.
+        limit (int, Query): Размер страницы (1..MAX_PAGE_SIZE).
+        offset (int, Query): Сколько результатов пропустить.
+
+    Returns:
+        Dict[str, Any]: Страница рецептов в формате:
+            {
+                "items": [
+                    {
+                        "id": int,
+                        "title": str,
+                        "cooking_time": int,
+                        "views": int,
+                        "missing": Optional[int]
+                    },
+                    ...
+                ],
+                "total": int,
+                "next_offset": Optional[int]
+            }
+        или {"error": str}, если индекс ещё не готов.
+
+    Raises:
+        HTTP 503: Если индекс ещё строится после запуска.
+
+    Notes:
+        - Подбор рецептов выполняется в памяти; к БД идёт один запрос
+          за полями рецептов текущей страницы
+    """
+    if not ingredient_index.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        response.headers["Retry-After"] = "1"
+        return {"error": "Ingredient index is warming up"}
+    ingredients_ids: List[Optional[int]] = ingredient_index.lookup(ingredient)
+    known_ids: List[int] = [id_ for id_ in ingredients_ids if id_ is not None]
+    missing: Dict[int, int] = {}
+    if match == "all":
+        recipes_ids = (
+            ingredient_index.match_all(known_ids)
+            if len(known_ids) == len(ingredients_ids)
+            else []
+        )
+    elif match == "any":
+        recipes_ids = ingredient_index.match_any(known_ids)
+    else:
+        missing = dict(ingredient_index.match_missing(known_ids, max_missing))
+        recipes_ids = list(missing)
+
+    page: List[int] = recipes_ids[offset : offset + limit]
+    res = await session.execute(
+        select(Recipe.id, Recipe.title, Recipe.cooking_time, Recipe.views).filter(
+            Recipe.id.in_(page)
+        )
+    )
+    rows: Dict[int, Dict[str, Any]] = {row["id"]: dict(row) for row in res.mappings()}
+    items: List[Dict[str, Any]] = [
+        {**rows[recipe_id], "missing": missing.get(recipe_id)}
+        for recipe_id in page
+        if recipe_id in rows
+    ]
+    next_offset: Optional[int] = (
+        offset + limit if offset + limit < len(recipes_ids) else None
+    )
+    return Response(
+        content=dump_json(
+            {"items": items, "total": len(recipes_ids), "next_offset": next_offset}
+        ),
+        media_type="application/json",
+    )
+
+
+@app.get(
+    "/ingredients/autocomplete",
+    response_model=Union[List[schemas.IngredientSuggestion], Dict],
+    dependencies=[Depends(admit_read)],
+)
+async def autocomplete_ingredients(
+    response: Response,
+    prefix: Annotated[str, Query(title="Beginning of a name", min_length=1)],
+    limit: Annotated[
+        int, Query(title="How many suggestions", ge=1, le=MAX_SUGGESTIONS)
+    ] = 10,
+) -> Union[Response, Dict[str, Any]]:
+    """
+    Подсказывает названия ингредиентов по началу названия.
+
+    Args:
+        response (Response): Объект ответа FastAPI для установки статуса.
+        prefix (str, Query): Введённое начало названия (без учёта регистра).
+        limit (int, Query): Количество подсказок (1..[autocomplete]
+            max_suggestions).
+
+    Returns:
+        List[Dict[str, Any]]: Подсказки по убыванию числа рецептов:
+            [{"name": str, "recipes": int}, ...]
+        или {"error": str}, если индекс ещё не готов.
+
+    Raises:
+        HTTP 503: Если индекс ещё строится после запуска.
+
+    Notes:
+        - Отвечает из префиксного индекса в памяти, без запросов к БД
+    """
+    if not ingredient_autocomplete.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        response.headers["Retry-After"] = "1"
+        return {"error": "Ingredient index is warming up"}
+    return Response(
+        content=dump_json(
             [
-                {
-                    "id": int,
-                    "title": str,
-                    "cooking_time": int,
-                    "views": int
-                },
-                ...
+                {"name": name, "recipes": uses}
+                for name, uses in ingredient_autocomplete.suggest(prefix, limit)
             ]
+        ),
+        media_type="application/json",
+    )
+
+
+@app.get(
+    "/recipes/top",
+    response_model=List[schemas.RecipeTop],
+    dependencies=[Depends(admit_read)],
+)
+async def get_top_recipes(
+    session: ReadSessionDep,
+    limit: Annotated[
+        int, Query(title="How many recipes", ge=1, le=leaderboard.size)
+    ] = DEFAULT_PAGE_SIZE,
+) -> Response:
     """
-    res = await session.execute(
-        select(Recipe).order_by(desc(Recipe.views), Recipe.cooking_time)
+    Возвращает самые популярные рецепты (views DESC, cooking_time, id).
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса.
+        limit (int, Query): Количество рецептов (1..[leaderboard] size).
+
+    Returns:
+        List[Dict[str, Any]]: Рецепты в формате:
+            [{"id": int, "title": str, "cooking_time": int, "views": int}, ...]
+
+    Notes:
+        - Отдаётся из таблицы популярности в памяти; пока она не заполнена
+          (после запуска или добавления рецептов), читается из БД
+    """
+    ranked = leaderboard.page(limit)
+    if ranked is not None:
+        recipes: Sequence[Tuple] = ranked[0]
+    else:
+        res = await session.execute(recipes_page_query(limit))
+        recipes = res.all()[:limit]
+    return Response(
+        content=dump_json(
+            [
+                {"id": id_, "title": title, "cooking_time": time_, "views": views}
+                for title, time_, views, id_ in recipes
+            ]
+        ),
+        media_type="application/json",
+    )
+
+
+@app.get(
+    "/recipes/batch",
+    response_model=schemas.RecipeBatch,
+    dependencies=[Depends(admit_read)],
+)
+async def get_recipes_batch(
+    session: ReadSessionDep,
+    ids: Annotated[
+        List[int],
+        Query(
+            alias="id", title="Ids of recipes", min_length=1, max_length=MAX_PAGE_SIZE
+        ),
+    ],
+) -> Response:
+    """
+    Возвращает несколько рецептов по ID за один запрос.
+    Просмотры учитываются так же, как в GET /recipes/{recipe_id}:
+    в счётчике view_counter, который записывает их одним пакетным UPDATE.
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса.
+        ids (List[int], Query): ID рецептов (параметр повторяется:
+            ?id=1&id=2, не больше MAX_PAGE_SIZE).
+
+    Returns:
+        Dict[str, Any]: Рецепты по ID в формате:
+            {
+                "recipes": {
+                    "<id>": {
+                        "title": str,
+                        "cooking_time": int,
+                        "description": str,
+                        "list_of_ingredients": List[str]
+                    }
+                    или {"error": "No recipe with this id"},
+                    ...
+                }
+            }
+
+    Notes:
+        - Рецепты берутся из кеша recipe_cache, а отсутствующие в нём
+          загружаются вместе с ингредиентами одним запросом к БД
+        - Повторяющиеся ID возвращаются и учитываются как просмотр один раз
+    """
+    payloads: Dict[int, Optional[bytes]] = {
+        recipe_id: recipe_cache.get("recipe", str(recipe_id))
+        for recipe_id in dict.fromkeys(ids)
+    }
+    missed: List[int] = [id_ for id_, payload in payloads.items() if payload is None]
+    if missed:
+        recipes = await get_recipes_with_ingredients(session, missed)
+        for recipe_id, recipe in recipes.items():
+            payloads[recipe_id] = recipe_detail_json(recipe)
+            recipe_cache.set("recipe", str(recipe_id), payloads[recipe_id])
+            recipe_cache.set(
+                "recipe_version", str(recipe_id), repr(recipe.updated_at).encode()
+            )
+
+    parts: List[bytes] = []
+    for recipe_id, payload in payloads.items():
+        if payload is None:
+            payload = b'{"error":"No recipe with this id"}'
+        else:
+            view_counter.add(recipe_id)
+        parts.append(b'"%d":%s' % (recipe_id, payload))
+    return Response(
+        content=b'{"recipes":{' + b",".join(parts) + b"}}",
+        media_type="application/json",
     )
-    return res.scalars().all()
 
 
-@app.get("/recipes/{recipe_id}", response_model=Union[schemas.RecipeOutLong, Dict])
+@app.get(
+    "/recipes/{recipe_id}",
+    response_model=Union[schemas.RecipeOutLong, Dict],
+    dependencies=[Depends(admit_read)],
+)
 async def get_recipe_by_id(
-    recipe_id: Annotated[int, Path(title="Id of a recipe", ge=1)], response: Response
-) -> Dict[str, Any]:
+    recipe_id: Annotated[int, Path(title="Id of a recipe", ge=1)],
+    session: ReadSessionDep,
+    request: Request,
+    response: Response,
+) -> Union[Response, Dict[str, Any]]:
     """
     Возвращает полную информацию о рецепте по его ID.
-    Увеличивает счётчик просмотров.
+    Учитывает просмотр в счётчике view_counter (запись в БД отложенная).
+    Ответ берётся из кеша recipe_cache (пространство имён "recipe"):
+    в нём нет views, поэтому просмотры не делают его устаревшим.
 
     Args:
         recipe_id (int, Path): ID рецепта (≥ 1).
+        session (AsyncSession): Сессия текущего запроса.
+        request (Request): Запрос (заголовки If-None-Match, If-Modified-Since).
         response (Response): Объект ответа FastAPI для установки статуса.
 
     Returns:
@@ -91,31 +825,166 @@ async def get_recipe_by_id(
         или {"error": str}, если рецепт не найден.
 
     Raises:
+        HTTP 304: Если у клиента актуальная версия рецепта (просмотр
+            при этом учитывается).
         HTTP 404: Если рецепт не существует.
+
+    Notes:
+        - ETag и Last-Modified строятся по Recipe.updated_at, которое
+          хранится в кеше рядом с ответом (пространство имён
+          "recipe_version"); для условного запроса без версии в кеше
+          читается только updated_at по первичному ключу, без ингредиентов
     """
-    res = await session.execute(select(Recipe).filter(Recipe.id == recipe_id))
-    output: Recipe = res.scalars().one_or_none()
-    if output:
-        output: Dict[str, Any] = output.to_dict()
-        output.pop("views")
-        recipe_id: int = output.pop("id")
-        list_of_ingredients: List[str] = await get_ingredients_list(recipe_id)
-        output.update(list_of_ingredients=list_of_ingredients)
-        await increase_view_count(recipe_id)
-        return output
-    else:
+    key = str(recipe_id)
+    version: Optional[bytes] = recipe_cache.get("recipe_version", key)
+    payload: Optional[bytes] = None
+    conditional = (
+        "if-none-match" in request.headers or "if-modified-since" in request.headers
+    )
+    if version is None and not conditional:
+        recipe: Optional[Recipe] = await get_recipe_with_ingredients(session, recipe_id)
+        if not recipe:
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return {"error": "No recipe with this id"}
+        payload = recipe_detail_json(recipe)
+        version = repr(recipe.updated_at).encode()
+        recipe_cache.set("recipe", key, payload)
+        recipe_cache.set("recipe_version", key, version)
+    if version is None:
+        updated_at: Optional[float] = await session.scalar(
+            select(Recipe.updated_at).filter(Recipe.id == recipe_id)
+        )
+        if updated_at is None:
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return {"error": "No recipe with this id"}
+        version = repr(updated_at).encode()
+        recipe_cache.set("recipe_version", key, version)
+
+    last_modified = float(version)
+    etag = f'W/"r{recipe_id}-{version.decode()}"'
+    headers: Dict[str, str] = cache_headers(etag, last_modified, RECIPE_MAX_AGE)
+    if is_not_modified(request.headers, etag, last_modified):
+        view_counter.add(recipe_id)
+        return not_modified(headers)
+
+    if payload is None:
+        payload = recipe_cache.get("recipe", key)
+    if payload is None:
+        recipe = await get_recipe_with_ingredients(session, recipe_id)
+        if not recipe:
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return {"error": "No recipe with this id"}
+        payload = recipe_detail_json(recipe)
+        recipe_cache.set("recipe", key, payload)
+    view_counter.add(recipe_id)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+@app.get(
+    "/recipes/{recipe_id}/similar",
+    response_model=Union[schemas.SimilarRecipes, Dict],
+    dependencies=[Depends(admit_read)],
+)
+async def get_similar_recipes(
+    recipe_id: Annotated[int, Path(title="Id of a recipe", ge=1)],
+    session: ReadSessionDep,
+    response: Response,
+    limit: Annotated[
+        int, Query(title="How many recipes", ge=1, le=MAX_PAGE_SIZE)
+    ] = DEFAULT_PAGE_SIZE,
+) -> Union[Response, Dict[str, Any]]:
+    """
+    Возвращает рецепты, наиболее похожие на данный по составу.
+
+    Args:
+        recipe_id (int, Path): ID рецепта (≥ 1).
+        session (AsyncSession): Сессия текущего запроса.
+        response (Response): Объект ответа FastAPI для установки статуса.
+        limit (int, Query): Количество рецептов (1..MAX_PAGE_SIZE).
+
+    Returns:
+        Dict[str, Any]: Рецепты по убыванию сходства в формате:
+            {
+                "items": [
+                    {
+                        "id": int,
+                        "title": str,
+                        "cooking_time": int,
+                        "views": int,
+                        "similarity": float
+                    },
+                    ...
+                ]
+            }
+        или {"error": str}, если рецепт не найден или индекс не готов.
+
+    Raises:
+        HTTP 404: Если рецепт не существует.
+        HTTP 503: Если индекс ещё строится после запуска.
+
+    Notes:
+        - Кандидаты берутся из индекса MinHash/LSH в памяти
+          (similar_recipes), а не из сравнения со всеми рецептами
+        - Кандидаты упорядочиваются по точному коэффициенту Жаккара:
+          их ингредиенты читаются одним запросом по первичному ключу
+          recipe_ingredient, поля результата - ещё одним
+    """
+    if not similar_recipes.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        response.headers["Retry-After"] = "1"
+        return {"error": "Similar recipes index is warming up"}
+    res = await session.execute(
+        select(RecipeIngredient.ingredient_id).filter(
+            RecipeIngredient.recipe_id == recipe_id
+        )
+    )
+    target: Set[int] = set(res.scalars())
+    if not target and await session.get(Recipe, recipe_id) is None:
         response.status_code = status.HTTP_404_NOT_FOUND
         return {"error": "No recipe with this id"}
 
+    candidates: Dict[int, Set[int]] = {
+        id_: set() for id_ in similar_recipes.candidates(target, exclude=recipe_id)
+    }
+    if candidates:
+        res = await session.execute(
+            select(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id).filter(
+                RecipeIngredient.recipe_id.in_(list(candidates))
+            )
+        )
+        for candidate_id, ingredient_id in res:
+            candidates[candidate_id].add(ingredient_id)
+    ranked: List[Tuple[int, float]] = rank_by_jaccard(target, candidates, limit)
+
+    items: List[Dict[str, Any]] = []
+    if ranked:
+        res = await session.execute(
+            select(Recipe.id, Recipe.title, Recipe.cooking_time, Recipe.views).filter(
+                Recipe.id.in_([id_ for id_, _ in ranked])
+            )
+        )
+        rows: Dict[int, Dict[str, Any]] = {
+            row["id"]: dict(row) for row in res.mappings()
+        }
+        items = [
+            {**rows[id_], "similarity": round(similarity, 4)}
+            for id_, similarity in ranked
+            if id_ in rows
+        ]
+    return Response(content=dump_json({"items": items}), media_type="application/json")
+
 
 @app.post(
-    "/recipes/", response_model=Union[schemas.RecipeOutLong, Dict], status_code=201
+    "/recipes/",
+    response_model=Union[schemas.RecipeOutLong, Dict],
+    status_code=201,
+    dependencies=[Depends(admit_write)],
 )
 async def add_new_recipe(
-    recipe: schemas.RecipeIn, response: Response
+    recipe: schemas.RecipeIn, session: SessionDep, response: Response
 ) -> Dict[str, Any]:
     """
-    Добавляет новый рецепт в базу данных.
+    Добавляет новый рецепт в базу данных одной транзакцией.
 
     Args:
         recipe (schemas.RecipeIn): Данные рецепта в формате:
@@ -125,6 +994,7 @@ async def add_new_recipe(
                 "description": str,
                 "list_of_ingredients": List[str]
             }
+        session (AsyncSession): Сессия текущего запроса.
         response (Response): Объект ответа FastAPI для установки статуса.
 
     Returns:
@@ -132,44 +1002,179 @@ async def add_new_recipe(
         или {"error": str}, если рецепт уже существует.
 
     Raises:
-        HTTP 409: Если рецепт с таким названием уже есть.
-    """
-    res = await session.execute(select(Recipe).filter(Recipe.title == recipe.title))
-    res = res.scalars().all()
-    if not res:
-        recipe: Dict[str, Union[str, int, List[str]]] = recipe.dict()
-        ingredients: Set[str] = set(recipe.pop("list_of_ingredients"))
-        new_recipe = Recipe(**recipe)
+        HTTP 409: Если рецепт с таким названием уже есть
+            (нарушение уникальности recipes.title).
+    """
+    data: Dict[str, Union[str, int, List[str]]] = recipe.model_dump()
+    ingredients: List[str] = data.pop("list_of_ingredients")
+    new_recipe = Recipe(**data)
+    try:
         session.add(new_recipe)
-        await add_ingredients(ingredients)
-
+        await session.flush()
+        ingredients_ids: Dict[str, int] = await add_ingredients(session, ingredients)
+        await add_recipe_ingredients(session, ingredients_ids.values(), new_recipe.id)
         await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        response.status_code = status.HTTP_409_CONFLICT
+        return {"error": "Recipe already exists"}
+    on_recipes_created({new_recipe.id: ingredients_ids})
 
-        ingredients_with_ids = (
-            (
-                await session.execute(
-                    select(Ingredient).filter(Ingredient.name.in_(ingredients))
-                )
+    output: Dict[str, Any] = new_recipe.to_dict()
+    output.pop("views")
+    output.pop("id")
+    output.update(list_of_ingredients=sorted(ingredients_ids, key=ingredients_ids.get))
+    return output
+
+
+@app.post(
+    "/recipes/import",
+    response_model=schemas.ImportResult,
+    dependencies=[Depends(admit_write)],
+)
+async def import_recipes_ndjson(
+    request: Request,
+    session: SessionDep,
+    batch_size: Annotated[
+        int, Query(title="Recipes per transaction", ge=1, le=MAX_IMPORT_BATCH_SIZE)
+    ] = IMPORT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Пакетно импортирует рецепты из тела запроса в формате NDJSON.
+
+    Каждая строка - JSON-объект в формате schemas.RecipeIn. Тело читается
+    потоком, строки проверяются по одной и записываются пакетами по
+    batch_size рецептов (один commit на пакет), поэтому память не зависит
+    от размера загрузки.
+
+    Args:
+        request (Request): Запрос, тело которого читается потоком.
+        session (AsyncSession): Сессия текущего запроса.
+        batch_size (int, Query): Количество рецептов в одной транзакции.
+
+    Returns:
+        Dict[str, Any]: Итоги импорта в формате:
+            {
+                "lines": int,
+                "created": int,
+                "failed": int,
+                "errors": [{"line": int, "error": str}, ...]
+            }
+    """
+    result: Dict[str, Any] = {"lines": 0, "created": 0, "failed": 0, "errors": []}
+    batch: List[schemas.RecipeIn] = []
+    batch_lines: List[int] = []
+    batch_titles: Set[str] = set()
+
+    def fail(line: int, error: str) -> None:
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_IMPORT_ERRORS:
+            result["errors"].append({"line": line, "error": error})
+
+    async def write_batch() -> None:
+        try:
+            recipes_ids, recipes_ingredients = await import_recipes(session, batch)
+            await session.commit()
+            error = "Recipe already exists"
+        except SQLAlchemyError:
+            await session.rollback()
+            recipes_ids, recipes_ingredients = [None] * len(batch), {}
+            error = "Database error"
+        on_recipes_created(recipes_ingredients)
+        for line, recipe_id in zip(batch_lines, recipes_ids):
+            if recipe_id is None:
+                fail(line, error)
+            else:
+                result["created"] += 1
+        batch.clear()
+        batch_lines.clear()
+        batch_titles.clear()
+
+    async for raw_line in iter_lines(request.stream(), MAX_IMPORT_LINE_BYTES):
+        result["lines"] += 1
+        line: int = result["lines"]
+        if raw_line is None:
+            fail(line, "Line is too long")
+            continue
+        if not raw_line.strip():
+            continue
+        try:
+            recipe = schemas.RecipeIn.model_validate_json(raw_line)
+        except ValidationError as exc:
+            fail(
+                line,
+                "; ".join(
+                    f"{'.'.join(map(str, error['loc'])) or 'line'}: {error['msg']}"
+                    for error in exc.errors()
+                ),
             )
-            .scalars()
-            .all()
-        )
-        ingredients_ids: List[int] = [
-            ingredient.id for ingredient in ingredients_with_ids
-        ]
+            continue
+        if recipe.title in batch_titles:
+            fail(line, "Recipe already exists")
+            continue
+        batch.append(recipe)
+        batch_lines.append(line)
+        batch_titles.add(recipe.title)
+        if len(batch) >= batch_size:
+            await write_batch()
+    if batch:
+        await write_batch()
+    return result
 
-        new_recipe = await session.execute(
-            select(Recipe).filter(Recipe.title == recipe.get("title"))
-        )
-        output: Dict[str, Any] = new_recipe.scalars().one().to_dict()
-        output.pop("views")
-        new_recipe_id: int = output.pop("id")
-        await add_recipe_ingredients(ingredients_ids, new_recipe_id)
 
-        await session.commit()
-        list_of_ingredients: List[str] = await get_ingredients_list(new_recipe_id)
-        output.update(list_of_ingredients=list_of_ingredients)
-        return output
-    else:
-        response.status_code = status.HTTP_409_CONFLICT
-        return {"error": "Recipe already exists"}
+@app.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, int]:
+    """
+    Возвращает счётчики кеша ответов.
+
+    Returns:
+        Dict[str, int]: {"hits", "misses", "evictions", "entries", "bytes"}
+    """
+    return recipe_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Возвращает метрики процесса в текстовом формате Prometheus.
+
+    Returns:
+        PlainTextResponse: Метрики HTTP-запросов (задержка по маршрутам,
+        запросы в обработке, число и время SQL на запрос), SQL-выражений,
+        счётчика просмотров, поиска ингредиентов и кеша ответов
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/admin/profiles")
+async def list_profiles() -> List[Dict[str, Any]]:
+    """
+    Возвращает сохранённые профили запросов, начиная с самых новых.
+
+    Returns:
+        List[Dict[str, Any]]: Метаданные профилей (см. profiling.RequestProfiler)
+
+    Notes:
+        - Профили пишутся только при [profiling] enabled = true
+    """
+    return await asyncio.to_thread(request_profiler.list)
+
+
+@app.get("/admin/profiles/{name}/{file_name}", response_model=None)
+async def get_profile_file(
+    name: str, file_name: str, response: Response
+) -> Union[FileResponse, Dict]:
+    """
+    Отдаёт файл профиля: profile.pstats, tracemalloc.snapshot, sql.json
+    или meta.json.
+
+    Returns:
+        Union[FileResponse, Dict]: Файл или ошибка 404
+    """
+    path = request_profiler.file_path(name, file_name)
+    if path is None:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return {"error": "Profile file not found"}
+    return FileResponse(path, filename=file_name)
@@ -0,0 +1,195 @@
+from bisect import bisect_left, insort
+from heapq import nsmallest
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from config import get_int
+from models import Ingredient, RecipeIngredient, ingredient_key
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+MAX_SUGGESTIONS = get_int("autocomplete", "max_suggestions", 20)
+SCAN_LIMIT = get_int("autocomplete", "scan_limit", 256)
+
+# Больше любого символа, поэтому key + KEY_END - верхняя граница ключей
+# с префиксом key.
+KEY_END = chr(0x10FFFF)
+
+
+class IngredientAutocomplete:
+    """
+    Префиксный индекс названий ингредиентов для подсказок при вводе.
+
+    Ключи названий (ingredient_key()) хранятся в отсортированном списке,
+    поэтому названия с заданным префиксом - непрерывный диапазон,
+    границы которого находятся двоичным поиском. Подсказки упорядочены
+    по числу рецептов с ингредиентом (затем по алфавиту). Диапазоны
+    не длиннее scan_limit ранжируются при каждом запросе, для более
+    длинных (короткие префиксы) первые MAX_SUGGESTIONS подсказок
+    запоминаются при построении: список префикса собирается из списков
+    префиксов на символ длиннее, поэтому ни один запрос не ранжирует
+    длинный диапазон целиком. Число рецептов только растёт, поэтому при создании
+    рецепта запомненные списки не сбрасываются, а обновляются: ключ
+    ингредиента переставляется выше или вытесняет последнюю подсказку.
+
+    Атрибуты:
+        ready (bool): Индекс построен
+        scan_limit (int): Наибольший диапазон, ранжируемый без запоминания
+    """
+
+    def __init__(self, scan_limit: int = SCAN_LIMIT) -> None:
+        self.ready = False
+        self.scan_limit = scan_limit
+        self._keys: List[str] = []
+        self._names: Dict[str, str] = {}
+        self._uses: Dict[str, int] = {}
+        self._top: Dict[str, List[str]] = {}
+        self._loading = False
+        self._backlog: List[Mapping[str, int]] = []
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Строит индекс заново по таблицам ingredients и recipe_ingredient.
+
+        Notes:
+            - Число рецептов считается одним GROUP BY по индексу
+              ix_recipe_ingredient_ingredient_id; почти одинаковые
+              названия объединяются под написанием с наименьшим ID
+            - Рецепты, добавленные через add_recipe во время построения,
+              применяются к новому индексу после замены (рецепт, уже
+              учтённый запросом, может добавить своим ингредиентам
+              лишнее использование до следующего построения)
+        """
+        self._loading = True
+        try:
+            await self._load(session)
+        finally:
+            self._loading = False
+            backlog, self._backlog = self._backlog, []
+        for ingredients_ids in backlog:
+            self.add_recipe(ingredients_ids)
+        self.ready = True
+
+    async def _load(self, session: AsyncSession) -> None:
+        uses = (
+            select(RecipeIngredient.ingredient_id, func.count().label("uses"))
+            .group_by(RecipeIngredient.ingredient_id)
+            .subquery()
+        )
+        res = await session.execute(
+            select(Ingredient.name, func.coalesce(uses.c.uses, 0))
+            .outerjoin(uses, uses.c.ingredient_id == Ingredient.id)
+            .order_by(Ingredient.id)
+        )
+        self.build(res)
+
+    def build(self, ingredients: Iterable[Tuple[str, int]]) -> None:
+        """
+        Заменяет содержимое индекса.
+
+        Args:
+            ingredients (Iterable[Tuple[str, int]]): Названия ингредиентов
+             и число рецептов с ними (в порядке ID)
+        """
+        names: Dict[str, str] = {}
+        counts: Dict[str, int] = {}
+        for name, count in ingredients:
+            key = ingredient_key(name)
+            names.setdefault(key, name)
+            counts[key] = counts.get(key, 0) + count
+        self._keys = sorted(names)
+        self._names = names
+        self._uses = counts
+        self._top = {}
+        self._fill("", 0, len(self._keys))
+
+    def add_recipe(self, ingredients_ids: Mapping[str, int]) -> None:
+        """
+        Учитывает ингредиенты только что созданного рецепта: новые
+        названия добавляются в индекс, у всех растёт число рецептов.
+
+        Args:
+            ingredients_ids (Mapping[str, int]): ID ингредиентов рецепта
+             по их названиям
+        """
+        if self._loading:
+            self._backlog.append(ingredients_ids)
+        names = {ingredient_key(name): name for name in ingredients_ids}
+        for key, name in names.items():
+            if key not in self._names:
+                self._names[key] = name
+                self._uses[key] = 0
+                insort(self._keys, key)
+            self._uses[key] += 1
+            for end in range(len(key) + 1):
+                top = self._top.get(key[:end])
+                if top is not None:
+                    self._promote(top, key)
+
+    def suggest(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        """
+        Возвращает подсказки для начала названия.
+
+        Args:
+            prefix (str): Введённое начало названия (регистр и лишние
+             пробелы не учитываются)
+            limit (int): Количество подсказок (не больше MAX_SUGGESTIONS)
+
+        Returns:
+            List[Tuple[str, int]]: Названия и число рецептов с ними
+        """
+        key = ingredient_key(prefix)
+        top = self._top.get(key)
+        if top is None:
+            start = bisect_left(self._keys, key)
+            end = bisect_left(self._keys, key + KEY_END, start)
+            if end - start <= self.scan_limit:
+                top = self._rank(self._keys[start:end], limit)
+            else:
+                top = self._top[key] = self._rank(
+                    self._keys[start:end], MAX_SUGGESTIONS
+                )
+        return [(self._names[key], self._uses[key]) for key in top[:limit]]
+
+    def _rank(self, keys: List[str], limit: int) -> List[str]:
+        return nsmallest(limit, keys, key=self._order)
+
+    def _fill(self, prefix: str, start: int, end: int) -> List[str]:
+        # Запоминает подсказки для prefix и более длинных префиксов
+        # с диапазоном длиннее scan_limit; keys[start:end] - ключи с prefix.
+        keys = self._keys
+        if end - start <= self.scan_limit:
+            return self._rank(keys[start:end], MAX_SUGGESTIONS)
+        candidates: List[str] = []
+        if keys[start] == prefix:
+            candidates.append(prefix)
+            start += 1
+        depth = len(prefix)
+        while start < end:
+            child = prefix + keys[start][depth]
+            child_end = bisect_left(keys, child + KEY_END, start, end)
+            candidates.extend(self._fill(child, start, child_end))
+            start = child_end
+        top = self._top[prefix] = self._rank(candidates, MAX_SUGGESTIONS)
+        return top
+
+    def _order(self, key: str) -> Tuple[int, str]:
+        return -self._uses[key], key
+
+    def _promote(self, top: List[str], key: str) -> None:
+        # Число рецептов с key выросло, у остальных не изменилось: key
+        # может только подняться в списке или войти в него вместо последнего.
+        if key in top:
+            top.remove(key)
+        elif len(top) >= MAX_SUGGESTIONS:
+            if self._order(key) > self._order(top[-1]):
+                return
+            top.pop()
+        order = self._order(key)
+        position = 0
+        while position < len(top) and self._order(top[position]) < order:
+            position += 1
+        top.insert(position, key)
+
+
+ingredient_autocomplete = IngredientAutocomplete()
@@ -0,0 +1,581 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+import httpx
+from generate_data import WORDS, ingredient_name
+
+Scenario = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+# Доля от --requests для тяжёлых сценариев: выгрузка читает весь каталог,
+# импорт пишет по 100 рецептов за запрос.
+REQUEST_SHARE = {"export": 0.01, "import": 0.1}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Возвращает перцентиль (метод ближайшего ранга) отсортированного списка.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def build_scenarios(max_id: int, ingredients: int) -> Dict[str, Scenario]:
+    """
+    Возвращает сценарии нагрузки: по одному на каждый эндпоинт app.py.
+
+    Args:
+        max_id (int): Максимальный ID рецепта для запросов по ID
+        ingredients (int): Размер словаря ингредиентов generate_data.py
+
+    Returns:
+        Dict[str, Scenario]: Функции, выполняющие один запрос сценария
+    """
+    counter = iter(range(sys.maxsize))
+    run_id = int(time.time() * 1000)
+
+    def ingredient(rng: random.Random) -> str:
+        return ingredient_name(min(int(rng.paretovariate(1.0)), ingredients))
+
+    def new_recipe(rng: random.Random) -> Dict[str, Any]:
+        return {
+            "title": f"Benchmark Recipe {run_id}-{next(counter)}",
+            "cooking_time": rng.randint(5, 180),
+            "description": " ".join(rng.choices(WORDS, k=20)),
+            "list_of_ingredients": [ingredient(rng) for _ in range(6)],
+        }
+
+    async def list_first_page(client, rng):
+        return await client.get("/recipes/")
+
+    async def list_second_page(client, rng):
+        first = (await client.get("/recipes/")).json()
+        return await client.get("/recipes/", params={"cursor": first["next_cursor"]})
+
+    async def detail(client, rng):
+        return await client.get(f"/recipes/{rng.randint(1, max_id)}")
+
+    async def batch_detail(client, rng):
+        ids = [rng.randint(1, max_id) for _ in range(24)]
+        return await client.get("/recipes/batch", params={"id": ids})
+
+    async def search(client, rng):
+        return await client.get(
+            "/recipes/search", params={"q": " ".join(rng.sample(WORDS, 2))}
+        )
+
+    async def by_ingredients(client, rng):
+        return await client.get(
+            "/recipes/by-ingredients",
+            params={"ingredient": [ingredient(rng) for _ in range(3)], "match": "any"},
+        )
+
+    async def autocomplete(client, rng):
+        name = ingredient(rng)
+        return await client.get(
+            "/ingredients/autocomplete",
+            params={"prefix": name[: rng.randint(1, len(name))]},
+        )
+
+    async def top(client, rng):
+        return await client.get(
+            "/recipes/top", params={"limit": rng.choice((10, 50, 100))}
+        )
+
+    async def similar(client, rng):
+        return await client.get(f"/recipes/{rng.randint(1, max_id)}/similar")
+
+    async def create(client, rng):
+        return await client.post("/recipes/", json=new_recipe(rng))
+
+    async def bulk_import(client, rng):
+        body = "\n".join(json.dumps(new_recipe(rng)) for _ in range(100))
+        return await client.post("/recipes/import", content=body)
+
+    async def export(client, rng):
+        async with client.stream("GET", "/recipes/export") as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return response
+
+    async def cache_stats(client, rng):
+        return await client.get("/cache/stats")
+
+    return {
+        "list_first_page": list_first_page,
+        "list_second_page": list_second_page,
+        "detail": detail,
+        "batch_detail": batch_detail,
+        "search": search,
+        "by_ingredients": by_ingredients,
+        "autocomplete": autocomplete,
+        "top": top,
+        "similar": similar,
+        "create": create,
+        "import": bulk_import,
+        "export": export,
+        "cache_stats": cache_stats,
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """
+    Выполняет сценарий requests раз в concurrency параллельных клиентах.
+
+    Returns:
+        Dict[str, Any]: requests, errors, throughput_rps и перцентили
+        задержки p50_ms, p95_ms, p99_ms
+    """
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(worker_id: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, rng)
+                failed = response.status_code >= 500
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+@asynccontextmanager
+async def open_client(url: Optional[str]) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Открывает HTTP-клиент к серверу по URL или к приложению в этом процессе.
+
+    Notes:
+        - Без URL приложение запускается в процессе (ASGITransport) вместе
+          с обработчиками startup/shutdown, сеть не используется
+    """
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            yield client
+        return
+
+    from app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=60
+        ) as client:
+            yield client
+
+
+async def discover_max_id() -> int:
+    """
+    Возвращает максимальный ID рецепта в настроенной БД.
+    """
+    from database import read_session
+    from models import Recipe
+    from sqlalchemy import func, select
+
+    async with read_session() as session:
+        return (await session.scalar(select(func.max(Recipe.id)))) or 1
+
+
+async def serialization_benchmark(page_size: int, rounds: int) -> Dict[str, Any]:
+    """
+    Сравнивает сборку страницы списка из объектов ORM через Pydantic
+    и из колонок выборки через orjson на настроенной БД.
+
+    Args:
+        page_size (int): Рецептов на странице (может превышать MAX_PAGE_SIZE)
+        rounds (int): Сколько раз собрать страницу каждым способом
+
+    Returns:
+        Dict[str, Any]: Для каждого способа - байт прочитано из БД и отдано
+        в ответе на страницу, процессорное время на страницу в мс
+    """
+    import schemas
+    from database import read_session
+    from models import Recipe
+    from sqlalchemy import desc, select
+    from utils import recipe_page_json, recipes_page_query
+
+    def row_bytes(values: Any) -> int:
+        return sum(len(v.encode()) if isinstance(v, str) else 8 for v in values)
+
+    async def orm_pydantic(session) -> Any:
+        query = (
+            select(Recipe)
+            .order_by(desc(Recipe.views), Recipe.cooking_time, Recipe.id)
+            .limit(page_size)
+        )
+        recipes = (await session.execute(query)).scalars().all()
+        fetched = sum(
+            row_bytes((r.id, r.title, r.description, r.cooking_time, r.views))
+            for r in recipes
+        )
+        page = schemas.RecipePage.model_validate(
+            {"items": recipes, "next_cursor": None}, from_attributes=True
+        )
+        return fetched, page.model_dump_json().encode()
+
+    async def projected_orjson(session) -> Any:
+        rows = (await session.execute(recipes_page_query(page_size - 1))).all()
+        return sum(row_bytes(row) for row in rows), recipe_page_json(rows, None)
+
+    results: Dict[str, Any] = {}
+    for name, build in (
+        ("orm_pydantic", orm_pydantic),
+        ("projected_orjson", projected_orjson),
+    ):
+        async with read_session() as session:
+            await build(session)
+            started = time.process_time()
+            for _ in range(rounds):
+                fetched, payload = await build(session)
+                session.expunge_all()
+            cpu = time.process_time() - started
+        results[name] = {
+            "fetched_bytes": fetched,
+            "response_bytes": len(payload),
+            "cpu_ms_per_page": round(cpu / rounds * 1000, 3),
+        }
+    return {"page_size": page_size, "rounds": rounds, "paths": results}
+
+
+def autocomplete_benchmark(vocabulary: int, rounds: int) -> Dict[str, Any]:
+    """
+    Сравнивает подсказки ингредиентов из префиксного индекса в памяти
+    с запросом LIKE 'prefix%' к SQLite на синтетическом словаре.
+
+    Args:
+        vocabulary (int): Количество названий ингредиентов
+        rounds (int): Количество запросов подсказок; после каждого
+         запроса создаётся рецепт из трёх ингредиентов (в каждом
+         десятом - новый), как при обычной нагрузке
+
+    Returns:
+        Dict[str, Any]: Для каждого способа - время построения, p50, p99
+        и максимум времени запроса и p99 времени записи в мс
+    """
+    import sqlite3
+
+    from autocomplete import IngredientAutocomplete
+
+    rng = random.Random(0)
+    names = list(
+        dict.fromkeys(
+            f"{' '.join(rng.sample(WORDS, rng.randint(1, 3)))} {i}"
+            for i in range(vocabulary)
+        )
+    )
+    uses = [min(int(rng.paretovariate(1.0)), 10000) for _ in names]
+    prefixes = []
+    for name in rng.choices(names, k=rounds):
+        prefixes.append(name[: rng.randint(1, min(len(name), 8))])
+    writes = [
+        rng.sample(names, 3) if i % 10 else [*rng.sample(names, 2), f"new {i}"]
+        for i in range(rounds)
+    ]
+
+    started = time.perf_counter()
+    index = IngredientAutocomplete()
+    index.build(zip(names, uses))
+    index_build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE ingredients (name TEXT PRIMARY KEY, uses INTEGER)")
+    db.executemany("INSERT INTO ingredients VALUES (?, ?)", zip(names, uses))
+    db.execute("CREATE INDEX ix_ingredients_uses ON ingredients (uses)")
+    db.commit()
+    like_build = time.perf_counter() - started
+
+    def like(prefix: str) -> Any:
+        return db.execute(
+            "SELECT name, uses FROM ingredients WHERE name LIKE ? "
+            "ORDER BY uses DESC, name LIMIT 10",
+            (prefix + "%",),
+        ).fetchall()
+
+    def like_write(recipe: List[str]) -> None:
+        db.executemany(
+            "INSERT INTO ingredients VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET uses = uses + 1",
+            [(name,) for name in recipe],
+        )
+        db.commit()
+
+    results: Dict[str, Any] = {}
+    for name, build_seconds, suggest, write in (
+        (
+            "prefix_index",
+            index_build,
+            lambda prefix: index.suggest(prefix, 10),
+            lambda recipe: index.add_recipe(dict.fromkeys(recipe, 0)),
+        ),
+        ("sqlite_like", like_build, like, like_write),
+    ):
+        latencies: List[float] = []
+        write_latencies: List[float] = []
+        for prefix, recipe in zip(prefixes, writes):
+            started = time.perf_counter()
+            suggest(prefix)
+            latencies.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            write(recipe)
+            write_latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        write_latencies.sort()
+        results[name] = {
+            "build_s": round(build_seconds, 3),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 4),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+            "max_ms": round(latencies[-1] * 1000, 4),
+            "write_p99_ms": round(percentile(write_latencies, 0.99) * 1000, 4),
+        }
+    db.close()
+    return {"vocabulary": len(names), "rounds": rounds, "paths": results}
+
+
+def similarity_benchmark(recipes: int, rounds: int) -> Dict[str, Any]:
+    """
+    Сравнивает поиск похожих рецептов через индекс MinHash/LSH с точным
+    сравнением со всеми рецептами на синтетическом каталоге.
+
+    Args:
+        recipes (int): Количество рецептов
+        rounds (int): Количество запросов похожих рецептов
+
+    Returns:
+        Dict[str, Any]: Для каждого способа - время построения, p50 и p99
+        времени запроса в мс; для индекса - его размер и качество:
+        recall_at_0_5 (доля найденных рецептов со сходством ≥ 0.5 из
+        первых 10 точного поиска) и similarity_ratio (сумма сходств
+        первых 10 относительно точного поиска)
+
+    Notes:
+        - Ингредиенты выбираются по закону Ципфа, как в generate_data.py;
+          треть рецептов - вариации предыдущих с заменой 1-2 ингредиентов,
+          чтобы в каталоге были по-настоящему похожие рецепты
+    """
+    import itertools
+
+    from similarity import rank_by_jaccard, similar_recipes
+
+    rng = random.Random(0)
+    ranks = list(range(1, 5001))
+    weights = list(itertools.accumulate(1 / rank**1.1 for rank in ranks))
+    sets: Dict[int, Set[int]] = {}
+    for recipe_id in range(1, recipes + 1):
+        if recipe_id > 1 and rng.random() < 1 / 3:
+            chosen = set(sets[rng.randint(max(1, recipe_id - 1000), recipe_id - 1)])
+            for _ in range(rng.randint(1, 2)):
+                chosen.discard(rng.choice(sorted(chosen)))
+                chosen.add(rng.choices(ranks, cum_weights=weights)[0])
+        else:
+            size = rng.randint(3, 12)
+            chosen = set(rng.choices(ranks, cum_weights=weights, k=size))
+        sets[recipe_id] = chosen
+    queries = [rng.randint(1, recipes) for _ in range(rounds)]
+
+    started = time.perf_counter()
+    similar_recipes.build((recipe_id, sorted(s)) for recipe_id, s in sets.items())
+    index_build = time.perf_counter() - started
+
+    def lsh(recipe_id: int) -> List[Any]:
+        candidates = similar_recipes.candidates(sets[recipe_id], exclude=recipe_id)
+        return rank_by_jaccard(
+            sets[recipe_id], {id_: sets[id_] for id_ in candidates}, 10
+        )
+
+    def brute_force(recipe_id: int) -> List[Any]:
+        others = {id_: s for id_, s in sets.items() if id_ != recipe_id}
+        return rank_by_jaccard(sets[recipe_id], others, 10)
+
+    results: Dict[str, Any] = {}
+    answers: Dict[str, List[Any]] = {}
+    for name, build_seconds, search in (
+        ("minhash_lsh", index_build, lsh),
+        ("brute_force", 0.0, brute_force),
+    ):
+        latencies: List[float] = []
+        answers[name] = []
+        for recipe_id in queries:
+            started = time.perf_counter()
+            answers[name].append(search(recipe_id))
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        results[name] = {
+            "build_s": round(build_seconds, 3),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        }
+
+    expected = found = 0
+    found_similarity = exact_similarity = 0.0
+    for approximate, exact in zip(answers["minhash_lsh"], answers["brute_force"]):
+        approximate_ids = {id_ for id_, _ in approximate}
+        for id_, similarity in exact:
+            if similarity >= 0.5:
+                expected += 1
+                found += id_ in approximate_ids
+        found_similarity += sum(similarity for _, similarity in approximate)
+        exact_similarity += sum(similarity for _, similarity in exact)
+    results["minhash_lsh"].update(
+        memory_bytes=similar_recipes.memory_bytes,
+        recall_at_0_5=round(found / expected, 3) if expected else None,
+        similarity_ratio=round(found_similarity / exact_similarity, 3),
+    )
+    return {"recipes": recipes, "rounds": rounds, "paths": results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Считает относительные изменения метрик по сравнению с прошлым запуском.
+
+    Returns:
+        Dict[str, Any]: Для каждого общего сценария - изменение
+        throughput_rps, p50_ms, p95_ms и p99_ms в процентах
+    """
+    changes: Dict[str, Any] = {}
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((result[metric] / before[metric] - 1) * 100, 1)
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+            if before[metric]
+        }
+    return changes
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Drive the recipe API with concurrent clients and report "
+        "throughput and latency percentiles as JSON."
+    )
+    parser.add_argument("--url", help="Server URL; omit to run the app in-process.")
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=1000,
+        help="Requests per scenario (1%% of it for export, 10%% for import).",
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenario", action="append", help="Run only these.")
+    parser.add_argument("--max-id", type=int, help="Highest recipe id to request.")
+    parser.add_argument("--ingredients", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("--compare", help="Previous JSON report to compare with.")
+    parser.add_argument(
+        "--serialization",
+        type=int,
+        metavar="PAGE_SIZE",
+        help="Only compare ORM+Pydantic and projected+orjson list pages.",
+    )
+    parser.add_argument(
+        "--autocomplete",
+        type=int,
+        metavar="VOCABULARY",
+        help="Only compare the ingredient prefix index with SQLite LIKE.",
+    )
+    parser.add_argument(
+        "--similarity",
+        type=int,
+        metavar="RECIPES",
+        help="Only compare similar recipes via MinHash/LSH with brute force.",
+    )
+    args = parser.parse_args()
+
+    if args.similarity:
+        print(
+            json.dumps(similarity_benchmark(args.similarity, args.requests), indent=2)
+        )
+        return
+
+    if args.autocomplete:
+        print(
+            json.dumps(
+                autocomplete_benchmark(args.autocomplete, args.requests), indent=2
+            )
+        )
+        return
+
+    if args.serialization:
+        print(
+            json.dumps(
+                await serialization_benchmark(args.serialization, args.requests),
+                indent=2,
+            )
+        )
+        return
+
+    max_id: int = args.max_id or (1 if args.url else await discover_max_id())
+    scenarios = build_scenarios(max_id, args.ingredients)
+    selected: List[str] = args.scenario or list(scenarios)
+    report: Dict[str, Any] = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": args.url or "in-process",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "max_id": max_id,
+        "scenarios": {},
+    }
+    async with open_client(args.url) as client:
+        for name in selected:
+            requests = max(1, int(args.requests * REQUEST_SHARE.get(name, 1)))
+            report["scenarios"][name] = await run_scenario(
+                client, scenarios[name], requests, args.concurrency, args.seed
+            )
+    if args.compare:
+        with open(args.compare) as file:
+            report["compared_to"] = args.compare
+            report["changes_pct"] = compare(report, json.load(file))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,309 @@
+import hashlib
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from config import get_float, get_int, get_setting
+
+CacheKey = Tuple[str, str]
+
+
+class BaseCache:
+    """
+    Базовый класс кеша сериализованных ответов.
+
+    Записи сгруппированы по пространствам имён (например, "list" и "recipe"),
+    чтобы при записи можно было сбросить целую группу.
+
+    Атрибуты:
+        hits (int): Количество попаданий
+        misses (int): Количество промахов
+        evictions (int): Количество вытеснений по размеру
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Возвращает значение или None, если записи нет или она устарела.
+        """
+        value = self._get((namespace, key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        """
+        Сохраняет значение, при необходимости вытесняя старые записи.
+        """
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> None:
+        """
+        Удаляет одну запись.
+        """
+        raise NotImplementedError
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """
+        Удаляет все записи пространства имён (или вообще все записи).
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает счётчики кеша.
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions, entries и bytes
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self._entries(),
+            "bytes": self._bytes(),
+        }
+
+    def _get(self, key: CacheKey) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _entries(self) -> int:
+        raise NotImplementedError
+
+    def _bytes(self) -> int:
+        raise NotImplementedError
+
+
+class NullCache(BaseCache):
+    """
+    Отключённый кеш: ничего не хранит, каждое обращение - промах.
+    """
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        pass
+
+    def delete(self, namespace: str, key: str) -> None:
+        pass
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        pass
+
+    def _get(self, key: CacheKey) -> Optional[bytes]:
+        return None
+
+    def _entries(self) -> int:
+        return 0
+
+    def _bytes(self) -> int:
+        return 0
+
+
+class MemoryCache(BaseCache):
+    """
+    LRU-кеш в памяти процесса с TTL и ограничением по числу записей и байтам.
+
+    Атрибуты:
+        ttl (float): Время жизни записи в секундах
+        max_entries (int): Максимальное количество записей
+        max_bytes (int): Максимальный суммарный размер значений
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        max_bytes: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._data: "OrderedDict[CacheKey, Tuple[float, bytes]]" = OrderedDict()
+        self._size = 0
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        self._pop((namespace, key))
+        if len(value) > self.max_bytes:
+            return
+        self._data[(namespace, key)] = (self._clock() + self.ttl, value)
+        self._size += len(value)
+        while len(self._data) > self.max_entries or self._size > self.max_bytes:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._pop((namespace, key))
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        if namespace is None:
+            self._data.clear()
+            self._size = 0
+            return
+        for key in [key for key in self._data if key[0] == namespace]:
+            self._pop(key)
+
+    def _get(self, key: CacheKey) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            self._pop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _pop(self, key: CacheKey) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def _entries(self) -> int:
+        return len(self._data)
+
+    def _bytes(self) -> int:
+        return self._size
+
+
+class DiskCache(BaseCache):
+    """
+    Кеш на диске: по файлу на запись в подкаталоге пространства имён.
+
+    Срок жизни отсчитывается от времени изменения файла. Порядок вытеснения
+    (LRU) и размеры записей хранятся в памяти и восстанавливаются
+    сканированием каталога при создании кеша.
+
+    Атрибуты:
+        directory (str): Каталог кеша
+        ttl (float): Время жизни записи в секундах
+        max_entries (int): Максимальное количество записей
+        max_bytes (int): Максимальный суммарный размер файлов
+    """
+
+    def __init__(
+        self, directory: str, ttl: float, max_entries: int, max_bytes: int
+    ) -> None:
+        super().__init__()
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        files = [
+            entry
+            for namespace in os.scandir(directory)
+            if namespace.is_dir()
+            for entry in os.scandir(namespace.path)
+            if entry.is_file() and not entry.name.endswith(".tmp")
+        ]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self._index[entry.path] = entry.stat().st_size
+            self._size += entry.stat().st_size
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        path = self._path(namespace, key)
+        if len(value) > self.max_bytes:
+            self._remove(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(value)
+        os.replace(tmp_path, path)
+        self._forget(path)
+        self._index[path] = len(value)
+        self._size += len(value)
+        while len(self._index) > self.max_entries or self._size > self.max_bytes:
+            evicted, _ = next(iter(self._index.items()))
+            self._remove(evicted)
+            self.evictions += 1
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._remove(self._path(namespace, key))
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        directory = (
+            self.directory
+            if namespace is None
+            else os.path.join(self.directory, namespace)
+        )
+        prefix = os.path.join(directory, "")
+        for path in [path for path in self._index if path.startswith(prefix)]:
+            self._forget(path)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _get(self, key: CacheKey) -> Optional[bytes]:
+        path = self._path(*key)
+        try:
+            if os.stat(path).st_mtime + self.ttl <= time.time():
+                self._remove(path)
+                return None
+            with open(path, "rb") as file:
+                value = file.read()
+        except FileNotFoundError:
+            self._forget(path)
+            return None
+        if path in self._index:
+            self._index.move_to_end(path)
+        return value
+
+    def _path(self, namespace: str, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, namespace, digest)
+
+    def _forget(self, path: str) -> None:
+        size = self._index.pop(path, None)
+        if size is not None:
+            self._size -= size
+
+    def _remove(self, path: str) -> None:
+        self._forget(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _entries(self) -> int:
+        return len(self._index)
+
+    def _bytes(self) -> int:
+        return self._size
+
+
+def create_cache() -> BaseCache:
+    """
+    Создаёт кеш по настройкам секции [cache].
+
+    Returns:
+        BaseCache: MemoryCache (backend = memory), DiskCache (backend = disk)
+        или NullCache (backend = none)
+    """
+    backend = get_setting("cache", "backend", "memory")
+    ttl = get_float("cache", "ttl", 60)
+    max_entries = get_int("cache", "max_entries", 10000)
+    max_bytes = get_int("cache", "max_bytes", 64 * 1024 * 1024)
+    if backend == "memory":
+        return MemoryCache(ttl, max_entries, max_bytes)
+    if backend == "disk":
+        directory = get_setting("cache", "directory", ".cache")
+        return DiskCache(directory, ttl, max_entries, max_bytes)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+recipe_cache: BaseCache = create_cache()
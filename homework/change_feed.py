@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set
+
+from config import get_float, get_int
+from database import async_session, read_session
+from models import CatalogChange, Ingredient, RecipeIngredient
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+logger = logging.getLogger(__name__)
+
+# Идентификатор процесса в журнале: по нему воркер пропускает свои записи.
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+async def record_views_change(session: AsyncSession) -> None:
+    """
+    Отмечает в журнале запись просмотров этим воркером.
+
+    Args:
+        session (AsyncSession): Сессия с открытой транзакцией записи
+         просмотров, чтобы отметка фиксировалась вместе с ними
+    """
+    await session.execute(
+        insert(CatalogChange).values(origin=WORKER_ID, created_at=time.time())
+    )
+
+
+class ChangeFeed:
+    """
+    Опрос журнала catalog_changes для согласования состояния воркеров.
+
+    Каждый воркер читает новые записи журнала раз в poll_interval секунд
+    и передаёт их слушателям: добавленные рецепты (с ID ингредиентов)
+    и отметки о записи просмотров другими воркерами. Поэтому кеши
+    и индексы в памяти воркера отстают от изменений, сделанных
+    в других процессах, не больше чем на poll_interval.
+
+    Номер и время последней прочитанной записи журнала служат общей
+    для всех воркеров версией каталога (ETag и Last-Modified списка):
+    все рецепты и записи просмотров попадают в журнал, поэтому воркеры,
+    прочитавшие журнал до одной записи, отдают одну версию.
+
+    Атрибуты:
+        poll_interval (float): Период опроса в секундах
+        retention (float): Сколько секунд хранятся записи журнала
+        max_batch (int): Если новых записей больше, вместо их разбора
+         вызываются слушатели сброса (полная перезагрузка состояния)
+        modified (float): Время последней прочитанной записи журнала
+         или ещё не прочитанного изменения этого процесса (Unix time)
+    """
+
+    def __init__(
+        self,
+        read_session_factory: Callable[[], AsyncSession],
+        write_session_factory: Callable[[], AsyncSession],
+        poll_interval: float,
+        retention: float,
+        max_batch: int,
+    ) -> None:
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.max_batch = max_batch
+        self._read_session_factory = read_session_factory
+        self._write_session_factory = write_session_factory
+        self._last_id = 0
+        self._last_prune = 0.0
+        self._local_changes = 0
+        self.modified = time.time()
+        self._applied: Set[int] = set()
+        self._recipes_listeners: List[
+            Callable[[Mapping[int, Mapping[str, int]]], None]
+        ] = []
+        self._views_listeners: List[Callable[[], None]] = []
+        self._reset_listeners: List[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_recipes_listener(
+        self, listener: Callable[[Mapping[int, Mapping[str, int]]], None]
+    ) -> None:
+        """
+        Регистрирует функцию, получающую рецепты, добавленные другими
+        процессами (ID ингредиентов по названиям для каждого рецепта).
+        """
+        self._recipes_listeners.append(listener)
+
+    def add_views_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Регистрирует функцию, вызываемую после записи просмотров другим
+        воркером.
+        """
+        self._views_listeners.append(listener)
+
+    def add_reset_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Регистрирует функцию полной перезагрузки состояния: вызывается,
+        если воркер отстал от журнала (записи удалены или их больше
+        max_batch).
+        """
+        self._reset_listeners.append(listener)
+
+    @property
+    def version(self) -> str:
+        """
+        Версия каталога, которую видит этот процесс.
+
+        Notes:
+            - Пока изменения этого процесса не прочитаны из журнала,
+              к номеру записи добавляется WORKER_ID и их число: версия
+              меняется сразу, а после следующего опроса снова совпадает
+              с версией других воркеров
+        """
+        if self._local_changes:
+            return f"{self._last_id}-{WORKER_ID}-{self._local_changes}"
+        return str(self._last_id)
+
+    def mark_changed(self) -> None:
+        """
+        Отмечает изменение каталога, зафиксированное этим процессом
+        (рецепты, запись просмотров), до его чтения из журнала.
+        """
+        self._local_changes += 1
+        self.modified = time.time()
+
+    def mark_applied(self, recipes_ids: Iterable[int]) -> None:
+        """
+        Запоминает рецепты, уже учтённые этим процессом, чтобы не
+        применять их повторно при чтении журнала.
+        """
+        self._applied.update(recipes_ids)
+
+    async def seek_to_end(self) -> None:
+        """
+        Начинает чтение журнала с текущего конца.
+
+        Notes:
+            - Вызывается при запуске до построения индексов в памяти:
+              всё, что они не увидят, окажется в журнале после этой точки
+        """
+        async with self._read_session_factory() as session:
+            await self._seek_to_end(session)
+
+    async def poll(self) -> int:
+        """
+        Читает новые записи журнала и вызывает слушателей.
+
+        Returns:
+            int: Количество прочитанных записей
+
+        Notes:
+            - Изменения этого процесса, отмеченные mark_changed() до начала
+              опроса, уже зафиксированы и прочитаны им из журнала, поэтому
+              после опроса версия снова состоит только из номера записи
+        """
+        local_changes = self._local_changes
+        async with self._read_session_factory() as session:
+            res = await session.execute(
+                select(
+                    CatalogChange.id,
+                    CatalogChange.recipe_id,
+                    CatalogChange.origin,
+                    CatalogChange.created_at,
+                )
+                .filter(CatalogChange.id > self._last_id)
+                .order_by(CatalogChange.id)
+                .limit(self.max_batch + 1)
+            )
+            rows = res.all()
+            if not rows:
+                self._forget_local_changes(local_changes)
+                return 0
+            if rows[0].id != self._last_id + 1 or len(rows) > self.max_batch:
+                await self._seek_to_end(session)
+                self._forget_local_changes(local_changes)
+                self._applied.clear()
+                for listener in self._reset_listeners:
+                    listener()
+                return len(rows)
+            self._last_id = rows[-1].id
+            self.modified = rows[-1].created_at
+            self._forget_local_changes(local_changes)
+
+            views = any(
+                row.recipe_id is None and row.origin != WORKER_ID for row in rows
+            )
+            recipes_ids: List[int] = []
+            for row in rows:
+                if row.recipe_id is None:
+                    continue
+                if row.recipe_id in self._applied:
+                    self._applied.discard(row.recipe_id)
+                else:
+                    recipes_ids.append(row.recipe_id)
+            recipes: Dict[int, Dict[str, int]] = {}
+            if recipes_ids:
+                recipes = {recipe_id: {} for recipe_id in recipes_ids}
+                res = await session.execute(
+                    select(RecipeIngredient.recipe_id, Ingredient.name, Ingredient.id)
+                    .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+                    .filter(RecipeIngredient.recipe_id.in_(recipes_ids))
+                )
+                for recipe_id, name, ingredient_id in res:
+                    recipes[recipe_id][name] = ingredient_id
+
+        if recipes:
+            for listener in self._recipes_listeners:
+                listener(recipes)
+        if views:
+            for listener in self._views_listeners:
+                listener()
+        return len(rows)
+
+    async def prune(self) -> int:
+        """
+        Удаляет записи журнала старше retention секунд.
+
+        Returns:
+            int: Количество удалённых записей
+        """
+        async with self._write_session_factory() as session:
+            async with session.begin():
+                res = await session.execute(
+                    delete(CatalogChange).filter(
+                        CatalogChange.created_at < time.time() - self.retention
+                    )
+                )
+        return res.rowcount
+
+    async def start(self) -> None:
+        """
+        Запускает фоновый опрос журнала.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновый опрос журнала.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _seek_to_end(self, session: AsyncSession) -> None:
+        last = (
+            await session.execute(
+                select(CatalogChange.id, CatalogChange.created_at)
+                .order_by(CatalogChange.id.desc())
+                .limit(1)
+            )
+        ).first()
+        if last is not None:
+            self._last_id, self.modified = last
+        else:
+            self._last_id = 0
+
+    def _forget_local_changes(self, local_changes: int) -> None:
+        if self._local_changes == local_changes:
+            self._local_changes = 0
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+                if time.monotonic() - self._last_prune > self.retention / 4:
+                    self._last_prune = time.monotonic()
+                    await self.prune()
+            except SQLAlchemyError:
+                logger.exception("Failed to read the catalog change log")
+
+
+change_feed = ChangeFeed(
+    read_session,
+    async_session,
+    poll_interval=get_float("workers", "poll_interval", 0.5),
+    retention=get_float("workers", "change_log_retention", 3600),
+    max_batch=get_int("workers", "change_log_max_batch", 10000),
+)
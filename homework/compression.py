@@ -0,0 +1,140 @@
+import zlib
+from typing import List, Optional
+
+from config import get_int, get_setting
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него доступен только gzip
+    brotli = None
+
+COMPRESSION_ENCODINGS = [
+    encoding.strip()
+    for encoding in get_setting("http", "compression", "br, gzip").split(",")
+    if encoding.strip() in ("gzip", "br")
+]
+COMPRESSION_MINIMUM_SIZE = get_int("http", "compression_minimum_size", 1024)
+GZIP_LEVEL = get_int("http", "gzip_level", 6)
+BROTLI_QUALITY = get_int("http", "brotli_quality", 4)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """
+    Возвращает кодировки из Accept-Encoding, которые клиент принимает (q > 0).
+    """
+    encodings: List[str] = []
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            encodings.append(name.strip().lower())
+    return encodings
+
+
+class Compressor:
+    """
+    Потоковое сжатие тела ответа в gzip или brotli.
+    """
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(
+                GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16
+            )
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """
+        Сжимает очередную часть тела; final=True завершает поток.
+        """
+        if self.encoding == "br":
+            chunk = self._brotli.process(data)
+            return chunk + (self._brotli.finish() if final else self._brotli.flush())
+        chunk = self._zlib.compress(data)
+        return chunk + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware, сжимающее JSON и текстовые ответы (brotli или gzip).
+
+    Кодировка выбирается по порядку [http] compression среди принятых
+    клиентом (brotli - только если установлен пакет brotli). Ответы меньше
+    compression_minimum_size байт, уже сжатые и 304 отдаются как есть;
+    потоковые ответы (выгрузка каталога) сжимаются по частям.
+    """
+
+    def __init__(self, app, encodings: Optional[List[str]] = None) -> None:
+        self.app = app
+        self.encodings = [
+            encoding
+            for encoding in (COMPRESSION_ENCODINGS if encodings is None else encodings)
+            if encoding != "br" or brotli is not None
+        ]
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = next((e for e in self.encodings if e in accepted), None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message) -> None:
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                compressible = content_type.startswith(COMPRESSIBLE_TYPES)
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                if (
+                    not compressible
+                    or "content-encoding" in headers
+                    or start_message["status"] in (204, 304)
+                    or (not more_body and len(body) < COMPRESSION_MINIMUM_SIZE)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                body = compressor.compress(body, final=not more_body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                await send({**message, "body": body})
+                return
+            await send(
+                {**message, "body": compressor.compress(body, final=not more_body)}
+            )
+
+        await self.app(scope, receive, send_compressed)
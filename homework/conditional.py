@@ -0,0 +1,77 @@
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Mapping
+
+from config import get_int
+from fastapi import Response, status
+
+RECIPE_MAX_AGE = get_int("http", "recipe_max_age", 60)
+LIST_MAX_AGE = get_int("http", "list_max_age", 0)
+
+
+def cache_headers(etag: str, last_modified: float, max_age: int) -> Dict[str, str]:
+    """
+    Возвращает заголовки для условных запросов и кеширования ответа.
+
+    Args:
+        etag (str): Значение ETag (в кавычках, слабый - с префиксом W/)
+        last_modified (float): Время изменения данных ответа (Unix time)
+        max_age (int): Сколько секунд клиент может не перепроверять ответ
+
+    Returns:
+        Dict[str, str]: ETag, Last-Modified и Cache-Control
+    """
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}, must-revalidate",
+    }
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Сравнивает ETag со значением If-None-Match (слабое сравнение, RFC 9110).
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.strip().removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    headers: Mapping[str, str], etag: str, last_modified: float
+) -> bool:
+    """
+    Проверяет, есть ли у клиента актуальная версия ответа.
+
+    Args:
+        headers (Mapping[str, str]): Заголовки запроса
+        etag (str): Текущий ETag ответа
+        last_modified (float): Текущее время изменения данных ответа
+
+    Returns:
+        bool: True, если можно ответить 304 Not Modified
+
+    Notes:
+        - If-None-Match имеет приоритет: If-Modified-Since проверяется,
+          только если его нет
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """
+    Возвращает ответ 304 Not Modified с заголовками кеширования.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
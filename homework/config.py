@@ -0,0 +1,57 @@
+import os
+from configparser import ConfigParser
+
+CONFIG_PATH = os.environ.get(
+    "APP_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "CONFIG")
+)
+
+_parser = ConfigParser(interpolation=None)
+_parser.read(CONFIG_PATH)
+
+
+def get_setting(section: str, option: str, default: str) -> str:
+    """
+    Возвращает значение настройки приложения.
+
+    Args:
+        section (str): Секция файла CONFIG (например, "database")
+        option (str): Имя параметра в секции (например, "pool_size")
+        default (str): Значение по умолчанию
+
+    Returns:
+        str: Значение настройки
+
+    Notes:
+        - Переменная окружения SECTION_OPTION (например, DATABASE_POOL_SIZE)
+          имеет приоритет над файлом CONFIG
+        - Путь к файлу настроек можно переопределить переменной APP_CONFIG
+    """
+    value = os.environ.get(f"{section}_{option}".upper())
+    if value is not None:
+        return value
+    return _parser.get(section, option, fallback=default)
+
+
+def get_int(section: str, option: str, default: int) -> int:
+    """
+    Возвращает целочисленную настройку (см. get_setting).
+    """
+    return int(get_setting(section, option, str(default)))
+
+
+def get_float(section: str, option: str, default: float) -> float:
+    """
+    Возвращает вещественную настройку (см. get_setting).
+    """
+    return float(get_setting(section, option, str(default)))
+
+
+def get_bool(section: str, option: str, default: bool) -> bool:
+    """
+    Возвращает логическую настройку (см. get_setting).
+
+    Notes:
+        - Истинными считаются значения 1, true, yes, on (без учёта регистра)
+    """
+    value = get_setting(section, option, str(default))
+    return value.strip().lower() in ("1", "true", "yes", "on")
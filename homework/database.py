@@ -1,15 +1,169 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncIterator, Dict
+
+from config import get_bool, get_float, get_int, get_setting
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "sqlite+aiosqlite:///./app.py.db"
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка между процессами недоступна
+    fcntl = None
+
+DATABASE_URL = get_setting("database", "url", "sqlite+aiosqlite:///./app.py.db")
+DATABASE_ECHO = get_bool("database", "echo", False)
+
+# Профиль SQLite: применяется к каждому новому соединению (см. apply_pragmas).
+SQLITE_PRAGMAS = {
+    "busy_timeout": get_int("database", "busy_timeout", 5000),
+    "synchronous": get_setting("database", "synchronous", "normal"),
+    "cache_size": get_int("database", "cache_size", -65536),
+    "mmap_size": get_int("database", "mmap_size", 268435456),
+}
+SQLITE_JOURNAL_MODE = get_setting("database", "journal_mode", "wal")
+
+
+def is_memory_database(url: str) -> bool:
+    """
+    Проверяет, указывает ли URL на SQLite в памяти.
+    """
+    return make_url(url).database in (None, "", ":memory:")
+
+
+def pool_options(url: str, writer: bool = False) -> Dict[str, Any]:
+    """
+    Возвращает параметры пула соединений из настроек.
+
+    Args:
+        url (str): URL базы данных
+        writer (bool): True для пула движка записи
+         (writer_pool_size, writer_max_overflow)
+
+    Returns:
+        Dict[str, Any]: pool_size, max_overflow и pool_timeout для
+        create_async_engine; для SQLite в памяти - пустой словарь,
+        так как она работает через единственное соединение (StaticPool)
+    """
+    if is_memory_database(url):
+        return {}
+    prefix = "writer_" if writer else ""
+    return {
+        "pool_size": get_int("database", f"{prefix}pool_size", 1 if writer else 5),
+        "max_overflow": get_int(
+            "database", f"{prefix}max_overflow", 0 if writer else 10
+        ),
+        "pool_timeout": get_float("database", "pool_timeout", 30),
+    }
+
+
+def apply_pragmas(engine: AsyncEngine, read_only: bool) -> None:
+    """
+    Настраивает каждое новое соединение движка по профилю SQLite.
+
+    Args:
+        engine (AsyncEngine): Движок SQLite
+        read_only (bool): True для движка чтения: соединения получают
+         PRAGMA query_only и не меняют journal_mode
+
+    Notes:
+        - WAL позволяет читателям работать параллельно с записью;
+          synchronous=NORMAL в режиме WAL не теряет согласованность
+          при сбое, а лишь последние транзакции при отключении питания
+        - cache_size и mmap_size уменьшают число системных вызовов чтения
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = 1")
+        cursor.close()
+
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(
+    DATABASE_URL, echo=DATABASE_ECHO, **pool_options(DATABASE_URL, writer=True)
+)
+apply_pragmas(engine, read_only=False)
+
+# Отдельный пул только для чтения. Для SQLite в памяти второй движок увидел бы
+# другую (пустую) базу, поэтому чтение идёт через движок записи.
+if is_memory_database(DATABASE_URL):
+    reader_engine = engine
+else:
+    reader_engine = create_async_engine(
+        DATABASE_URL, echo=DATABASE_ECHO, **pool_options(DATABASE_URL)
+    )
+    apply_pragmas(reader_engine, read_only=True)
 
 
 async_session = sessionmaker(  # noqa
     engine, expire_on_commit=False, class_=AsyncSession
 )
 
-session: AsyncSession = async_session()
+read_session = sessionmaker(  # noqa
+    reader_engine, expire_on_commit=False, class_=AsyncSession
+)
+
 Base = declarative_base()
+
+
+@asynccontextmanager
+async def startup_lock() -> AsyncIterator[None]:
+    """
+    Блокировка между процессами на время подготовки БД при запуске.
+
+    Notes:
+        - Воркеры uvicorn запускаются одновременно; блокировка (flock на
+          файле <БД>.lock) не даёт им параллельно мигрировать схему
+          и заполнять пустую БД
+        - Для SQLite в памяти БД у каждого процесса своя, блокировка
+          не нужна
+    """
+    if fcntl is None or is_memory_database(DATABASE_URL):
+        yield
+        return
+    with open(f"{make_url(DATABASE_URL).database}.lock", "a") as lock_file:
+        await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI-зависимость: отдельная сессия (и транзакция) на каждый запрос.
+
+    Yields:
+        AsyncSession: Сессия движка записи, которая закрывается
+        по завершении запроса, возвращая соединение в пул
+    """
+    async with async_session() as session:
+        yield session
+
+
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI-зависимость: сессия только для чтения на каждый запрос.
+
+    Yields:
+        AsyncSession: Сессия пула читателей; в режиме WAL такие запросы
+        не ждут завершения записи
+    """
+    async with read_session() as session:
+        yield session
+
+
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
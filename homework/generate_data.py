@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Dict, List
+
+from database import engine
+from migrations import migrate
+from models import Ingredient, Recipe, RecipeIngredient
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Словарь для описаний: бенчмарк ищет по этим же словам (benchmark.py).
+WORDS = (
+    "baked boiled braised crispy creamy fresh fried grilled hearty light "
+    "quick roasted rustic savory simple slow smoky spicy steamed sweet "
+    "tangy tender warm zesty soup salad stew pie bowl curry pasta sauce"
+).split()
+
+
+def ingredient_name(rank: int) -> str:
+    """
+    Возвращает название ингредиента по его рангу частоты (с 1).
+    """
+    return f"Ingredient {rank}"
+
+
+async def generate(
+    target: AsyncEngine,
+    recipes: int,
+    ingredients: int = 5000,
+    zipf_s: float = 1.1,
+    min_per_recipe: int = 3,
+    max_per_recipe: int = 12,
+    batch_size: int = 5000,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Заполняет БД синтетическим каталогом рецептов.
+
+    Args:
+        target (AsyncEngine): Движок заполняемой БД
+        recipes (int): Количество новых рецептов
+        ingredients (int): Размер словаря ингредиентов
+        zipf_s (float): Показатель распределения Ципфа: ингредиент ранга k
+         выбирается с вероятностью, пропорциональной 1 / k ** zipf_s
+        min_per_recipe (int): Минимум ингредиентов в рецепте
+        max_per_recipe (int): Максимум ингредиентов в рецепте
+        batch_size (int): Рецептов в одной транзакции
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        Dict[str, Any]: recipes, links и seconds - итоги заполнения
+
+    Notes:
+        - Схема создаётся или обновляется migrate() и получает версию
+          SCHEMA_VERSION, поэтому первый запуск приложения не выполняет
+          миграции по заполненным таблицам; существующие данные
+          сохраняются, названия новых рецептов продолжают нумерацию
+          после max(id)
+        - Вставка выполняется пакетными executemany INSERT
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    async with target.begin() as conn:
+        await migrate(conn)
+        await conn.execute(
+            sqlite_insert(Ingredient).on_conflict_do_nothing(),
+            [{"name": ingredient_name(rank)} for rank in range(1, ingredients + 1)],
+        )
+        res = await conn.execute(select(Ingredient.id, Ingredient.name))
+        ids_by_name: Dict[str, int] = {name: id_ for id_, name in res}
+        first_id: int = (await conn.scalar(select(func.max(Recipe.id)))) or 0
+
+    ranks: List[int] = list(range(1, ingredients + 1))
+    cum_weights: List[float] = list(
+        itertools.accumulate(1 / rank**zipf_s for rank in ranks)
+    )
+    links = 0
+    for start in range(0, recipes, batch_size):
+        recipe_rows: List[Dict[str, Any]] = []
+        link_rows: List[Dict[str, int]] = []
+        for recipe_id in range(
+            first_id + start + 1, first_id + min(start + batch_size, recipes) + 1
+        ):
+            recipe_rows.append(
+                {
+                    "id": recipe_id,
+                    "title": f"Generated Recipe {recipe_id}",
+                    "description": " ".join(rng.choices(WORDS, k=rng.randint(8, 30))),
+                    "cooking_time": rng.randint(5, 180),
+                    "views": int(rng.paretovariate(1.2)) - 1,
+                }
+            )
+            size: int = rng.randint(min_per_recipe, max_per_recipe)
+            chosen = set(rng.choices(ranks, cum_weights=cum_weights, k=size))
+            link_rows.extend(
+                {
+                    "recipe_id": recipe_id,
+                    "ingredient_id": ids_by_name[ingredient_name(rank)],
+                }
+                for rank in chosen
+            )
+        async with target.begin() as conn:
+            await conn.execute(insert(Recipe), recipe_rows)
+            await conn.execute(insert(RecipeIngredient), link_rows)
+        links += len(link_rows)
+
+    return {
+        "recipes": recipes,
+        "links": links,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fill the configured database with a synthetic catalog."
+    )
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--ingredients", type=int, default=5000)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--min-per-recipe", type=int, default=3)
+    parser.add_argument("--max-per-recipe", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    result = await generate(
+        engine,
+        args.recipes,
+        ingredients=args.ingredients,
+        zipf_s=args.zipf_s,
+        min_per_recipe=args.min_per_recipe,
+        max_per_recipe=args.max_per_recipe,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
+    await engine.dispose()
+    print(result)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,166 @@
+import asyncio
+from typing import Dict, Iterable, Mapping, Optional, Set
+
+from metrics import (
+    INGREDIENT_DICTIONARY_MISSES,
+    INGREDIENT_LOOKUP_QUERIES,
+    INGREDIENT_LOOKUPS,
+    INGREDIENTS_CREATED,
+)
+from models import Ingredient, ingredient_key, normalize_name
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+
+class IngredientDictionary:
+    """
+    Словарь "название -> ID" всех ингредиентов в памяти процесса.
+
+    Заполняется из таблицы ingredients при запуске и дополняется после
+    фиксации рецептов с новыми ингредиентами (в том числе созданных
+    другими воркерами - из журнала изменений), поэтому известные названия
+    разрешаются в ID без обращения к БД. Названия сравниваются по
+    ingredient_key(): "Eggs", "eggs" и " eggs " - один ингредиент
+    с написанием, под которым он был добавлен первым.
+
+    Атрибуты:
+        ready (bool): Словарь заполнен из БД
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Заполняет словарь заново из таблицы ingredients.
+
+        Notes:
+            - Из уже накопившихся почти одинаковых строк ingredients
+              используется строка с наименьшим ID
+        """
+        ids: Dict[str, int] = {}
+        names: Dict[int, str] = {}
+        res = await session.execute(
+            select(Ingredient.id, Ingredient.name).order_by(Ingredient.id)
+        )
+        for id_, name in res:
+            key = ingredient_key(name)
+            if key not in ids:
+                ids[key] = id_
+                names[id_] = name
+        self._ids = ids
+        self._names = names
+        self.ready = True
+
+    def add(self, ingredients_ids: Mapping[str, int]) -> None:
+        """
+        Добавляет ингредиенты, уже зафиксированные в БД.
+
+        Args:
+            ingredients_ids (Mapping[str, int]): ID ингредиентов по названиям
+        """
+        for name, id_ in ingredients_ids.items():
+            key = ingredient_key(name)
+            if key not in self._ids:
+                self._ids[key] = id_
+                self._names[id_] = name
+
+    def get(self, name: str) -> Optional[int]:
+        """
+        Возвращает ID ингредиента по названию или None, если его нет.
+        """
+        return self._ids.get(ingredient_key(name))
+
+    async def resolve(
+        self, session: AsyncSession, names: Iterable[str]
+    ) -> Dict[str, int]:
+        """
+        Возвращает ID ингредиентов, добавляя в БД отсутствующие.
+
+        Args:
+            session (AsyncSession): Сессия текущего запроса
+            names (Iterable[str]): Названия ингредиентов
+
+        Returns:
+            Dict[str, int]: ID по названию, под которым ингредиент хранится
+            в БД (по одному элементу на ингредиент; пустые названия
+            пропускаются)
+
+        Notes:
+            - Названия из словаря разрешаются без запросов к БД
+            - Отсутствующие вставляются одним INSERT ... ON CONFLICT
+              DO NOTHING RETURNING id, name под блокировкой процесса:
+              одновременные создания рецептов с одним новым ингредиентом
+              не вставляют его параллельно, а проверяют словарь заново
+              после ожидания
+            - Между воркерами дубли исключает уникальный индекс
+              ingredients.name_key: ID ингредиентов, уже добавленных другим
+              воркером (в том числе в другом написании), дочитываются
+              одним SELECT по ключу
+            - Словарь пополняется только после фиксации транзакции
+              (add()), поэтому ID из откатившейся транзакции в него
+              не попадают
+        """
+        resolved: Dict[str, int] = {}
+        missing: Dict[str, str] = {}
+        for name in names:
+            key = ingredient_key(name)
+            if not key:
+                continue
+            INGREDIENT_LOOKUPS.inc()
+            id_ = self._ids.get(key)
+            if id_ is not None:
+                resolved[self._names[id_]] = id_
+            else:
+                missing.setdefault(key, normalize_name(name))
+        if not missing:
+            return resolved
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for key in list(missing):
+                id_ = self._ids.get(key)
+                if id_ is not None:
+                    resolved[self._names[id_]] = id_
+                    del missing[key]
+            if missing:
+                INGREDIENT_DICTIONARY_MISSES.inc(len(missing))
+                resolved.update(await self._insert(session, missing))
+        return resolved
+
+    @staticmethod
+    async def _insert(
+        session: AsyncSession, names: Mapping[str, str]
+    ) -> Dict[str, int]:
+        # names - написание каждого нового ингредиента по его ключу.
+        inserted = await session.execute(
+            sqlite_insert(Ingredient)
+            .values([{"name": name, "name_key": key} for key, name in names.items()])
+            .on_conflict_do_nothing()
+            .returning(Ingredient.id, Ingredient.name)
+        )
+        ingredients_ids: Dict[str, int] = {name: id_ for id_, name in inserted}
+        INGREDIENTS_CREATED.inc(len(ingredients_ids))
+        existing: Set[str] = {
+            key for key, name in names.items() if name not in ingredients_ids
+        }
+        if existing:
+            res = await session.execute(
+                select(Ingredient.id, Ingredient.name).filter(
+                    Ingredient.name_key.in_(existing)
+                )
+            )
+            ingredients_ids.update((name, id_) for id_, name in res)
+            INGREDIENT_LOOKUP_QUERIES.inc()
+        return ingredients_ids
+
+
+ingredient_dictionary = IngredientDictionary()
@@ -0,0 +1,188 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from models import Ingredient, RecipeIngredient, ingredient_key
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс "ингредиент -> рецепты" в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив ID рецептов
+    (array('i'), 4 байта на связь), для каждого рецепта - число его
+    ингредиентов. Индекс строится при запуске из recipe_ingredient и
+    дополняется при создании рецептов, поэтому запросы по ингредиентам
+    не обращаются к БД. Названия сравниваются по ingredient_key(), как
+    в словаре ингредиентов; связи с уже накопившимися почти одинаковыми
+    строками ingredients относятся к строке с наименьшим ID.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self._ids_by_key: Dict[str, int] = {}
+        self._postings: Dict[int, array] = {}
+        self._recipe_sizes: array = array("i")
+        self._loading = False
+        self._backlog: List[Tuple[int, Mapping[str, int]]] = []
+
+    async def load(self, session: AsyncSession, batch_size: int = 10000) -> None:
+        """
+        Строит индекс заново по таблицам ingredients и recipe_ingredient.
+
+        Args:
+            session (AsyncSession): Сессия для чтения
+            batch_size (int): Количество связей, читаемых из курсора за раз
+
+        Notes:
+            - Рецепты, добавленные через add_recipe во время построения,
+              запоминаются и применяются к новому индексу после замены
+        """
+        self._loading = True
+        try:
+            await self._load(session, batch_size)
+        finally:
+            self._loading = False
+            backlog, self._backlog = self._backlog, []
+        for recipe_id, ingredients_ids in backlog:
+            self.add_recipe(recipe_id, ingredients_ids)
+        self.ready = True
+
+    async def _load(self, session: AsyncSession, batch_size: int) -> None:
+        ids_by_key: Dict[str, int] = {}
+        canonical_ids: Dict[int, int] = {}
+        res = await session.execute(
+            select(Ingredient.id, Ingredient.name).order_by(Ingredient.id)
+        )
+        for id_, name in res:
+            canonical_id = ids_by_key.setdefault(ingredient_key(name), id_)
+            if canonical_id != id_:
+                canonical_ids[id_] = canonical_id
+
+        postings: Dict[int, array] = {}
+        recipe_sizes: array = array("i")
+        result = await session.stream(
+            select(RecipeIngredient.ingredient_id, RecipeIngredient.recipe_id)
+            .order_by(RecipeIngredient.ingredient_id, RecipeIngredient.recipe_id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            for ingredient_id, recipe_id in partition:
+                self._grow(recipe_sizes, recipe_id)
+                canonical_id = canonical_ids.get(ingredient_id)
+                if canonical_id is None:
+                    postings.setdefault(ingredient_id, array("i")).append(recipe_id)
+                elif not self._insert(
+                    postings.setdefault(canonical_id, array("i")), recipe_id
+                ):
+                    continue
+                recipe_sizes[recipe_id] += 1
+
+        self._ids_by_key = ids_by_key
+        self._postings = postings
+        self._recipe_sizes = recipe_sizes
+
+    def add_recipe(self, recipe_id: int, ingredients_ids: Mapping[str, int]) -> None:
+        """
+        Добавляет в индекс только что созданный рецепт.
+
+        Args:
+            recipe_id (int): ID рецепта
+            ingredients_ids (Mapping[str, int]): ID ингредиентов рецепта
+             по их названиям
+        """
+        if self._loading:
+            self._backlog.append((recipe_id, ingredients_ids))
+        for name, ingredient_id in ingredients_ids.items():
+            self._ids_by_key.setdefault(ingredient_key(name), ingredient_id)
+        self._grow(self._recipe_sizes, recipe_id)
+        for ingredient_id in set(ingredients_ids.values()):
+            posting = self._postings.setdefault(ingredient_id, array("i"))
+            if self._insert(posting, recipe_id):
+                self._recipe_sizes[recipe_id] += 1
+
+    def lookup(self, names: Iterable[str]) -> List[Optional[int]]:
+        """
+        Возвращает ID ингредиентов по названиям (None для неизвестных);
+        регистр и лишние пробелы не учитываются.
+        """
+        return [self._ids_by_key.get(ingredient_key(name)) for name in names]
+
+    def match_all(self, ingredients_ids: Sequence[int]) -> List[int]:
+        """
+        Возвращает рецепты, в которых есть все перечисленные ингредиенты.
+
+        Notes:
+            - Пересечение начинается с самого короткого списка, остальные
+              проверяются двоичным поиском
+        """
+        if not ingredients_ids:
+            return []
+        postings = sorted(
+            (self._postings.get(id_, array("i")) for id_ in set(ingredients_ids)),
+            key=len,
+        )
+        return [
+            recipe_id
+            for recipe_id in postings[0]
+            if all(self._contains(posting, recipe_id) for posting in postings[1:])
+        ]
+
+    def match_any(self, ingredients_ids: Sequence[int]) -> List[int]:
+        """
+        Возвращает рецепты, в которых есть хотя бы один из ингредиентов.
+        """
+        recipes_ids = set()
+        for ingredient_id in set(ingredients_ids):
+            recipes_ids.update(self._postings.get(ingredient_id, ()))
+        return sorted(recipes_ids)
+
+    def match_missing(
+        self, ingredients_ids: Sequence[int], max_missing: int
+    ) -> List[Tuple[int, int]]:
+        """
+        Возвращает рецепты, которые можно приготовить из перечисленных
+        ингредиентов, докупив не больше max_missing недостающих.
+
+        Args:
+            ingredients_ids (Sequence[int]): Имеющиеся ингредиенты
+            max_missing (int): Допустимое число недостающих ингредиентов
+
+        Returns:
+            List[Tuple[int, int]]: Пары (ID рецепта, число недостающих
+            ингредиентов), отсортированные по этому числу и ID; учитываются
+            рецепты, в которых есть хотя бы один из имеющихся ингредиентов
+        """
+        hits: Counter = Counter()
+        for ingredient_id in set(ingredients_ids):
+            hits.update(self._postings.get(ingredient_id, ()))
+        matches = [
+            (recipe_id, self._recipe_sizes[recipe_id] - count)
+            for recipe_id, count in hits.items()
+            if self._recipe_sizes[recipe_id] - count <= max_missing
+        ]
+        return sorted(matches, key=lambda match: (match[1], match[0]))
+
+    @staticmethod
+    def _contains(posting: array, recipe_id: int) -> bool:
+        position = bisect_left(posting, recipe_id)
+        return position < len(posting) and posting[position] == recipe_id
+
+    @staticmethod
+    def _insert(posting: array, recipe_id: int) -> bool:
+        position = bisect_left(posting, recipe_id)
+        if position < len(posting) and posting[position] == recipe_id:
+            return False
+        posting.insert(position, recipe_id)
+        return True
+
+    @staticmethod
+    def _grow(recipe_sizes: array, recipe_id: int) -> None:
+        if recipe_id >= len(recipe_sizes):
+            recipe_sizes.extend([0] * (recipe_id + 1 - len(recipe_sizes)))
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from bisect import bisect_right, insort
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from config import get_float, get_int
+from database import read_session
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils import RecipeCursor, recipes_page_query
+from view_counter import view_counter
+
+logger = logging.getLogger(__name__)
+
+# (-views, cooking_time, id): по возрастанию ключа идут рецепты в порядке
+# списка (views DESC, cooking_time, id).
+RankKey = Tuple[int, int, int]
+
+
+class RankedRecipe(NamedTuple):
+    """
+    Рецепт таблицы популярности в порядке колонок RECIPE_SHORT_COLUMNS.
+    """
+
+    title: str
+    cooking_time: int
+    views: int
+    id: int
+
+
+class Leaderboard:
+    """
+    Первые size рецептов списка в порядке популярности, хранимые в памяти.
+
+    Таблица заполняется из БД (одним запросом по индексу
+    ix_recipes_popularity) при запуске, каждые refresh_interval секунд
+    и после каждого сброса просмотров, а между обновлениями просмотры
+    рецептов таблицы учитываются сразу при их добавлении в счётчик
+    (add_views). Страницы, целиком попадающие в таблицу, отдаются без
+    запросов к БД.
+
+    Согласованность с колонкой recipes.views:
+        - views рецепта в таблице равно сохранённому значению плюс
+          ещё не записанные просмотры этого процесса (view_counter.pending),
+          то есть опережает БД не больше чем на flush_interval
+        - рецепт вне таблицы, набравший просмотры, попадает в неё при
+          следующем обновлении, то есть состав и порядок таблицы отстают
+          от БД не больше чем на flush_interval + refresh_interval
+        - после добавления рецептов таблица не используется, пока не будет
+          заполнена заново (invalidate())
+
+    Атрибуты:
+        size (int): Количество рецептов в таблице
+        refresh_interval (float): Период обновления из БД в секундах
+        ready (bool): Таблица заполнена и может отдавать страницы
+        complete (bool): В таблице весь каталог (рецептов не больше size)
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        pending: Callable[[int], int],
+        flush_lock: Callable[[], asyncio.Lock],
+        size: int,
+        refresh_interval: float,
+    ) -> None:
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.ready = False
+        self.complete = False
+        self._session_factory = session_factory
+        self._pending = pending
+        self._flush_lock = flush_lock
+        self._keys: List[RankKey] = []
+        self._recipes: Dict[int, RankedRecipe] = {}
+        self._generation = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Заполняет таблицу первыми size рецептами списка из БД.
+
+        Args:
+            session (AsyncSession): Сессия для чтения
+
+        Notes:
+            - Запрос и чтение незаписанных просмотров выполняются под
+              блокировкой сброса счётчика (flush_lock): пакет, ушедший
+              из очереди во время запроса, иначе не попал бы ни в прочитанные
+              views, ни в незаписанные просмотры
+            - Если во время запроса вызван invalidate(), таблица
+              заполняется, но остаётся выключенной до следующей загрузки
+        """
+        generation = self._generation
+        async with self._flush_lock():
+            rows = (await session.execute(recipes_page_query(self.size))).all()
+            recipes: Dict[int, RankedRecipe] = {}
+            for title, cooking_time, views, recipe_id in rows[: self.size]:
+                recipes[recipe_id] = RankedRecipe(
+                    title, cooking_time, views + self._pending(recipe_id), recipe_id
+                )
+        complete = len(rows) <= self.size
+        self._recipes = recipes
+        self._keys = sorted(self._key(recipe) for recipe in recipes.values())
+        self.complete = complete
+        self.ready = generation == self._generation
+
+    def invalidate(self) -> None:
+        """
+        Отключает таблицу до следующего заполнения из БД и ускоряет его.
+        """
+        self.ready = False
+        self._generation += 1
+        self.request_refresh()
+
+    def request_refresh(self) -> None:
+        """
+        Запрашивает внеочередное обновление таблицы из БД.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def add_views(self, recipe_id: int, n: int = 1) -> None:
+        """
+        Учитывает n просмотров рецепта, если он есть в таблице.
+        """
+        recipe = self._recipes.get(recipe_id)
+        if recipe is None:
+            return
+        key = self._key(recipe)
+        del self._keys[bisect_right(self._keys, key) - 1]
+        recipe = recipe._replace(views=recipe.views + n)
+        self._recipes[recipe_id] = recipe
+        insort(self._keys, self._key(recipe))
+
+    def page(
+        self, limit: int, after: Optional[RecipeCursor] = None
+    ) -> Optional[Tuple[List[RankedRecipe], bool]]:
+        """
+        Возвращает страницу списка, если она целиком есть в таблице.
+
+        Args:
+            limit (int): Размер страницы
+            after (Optional[RecipeCursor]): Ключ последнего рецепта
+             предыдущей страницы
+
+        Returns:
+            Optional[Tuple[List[RankedRecipe], bool]]: Рецепты страницы
+            и признак наличия следующей страницы; None, если страницу
+            нужно читать из БД
+        """
+        if not self.ready:
+            return None
+        start = 0
+        if after is not None:
+            views, cooking_time, recipe_id = after
+            start = bisect_right(self._keys, (-views, cooking_time, recipe_id))
+        end = start + limit
+        if end > len(self._keys) and not self.complete:
+            return None
+        recipes = [self._recipes[key[2]] for key in self._keys[start:end]]
+        return recipes, end < len(self._keys) or not self.complete
+
+    async def refresh(self) -> None:
+        """
+        Заполняет таблицу заново из БД.
+        """
+        async with self._session_factory() as session:
+            await self.load(session)
+
+    async def start(self) -> None:
+        """
+        Запускает фоновую задачу заполнения и периодического обновления.
+        """
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновую задачу.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wakeup = None
+        self.ready = False
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.refresh()
+            except SQLAlchemyError:
+                logger.exception("Failed to refresh the leaderboard")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _key(recipe: RankedRecipe) -> RankKey:
+        return -recipe.views, recipe.cooking_time, recipe.id
+
+
+leaderboard = Leaderboard(
+    read_session,
+    pending=view_counter.pending,
+    flush_lock=lambda: view_counter.flush_lock,
+    size=get_int("leaderboard", "size", 1000),
+    refresh_interval=get_float("leaderboard", "refresh_interval", 1.0),
+)
@@ -0,0 +1,317 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def format_labels(labels: Labels) -> str:
+    """
+    Форматирует метки в синтаксисе Prometheus: {name="value",...}.
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    """
+    Форматирует число: целые без дробной части.
+    """
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """
+    Базовый класс метрики с метками.
+
+    Атрибуты:
+        name (str): Имя метрики
+        documentation (str): Описание (строка # HELP)
+        kind (str): Тип метрики (строка # TYPE)
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+
+    def render(self) -> List[str]:
+        """
+        Возвращает строки метрики в текстовом формате Prometheus.
+        """
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Монотонно растущий счётчик.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key: Labels = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def _samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{format_labels(labels)} {format_value(value)}"
+
+
+class Gauge(Counter):
+    """
+    Значение, которое может как расти, так и уменьшаться.
+    """
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(Metric):
+    """
+    Гистограмма с накопительными корзинами (bucket), суммой и количеством.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key: Labels = tuple(sorted(labels.items()))
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(tuple(sorted(labels.items())), ()))
+
+    def sum(self, **labels: str) -> float:
+        return self._sums.get(tuple(sorted(labels.items())), 0)
+
+    def _samples(self) -> Iterable[str]:
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                bucket_labels = format_labels((*labels, ("le", le)))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            suffix = format_labels(labels)
+            yield f"{self.name}_sum{suffix} {format_value(self._sums[labels])}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class Registry:
+    """
+    Набор метрик процесса и функций, собирающих значения при экспорте.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self.register(Gauge(name, documentation))
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> Callable[[], None]:
+        """
+        Регистрирует функцию, обновляющую gauge-метрики перед экспортом
+        (например, копирующую счётчики кеша). Можно использовать как декоратор.
+        """
+        self._collectors.append(collector)
+        return collector
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+        """
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.counter("http_requests_total", "HTTP requests handled.")
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route."
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."
+)
+REQUEST_SQL_STATEMENTS = registry.histogram(
+    "http_request_sql_statements",
+    "SQL statements executed per HTTP request.",
+    QUERY_COUNT_BUCKETS,
+)
+REQUEST_SQL_DURATION = registry.histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per HTTP request."
+)
+SQL_STATEMENTS = registry.counter("sql_statements_total", "SQL statements executed.")
+SQL_DURATION = registry.histogram(
+    "sql_statement_duration_seconds", "SQL statement execution time."
+)
+VIEW_COUNT_UPDATES = registry.counter(
+    "view_count_updated_recipes_total", "Recipes whose views were updated in the DB."
+)
+VIEW_COUNT_INCREMENTS = registry.counter(
+    "view_count_increments_total", "Views written to the DB."
+)
+INGREDIENT_LOOKUPS = registry.counter(
+    "ingredient_lookups_total", "Ingredient names resolved to ids."
+)
+INGREDIENT_DICTIONARY_MISSES = registry.counter(
+    "ingredient_dictionary_misses_total",
+    "Ingredient names not found in the in-memory dictionary.",
+)
+INGREDIENT_LOOKUP_QUERIES = registry.counter(
+    "ingredient_lookup_queries_total", "SELECTs issued to resolve existing ingredients."
+)
+INGREDIENTS_CREATED = registry.counter(
+    "ingredients_created_total", "Ingredients inserted into the DB."
+)
+
+
+class RequestStats:
+    """
+    SQL-статистика одного HTTP-запроса.
+
+    Атрибуты:
+        statements (int): Количество выполненных SQL-выражений
+        sql_seconds (float): Суммарное время их выполнения
+    """
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request", default=None
+)
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """
+    Подключает учёт SQL-выражений к движку через события SQLAlchemy.
+
+    Args:
+        engine (AsyncEngine): Движок БД
+        name (str): Значение метки engine (например, "writer" или "reader")
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        SQL_STATEMENTS.inc(engine=name)
+        SQL_DURATION.observe(elapsed, engine=name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware, собирающее метрики HTTP-запросов.
+
+    Для каждого запроса учитывает задержку и статус по шаблону маршрута
+    (например, /recipes/{recipe_id}), число запросов в обработке, а также
+    количество и время SQL-выражений, выполненных в рамках запроса.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            current_request.reset(token)
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": getattr(route, "path", "unmatched"),
+            }
+            REQUESTS.inc(status=str(status), **labels)
+            REQUEST_DURATION.observe(elapsed, **labels)
+            REQUEST_SQL_STATEMENTS.observe(stats.statements, **labels)
+            REQUEST_SQL_DURATION.observe(stats.sql_seconds, **labels)
@@ -0,0 +1,215 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict
+
+from database import engine
+from models import CATALOG_CHANGES_DDL, Base, CatalogChange, ingredient_key
+from search import rebuild_search_index
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+Migration = Callable[[AsyncConnection], Awaitable[None]]
+
+
+async def add_popularity_index(conn: AsyncConnection) -> None:
+    """
+    2: составной индекс порядка выдачи списка (keyset-пагинация).
+    """
+    await conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_recipes_popularity "
+            "ON recipes (views DESC, cooking_time, id)"
+        )
+    )
+
+
+async def make_title_unique(conn: AsyncConnection) -> None:
+    """
+    3: уникальность recipes.title (заменяет проверку перед вставкой).
+
+    Notes:
+        - Если в БД уже есть рецепты с одинаковыми названиями, миграция
+          завершится ошибкой IntegrityError: дубликаты нужно убрать вручную
+    """
+    indexes = await conn.execute(text("PRAGMA index_list(recipes)"))
+    unique = {row.name: bool(row.unique) for row in indexes}
+    if unique.get("ix_recipes_title"):
+        return
+    await conn.execute(text("DROP INDEX IF EXISTS ix_recipes_title"))
+    await conn.execute(text("CREATE UNIQUE INDEX ix_recipes_title ON recipes (title)"))
+
+
+async def add_search_index(conn: AsyncConnection) -> None:
+    """
+    4: полнотекстовый индекс recipes_fts с триггерами синхронизации.
+    """
+    await rebuild_search_index(conn)
+
+
+async def add_change_log(conn: AsyncConnection) -> None:
+    """
+    5: журнал изменений каталога catalog_changes с триггером на recipes.
+    """
+    await conn.run_sync(CatalogChange.__table__.create, checkfirst=True)
+    for statement in CATALOG_CHANGES_DDL:
+        await conn.execute(text(statement))
+
+
+async def rework_indexes(conn: AsyncConnection) -> None:
+    """
+    6: пересмотр индексов под выполняемые запросы.
+
+    Notes:
+        - Удаляются индексы, которые не используются ни одним запросом,
+          но замедляют каждую вставку: дубли первичных ключей (id),
+          recipes.description и recipes.cooking_time
+        - ix_recipes_popularity дополняется title и покрывает страницу списка
+        - Добавляется ix_recipe_ingredient_ingredient_id для поиска
+          по ингредиенту
+    """
+    for name in (
+        "ix_recipes_id",
+        "ix_recipes_description",
+        "ix_recipes_cooking_time",
+        "ix_ingredients_id",
+        "ix_recipes_popularity",
+    ):
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    await conn.execute(
+        text(
+            "CREATE INDEX ix_recipes_popularity "
+            "ON recipes (views DESC, cooking_time, id, title)"
+        )
+    )
+    await conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_recipe_ingredient_ingredient_id "
+            "ON recipe_ingredient (ingredient_id, recipe_id)"
+        )
+    )
+
+
+async def add_recipe_updated_at(conn: AsyncConnection) -> None:
+    """
+    7: время изменения рецепта recipes.updated_at для ETag и Last-Modified.
+
+    Notes:
+        - Существующие рецепты получают время миграции через DEFAULT
+          колонки, поэтому миграция не переписывает таблицу
+    """
+    columns = await conn.execute(text("PRAGMA table_info(recipes)"))
+    if "updated_at" in {row.name for row in columns}:
+        return
+    await conn.execute(
+        text(
+            "ALTER TABLE recipes ADD COLUMN updated_at FLOAT NOT NULL "
+            f"DEFAULT {time.time()!r}"
+        )
+    )
+
+
+async def add_ingredient_name_key(conn: AsyncConnection) -> None:
+    """
+    8: ключ названия ингредиента ingredients.name_key с уникальным индексом.
+
+    Notes:
+        - Ключ (ingredient_key()) считается в Python, одним проходом
+          по ingredients и одним пакетным UPDATE
+        - Из уже накопившихся почти одинаковых строк ключ получает строка
+          с наименьшим ID (её же использует словарь ингредиентов),
+          у остальных он остаётся NULL, поэтому уникальный индекс
+          создаётся без удаления строк и связей
+    """
+    columns = await conn.execute(text("PRAGMA table_info(ingredients)"))
+    if "name_key" not in {row.name for row in columns}:
+        await conn.execute(text("ALTER TABLE ingredients ADD COLUMN name_key TEXT"))
+    res = await conn.execute(text("SELECT id, name FROM ingredients ORDER BY id"))
+    keys: Dict[str, int] = {}
+    for id_, name in res:
+        if name is not None:
+            keys.setdefault(ingredient_key(name), id_)
+    if keys:
+        await conn.execute(
+            text("UPDATE ingredients SET name_key = :key WHERE id = :id"),
+            [{"key": key, "id": id_} for key, id_ in keys.items()],
+        )
+    await conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_ingredients_name_key "
+            "ON ingredients (name_key)"
+        )
+    )
+
+
+# Версия схемы хранится в PRAGMA user_version. Версия 1 - схема до появления
+# миграций; ключ - версия, которую получает БД после применения миграции.
+MIGRATIONS: Dict[int, Migration] = {
+    2: add_popularity_index,
+    3: make_title_unique,
+    4: add_search_index,
+    5: add_change_log,
+    6: rework_indexes,
+    7: add_recipe_updated_at,
+    8: add_ingredient_name_key,
+}
+SCHEMA_VERSION = max(MIGRATIONS)
+
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    """
+    Возвращает версию схемы БД.
+
+    Returns:
+        int: PRAGMA user_version; 0 для пустой БД и 1 для БД, созданной
+        до появления версий (таблица recipes есть, версия не записана)
+    """
+    version: int = (await conn.execute(text("PRAGMA user_version"))).scalar()
+    if version:
+        return version
+    tables = await conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes'")
+    )
+    return 1 if tables.first() else 0
+
+
+async def migrate(conn: AsyncConnection) -> int:
+    """
+    Приводит схему БД к версии SCHEMA_VERSION.
+
+    Args:
+        conn (AsyncConnection): Соединение движка записи с открытой транзакцией
+
+    Returns:
+        int: Версия схемы до миграции
+
+    Notes:
+        - Пустая БД создаётся сразу в последней версии (create_all)
+        - Для существующей БД выполняются только недостающие миграции;
+          если схема актуальна, запуск стоит одного PRAGMA и не зависит
+          от размера таблиц
+    """
+    version: int = await get_schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return version
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than "
+            f"the supported version {SCHEMA_VERSION}"
+        )
+    await conn.run_sync(Base.metadata.create_all)
+    if version:
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            await MIGRATIONS[target](conn)
+    await conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+    return version
+
+
+async def main() -> None:
+    async with engine.begin() as conn:
+        version = await migrate(conn)
+    await engine.dispose()
+    print(f"Schema version: {version} -> {SCHEMA_VERSION}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,18 @@
-from typing import Any, Dict
+import time
+from typing import Any, Dict, Optional
 
 from database import Base
-from sqlalchemy import Column, ForeignKey, Integer, Text
+from sqlalchemy import (
+    DDL,
+    Column,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Text,
+    event,
+    text,
+)
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 
@@ -12,28 +23,51 @@ class Recipe(Base):
 
     Атрибуты:
         id (int): Уникальный идентификатор рецепта (PK, автоинкремент)
-        title (str): Название рецепта (обязательное)
+        title (str): Название рецепта (обязательное, уникальное)
         description (str): Описание рецепта (необязательное)
         cooking_time (int): Время приготовления в минутах (обязательное)
         views (int): Количество просмотров (по умолчанию 0)
+        updated_at (float): Время последнего изменения содержимого рецепта
+         (Unix time; просмотры его не меняют). Версия для ETag
+         и Last-Modified ответа GET /recipes/{id}
 
     Отношения:
         recipe_ingredient: Связь с ассоциативной таблицей RecipeIngredient
         ingredients: Прокси для доступа к ингредиентам
+
+    Индексы:
+        ix_recipes_popularity: Составной индекс (views DESC, cooking_time, id,
+         title) в порядке выдачи списка рецептов; обслуживает
+         keyset-пагинацию и покрывает её колонки, поэтому страница читается
+         без обращения к таблице
+        ix_recipes_title: Уникальность названия (ON CONFLICT при импорте)
     """
 
     __tablename__ = "recipes"
-    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
-    title = Column(Text, index=True, nullable=False)
-    description = Column(Text, index=True, nullable=True)
-    cooking_time = Column(Integer, index=True, nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    title = Column(Text, unique=True, index=True, nullable=False)
+    description = Column(Text, nullable=True)
+    cooking_time = Column(Integer, nullable=False)
     views = Column(Integer, default=0)
+    updated_at = Column(
+        Float,
+        nullable=False,
+        default=time.time,
+        server_default=text("((julianday('now') - 2440587.5) * 86400.0)"),
+    )
 
     recipe_ingredient = relationship(
-        "RecipeIngredient", back_populates="recipes", cascade="all"
+        "RecipeIngredient",
+        back_populates="recipes",
+        cascade="all",
+        order_by="RecipeIngredient.ingredient_id",
     )
     ingredients = association_proxy("recipe_ingredient", "ingredients")
 
+    __table_args__ = (
+        Index("ix_recipes_popularity", views.desc(), cooking_time, id, title),
+    )
+
     def to_dict(self) -> Dict[str, Any]:
         """
         Преобразует объект рецепта в словарь.
@@ -51,6 +85,57 @@ class Recipe(Base):
         }
 
 
+# Полнотекстовый индекс FTS5 по title и description. Таблица external content:
+# текст хранится только в recipes, а триггеры синхронизируют индекс при любой
+# вставке, удалении и изменении текста рецепта (одиночное создание, импорт,
+# заполнение БД). UPDATE только views индекс не трогает.
+RECIPES_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5("
+    "title, description, content='recipes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN "
+    "INSERT INTO recipes_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN "
+    "INSERT INTO recipes_fts(recipes_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_fts_au "
+    "AFTER UPDATE OF title, description ON recipes BEGIN "
+    "INSERT INTO recipes_fts(recipes_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO recipes_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+)
+
+for statement in RECIPES_FTS_DDL:
+    event.listen(
+        Recipe.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+
+
+def normalize_name(name: str) -> str:
+    """
+    Убирает пробелы по краям названия и схлопывает пробелы внутри.
+    """
+    return " ".join(name.split())
+
+
+def ingredient_key(name: str) -> str:
+    """
+    Ключ названия ингредиента: названия, отличающиеся только регистром
+    и пробелами, считаются одним ингредиентом.
+    """
+    return normalize_name(name).casefold()
+
+
+def default_name_key(context: Any) -> Optional[str]:
+    """
+    Значение ingredients.name_key по умолчанию - ключ вставляемого названия.
+    """
+    name: Optional[str] = context.get_current_parameters().get("name")
+    return None if name is None else ingredient_key(name)
+
+
 class Ingredient(Base):
     """
     Модель представляет ингредиент, используемый в рецептах.
@@ -58,6 +143,14 @@ class Ingredient(Base):
     Атрибуты:
         id (int): Уникальный идентификатор ингредиента (PK, автоинкремент)
         name (str): Название ингредиента (уникальное)
+        name_key (str): Ключ названия (ingredient_key(); уникальный),
+         заполняется при вставке. Почти одинаковые названия, добавленные
+         до его появления, хранят ключ только в строке с наименьшим ID,
+         у остальных он NULL
+
+    Индексы:
+        ix_ingredients_name_key: Уникальность ключа: одновременные вставки
+         "Milk" и "milk" разными воркерами дают одну строку
 
     Отношения:
         recipe_ingredient: Связь с ассоциативной таблицей RecipeIngredient
@@ -65,8 +158,9 @@ class Ingredient(Base):
     """
 
     __tablename__ = "ingredients"
-    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(Text, unique=True, index=True)
+    name_key = Column(Text, unique=True, index=True, default=default_name_key)
 
     recipe_ingredient = relationship(
         "RecipeIngredient", back_populates="ingredients", cascade="all"
@@ -85,6 +179,11 @@ class RecipeIngredient(Base):
     Отношения:
         recipes: Связь с моделью Recipe
         ingredients: Связь с моделью Ingredient
+
+    Индексы:
+        ix_recipe_ingredient_ingredient_id: (ingredient_id, recipe_id) для
+         обратного поиска рецептов по ингредиенту и построения
+         инвертированного индекса без сортировки (PK начинается с recipe_id)
     """
 
     __tablename__ = "recipe_ingredient"
@@ -97,3 +196,44 @@ class RecipeIngredient(Base):
 
     recipes = relationship("Recipe", back_populates="recipe_ingredient")
     ingredients = relationship("Ingredient", back_populates="recipe_ingredient")
+
+    __table_args__ = (
+        Index("ix_recipe_ingredient_ingredient_id", ingredient_id, recipe_id),
+    )
+
+
+class CatalogChange(Base):
+    """
+    Журнал изменений каталога для согласования процессов-воркеров.
+
+    Атрибуты:
+        id (int): Номер изменения (PK, AUTOINCREMENT: номера не переиспользуются
+         и растут в порядке фиксации транзакций)
+        recipe_id (int): ID добавленного рецепта; NULL - записаны просмотры
+        origin (str): Воркер, записавший просмотры (см. change_feed.WORKER_ID);
+         для рецептов NULL
+        created_at (float): Время изменения (Unix time)
+    """
+
+    __tablename__ = "catalog_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    recipe_id = Column(Integer, nullable=True)
+    origin = Column(Text, nullable=True)
+    created_at = Column(Float, nullable=False)
+
+
+# Рецепты попадают в журнал триггером, поэтому его видят все пути записи
+# (создание, импорт, заполнение БД) без дополнительных запросов.
+CATALOG_CHANGES_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS recipes_changes_ai AFTER INSERT ON recipes BEGIN "
+    "INSERT INTO catalog_changes(recipe_id, created_at) "
+    "VALUES (new.id, (julianday('now') - 2440587.5) * 86400.0); END",
+)
+
+for statement in CATALOG_CHANGES_DDL:
+    event.listen(
+        CatalogChange.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
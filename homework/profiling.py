@@ -0,0 +1,228 @@
+import asyncio
+import cProfile
+import json
+import os
+import random
+import re
+import shutil
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from config import get_bool, get_float, get_int, get_setting
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+PROFILING_ENABLED = get_bool("profiling", "enabled", False)
+
+PROFILE_FILES = ("meta.json", "profile.pstats", "tracemalloc.snapshot", "sql.json")
+
+current_sql: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar(
+    "current_sql", default=None
+)
+
+
+def capture_sql(engine: AsyncEngine) -> None:
+    """
+    Подключает запись SQL-выражений профилируемых запросов к движку.
+
+    Notes:
+        - Вызывается только при включённом профилировании, поэтому
+          в выключенном состоянии обработчиков событий нет вовсе
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if current_sql.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        statements = current_sql.get()
+        if statements is not None:
+            started = conn.info["profile_started"].pop()
+            statements.append(
+                {
+                    "statement": statement,
+                    "executemany": many,
+                    "seconds": time.perf_counter() - started,
+                }
+            )
+
+
+class RequestProfiler:
+    """
+    Хранилище профилей отдельных запросов в каталоге-кольце на диске.
+
+    Каждый профиль - подкаталог с файлами meta.json (запрос, статус, время),
+    profile.pstats (cProfile), tracemalloc.snapshot (снимок выделений памяти)
+    и sql.json (выполненные SQL-выражения). Хранится не больше max_profiles
+    последних профилей, старые удаляются.
+
+    Атрибуты:
+        directory (str): Каталог профилей
+        max_profiles (int): Размер кольца
+        sample_rate (float): Доля случайно профилируемых запросов (0..1)
+        header (str): Заголовок, включающий профилирование запроса
+        tracemalloc_frames (int): Глубина стека в снимке tracemalloc
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_profiles: int,
+        sample_rate: float,
+        header: str,
+        tracemalloc_frames: int,
+    ) -> None:
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.tracemalloc_frames = tracemalloc_frames
+        self.active = False
+
+    def wants(self, scope) -> bool:
+        """
+        Решает, профилировать ли запрос: по заголовку или по выборке.
+
+        Notes:
+            - Одновременно профилируется только один запрос: cProfile
+              и tracemalloc действуют на весь процесс
+        """
+        if self.active:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return value not in (b"", b"0", b"false")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(
+        self,
+        meta: Dict[str, Any],
+        profile: cProfile.Profile,
+        snapshot: tracemalloc.Snapshot,
+        statements: List[Dict[str, Any]],
+    ) -> str:
+        """
+        Сохраняет профиль запроса и удаляет профили сверх max_profiles.
+
+        Returns:
+            str: Имя каталога профиля
+        """
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", meta["path"]).strip("-") or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{meta['method']}-{slug}"
+        name = f"{name}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.directory, name)
+        os.makedirs(path)
+        profile.dump_stats(os.path.join(path, "profile.pstats"))
+        snapshot.dump(os.path.join(path, "tracemalloc.snapshot"))
+        meta["top_allocations"] = [
+            {"line": str(stat.traceback), "size": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:10]
+        ]
+        with open(os.path.join(path, "sql.json"), "w") as file:
+            json.dump(statements, file, indent=2)
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            json.dump(meta, file, indent=2)
+
+        for old in self.list()[self.max_profiles :]:
+            shutil.rmtree(os.path.join(self.directory, old["name"]), ignore_errors=True)
+        return name
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        Возвращает сохранённые профили, начиная с самых новых.
+
+        Returns:
+            List[Dict[str, Any]]: Содержимое meta.json каждого профиля
+            с добавленным ключом name (имя каталога)
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        profiles: List[Dict[str, Any]] = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            try:
+                with open(os.path.join(self.directory, name, "meta.json")) as file:
+                    profiles.append({"name": name, **json.load(file)})
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def file_path(self, name: str, file_name: str) -> Optional[str]:
+        """
+        Возвращает путь к файлу профиля или None, если его нет.
+        """
+        if file_name not in PROFILE_FILES or os.sep in name or name.startswith("."):
+            return None
+        path = os.path.join(self.directory, name, file_name)
+        return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware, профилирующее выбранные запросы (см. RequestProfiler).
+
+    Добавляется в приложение только при [profiling] enabled = true, поэтому
+    в выключенном состоянии не влияет на обработку запросов.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.profiler.wants(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.profiler.active = True
+        statements: List[Dict[str, Any]] = []
+        token = current_sql.set(statements)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.profiler.tracemalloc_frames)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            current_sql.reset(token)
+            self.profiler.active = False
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope["query_string"].decode("latin-1"),
+                "status": status,
+                "seconds": elapsed,
+                "sql_statements": len(statements),
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            await asyncio.to_thread(
+                self.profiler.save, meta, profile, snapshot, statements
+            )
+
+
+request_profiler = RequestProfiler(
+    directory=get_setting("profiling", "directory", "profiles"),
+    max_profiles=get_int("profiling", "max_profiles", 50),
+    sample_rate=get_float("profiling", "sample_rate", 0.0),
+    header=get_setting("profiling", "header", "X-Profile"),
+    tracemalloc_frames=get_int("profiling", "tracemalloc_frames", 10),
+)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -49,6 +49,22 @@ class RecipeOutShort(BaseRecipe):
     views: int = Field(description="How many times this recipe was viewed.")
 
 
+class RecipePage(BaseModel):
+    """
+    Модель страницы списка рецептов.
+
+    Attributes:
+        items: Рецепты текущей страницы
+        next_cursor: Курсор следующей страницы (None на последней странице)
+    """
+
+    items: List[RecipeOutShort] = Field(description="Recipes on this page.")
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Opaque cursor of the next page, null on the last page.",
+    )
+
+
 class RecipeOutLong(BaseRecipe):
     """
     Модель для полного отображения рецепта.
@@ -62,3 +78,165 @@ class RecipeOutLong(BaseRecipe):
         description="List of str: ingredients that are included in the dish."
     )
     description: str = Field(description="Description of the dish.")
+
+
+class RecipeBatch(BaseModel):
+    """
+    Модель ответа пакетного чтения рецептов.
+
+    Attributes:
+        recipes: Рецепты по запрошенным ID; для несуществующего ID -
+         {"error": "No recipe with this id"}
+    """
+
+    recipes: Dict[int, Union[RecipeOutLong, Dict[str, str]]] = Field(
+        description="Requested recipes by id, or an error object if not found."
+    )
+
+
+class RecipeSearchHit(BaseRecipe):
+    """
+    Модель результата полнотекстового поиска.
+
+    Attributes:
+        id: ID рецепта
+        views: Количество просмотров рецепта
+        snippet: Фрагмент текста с подсвеченными (<b>...</b>) совпадениями
+        rank: Релевантность bm25 (чем меньше, тем лучше)
+    """
+
+    id: int = Field(description="Id of this recipe.")
+    views: int = Field(description="How many times this recipe was viewed.")
+    snippet: str = Field(description="Matching fragment, matches wrapped in <b>.")
+    rank: float = Field(description="bm25 rank, lower is better.")
+
+
+class RecipeSearchPage(BaseModel):
+    """
+    Модель страницы результатов поиска.
+
+    Attributes:
+        items: Результаты текущей страницы
+        next_offset: offset следующей страницы (None на последней странице)
+    """
+
+    items: List[RecipeSearchHit] = Field(description="Matches on this page.")
+    next_offset: Optional[int] = Field(
+        default=None, description="Offset of the next page, null on the last page."
+    )
+
+
+class RecipeTop(RecipeOutShort):
+    """
+    Модель рецепта в таблице самых популярных рецептов.
+
+    Attributes:
+        id: ID рецепта
+    """
+
+    id: int = Field(description="Id of this recipe.")
+
+
+class IngredientMatch(RecipeOutShort):
+    """
+    Модель рецепта, найденного по ингредиентам.
+
+    Attributes:
+        id: ID рецепта
+        missing: Сколько ингредиентов рецепта нет среди запрошенных
+         (только для match=missing)
+    """
+
+    id: int = Field(description="Id of this recipe.")
+    missing: Optional[int] = Field(
+        default=None,
+        description="Ingredients of this recipe that were not in the request.",
+    )
+
+
+class IngredientMatchPage(BaseModel):
+    """
+    Модель страницы рецептов, найденных по ингредиентам.
+
+    Attributes:
+        items: Рецепты текущей страницы
+        total: Общее количество найденных рецептов
+        next_offset: offset следующей страницы (None на последней странице)
+    """
+
+    items: List[IngredientMatch] = Field(description="Recipes on this page.")
+    total: int = Field(description="How many recipes matched in total.")
+    next_offset: Optional[int] = Field(
+        default=None, description="Offset of the next page, null on the last page."
+    )
+
+
+class SimilarRecipe(RecipeOutShort):
+    """
+    Модель рецепта, похожего на запрошенный по составу.
+
+    Attributes:
+        id: ID рецепта
+        similarity: Коэффициент Жаккара множеств ингредиентов (0..1]
+    """
+
+    id: int = Field(description="Id of this recipe.")
+    similarity: float = Field(
+        description="Jaccard similarity of the two ingredient sets."
+    )
+
+
+class SimilarRecipes(BaseModel):
+    """
+    Модель списка похожих рецептов.
+
+    Attributes:
+        items: Рецепты по убыванию сходства
+    """
+
+    items: List[SimilarRecipe] = Field(description="Most similar recipes first.")
+
+
+class IngredientSuggestion(BaseModel):
+    """
+    Модель подсказки названия ингредиента.
+
+    Attributes:
+        name: Название ингредиента
+        recipes: Количество рецептов с этим ингредиентом
+    """
+
+    name: str = Field(description="Ingredient name.")
+    recipes: int = Field(description="How many recipes use this ingredient.")
+
+
+class ImportLineError(BaseModel):
+    """
+    Модель ошибки импорта одной строки NDJSON.
+
+    Attributes:
+        line: Номер строки (начиная с 1)
+        error: Описание ошибки
+    """
+
+    line: int = Field(description="Line number in the uploaded NDJSON, from 1.")
+    error: str = Field(description="Why this line was not imported.")
+
+
+class ImportResult(BaseModel):
+    """
+    Модель итогов пакетного импорта рецептов.
+
+    Attributes:
+        lines: Количество прочитанных строк
+        created: Количество созданных рецептов
+        failed: Количество строк с ошибками
+        errors: Ошибки по строкам (не больше max_reported_errors)
+    """
+
+    lines: int = Field(description="Lines read from the request body.")
+    created: int = Field(description="Recipes created.")
+    failed: int = Field(description="Lines that were rejected.")
+    errors: List[ImportLineError] = Field(
+        description="Per-line errors, truncated to the configured maximum."
+    )
@@ -0,0 +1,92 @@
+import asyncio
+import sys
+from typing import Any, Dict, List
+
+from database import engine
+from models import RECIPES_FTS_DDL
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+SEARCH_QUERY = text(
+    "SELECT recipes.id, recipes.title, recipes.cooking_time, recipes.views, "
+    "snippet(recipes_fts, -1, '<b>', '</b>', '…', 12) AS snippet, "
+    "bm25(recipes_fts, 10.0, 1.0) AS rank "
+    "FROM recipes_fts JOIN recipes ON recipes.id = recipes_fts.rowid "
+    "WHERE recipes_fts MATCH :query "
+    "ORDER BY rank, recipes.id LIMIT :limit OFFSET :offset"
+)
+
+
+def to_match_query(query: str) -> str:
+    """
+    Превращает пользовательский запрос в безопасное выражение FTS5 MATCH.
+
+    Args:
+        query (str): Строка поиска в свободной форме
+
+    Returns:
+        str: Слова запроса в кавычках через пробел (все слова обязательны),
+        последнее слово ищется по префиксу; пустая строка, если слов нет
+
+    Notes:
+        - Кавычки экранируют операторы FTS5 (AND, NEAR, *, : и т.д.),
+          поэтому синтаксическая ошибка в MATCH невозможна
+    """
+    terms: List[str] = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+async def search_recipes(
+    session: AsyncSession, query: str, limit: int, offset: int
+) -> List[Dict[str, Any]]:
+    """
+    Ищет рецепты по названию и описанию через индекс FTS5.
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса
+        query (str): Строка поиска
+        limit (int): Максимальное количество результатов
+        offset (int): Сколько лучших результатов пропустить
+
+    Returns:
+        List[Dict[str, Any]]: Результаты по убыванию релевантности (bm25,
+        совпадение в названии весит в 10 раз больше) с ключами id, title,
+        cooking_time, views, snippet и rank
+    """
+    match_query: str = to_match_query(query)
+    if not match_query:
+        return []
+    res = await session.execute(
+        SEARCH_QUERY, {"query": match_query, "limit": limit, "offset": offset}
+    )
+    return [dict(row) for row in res.mappings()]
+
+
+async def rebuild_search_index(conn: AsyncConnection) -> None:
+    """
+    Создаёт (если нужно) и заново заполняет индекс recipes_fts.
+
+    Args:
+        conn (AsyncConnection): Соединение с открытой транзакцией
+
+    Notes:
+        - Нужна для БД, созданных до появления полнотекстового поиска,
+          и для восстановления индекса после ручных правок таблицы recipes
+    """
+    for statement in RECIPES_FTS_DDL:
+        await conn.execute(text(statement))
+    await conn.execute(text("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')"))
+
+
+async def main() -> None:
+    async with engine.begin() as conn:
+        await rebuild_search_index(conn)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("Usage: python search.py rebuild")
+    asyncio.run(main())
@@ -0,0 +1,367 @@
+from typing import (
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import numpy as np
+from config import get_int
+from models import RecipeIngredient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Хеш-функции MinHash: h(x) = (a * x + b) mod MERSENNE_PRIME; a, b и ID
+# ингредиентов меньше 2 ** 31, поэтому a * x + b помещается в uint64.
+MERSENNE_PRIME = (1 << 31) - 1
+
+RecipeSet = Tuple[int, Sequence[int]]
+
+
+def jaccard(first: Set[int], second: Set[int]) -> float:
+    """
+    Возвращает коэффициент Жаккара двух множеств ингредиентов.
+    """
+    if not first and not second:
+        return 0.0
+    common = len(first & second)
+    return common / (len(first) + len(second) - common)
+
+
+def rank_by_jaccard(
+    target: Set[int], candidates: Mapping[int, Set[int]], limit: int
+) -> List[Tuple[int, float]]:
+    """
+    Упорядочивает кандидатов по точному коэффициенту Жаккара с target.
+
+    Returns:
+        List[Tuple[int, float]]: Не больше limit пар (ID рецепта,
+        сходство) по убыванию сходства, затем по ID; рецепты без общих
+        ингредиентов не возвращаются
+    """
+    scored = [
+        (recipe_id, jaccard(target, ingredients))
+        for recipe_id, ingredients in candidates.items()
+    ]
+    scored = [item for item in scored if item[1] > 0]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+
+class MinHashIndex:
+    """
+    Индекс LSH по MinHash-сигнатурам множеств ингредиентов рецептов.
+
+    Сигнатура рецепта - минимумы bands * rows хеш-функций по ID его
+    ингредиентов; вероятность совпадения отдельного минимума у двух
+    рецептов равна коэффициенту Жаккара их множеств. Сигнатура делится
+    на bands полос по rows значений, и рецепты с одинаковой полосой
+    попадают в одну корзину, поэтому кандидаты с похожим составом
+    находятся без сравнения со всеми рецептами: рецепт со сходством s
+    становится кандидатом с вероятностью 1 - (1 - s ** rows) ** bands.
+
+    Хранятся только ключи полос: для каждой полосы - массив ключей
+    (uint32), отсортированный вместе с массивом ID рецептов (int32),
+    то есть 8 * bands байт на рецепт. Рецепты, добавленные после
+    построения, попадают в небольшой словарь корзин и вливаются
+    в массивы, когда их набирается compact_threshold.
+
+    Атрибуты:
+        bands (int): Количество полос сигнатуры
+        rows (int): Значений сигнатуры в полосе
+        max_candidates (int): Наибольшее число кандидатов на запрос
+        bucket_limit (int): Наибольшее число рецептов, просматриваемых
+         в одной корзине
+        batch_size (int): Рецептов, чьи сигнатуры считаются одной
+         операцией numpy при построении
+        compact_threshold (int): Сколько добавленных рецептов хранится
+         вне отсортированных массивов
+        ready (bool): Индекс построен
+    """
+
+    def __init__(
+        self,
+        bands: int,
+        rows: int,
+        max_candidates: int,
+        bucket_limit: int,
+        batch_size: int,
+        compact_threshold: int,
+        seed: int = 0,
+    ) -> None:
+        self.bands = bands
+        self.rows = rows
+        self.max_candidates = max_candidates
+        self.bucket_limit = bucket_limit
+        self.batch_size = batch_size
+        self.compact_threshold = compact_threshold
+        self.ready = False
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        # Нечётные множители для свёртки значений полосы в один ключ
+        self._mix = rng.integers(1, 1 << 63, rows, dtype=np.uint64) | np.uint64(1)
+        self._keys = np.empty((bands, 0), dtype=np.uint32)
+        self._ids = np.empty((bands, 0), dtype=np.int32)
+        self._delta: Dict[Tuple[int, int], List[int]] = {}
+        self._delta_ids: List[int] = []
+        self._delta_keys: List[np.ndarray] = []
+        self._loading = False
+        self._backlog: List[RecipeSet] = []
+
+    def __len__(self) -> int:
+        return self._ids.shape[1] + len(self._delta_ids)
+
+    @property
+    def memory_bytes(self) -> int:
+        """
+        Размер отсортированных массивов полос в байтах.
+        """
+        return self._keys.nbytes + self._ids.nbytes
+
+    def band_keys(self, indptr: np.ndarray, ingredients: np.ndarray) -> np.ndarray:
+        """
+        Считает ключи полос для пакета рецептов.
+
+        Args:
+            indptr (np.ndarray): Границы рецептов в ingredients: ингредиенты
+             рецепта i - ingredients[indptr[i]:indptr[i + 1]] (не пустые)
+            ingredients (np.ndarray): ID ингредиентов всех рецептов подряд
+
+        Returns:
+            np.ndarray: Массив (рецепты, bands) ключей полос (uint32)
+        """
+        hashed = (
+            ingredients.astype(np.uint64)[:, None] * self._a + self._b
+        ) % MERSENNE_PRIME
+        signatures = np.minimum.reduceat(hashed, indptr[:-1], axis=0)
+        mixed = (signatures.reshape(-1, self.bands, self.rows) * self._mix).sum(
+            axis=2, dtype=np.uint64
+        )
+        return ((mixed >> np.uint64(32)) ^ mixed).astype(np.uint32)
+
+    def build(self, recipes: Iterable[RecipeSet]) -> None:
+        """
+        Строит индекс заново по множествам ингредиентов рецептов.
+
+        Args:
+            recipes (Iterable[RecipeSet]): Пары (ID рецепта, ID его
+             ингредиентов); рецепты без ингредиентов пропускаются
+        """
+        ids_parts: List[np.ndarray] = []
+        keys_parts: List[np.ndarray] = []
+        batch: List[RecipeSet] = []
+        for recipe in recipes:
+            batch.append(recipe)
+            if len(batch) == self.batch_size:
+                self._encode(batch, ids_parts, keys_parts)
+                batch = []
+        self._encode(batch, ids_parts, keys_parts)
+        self._replace(ids_parts, keys_parts)
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Строит индекс заново по таблице recipe_ingredient.
+
+        Notes:
+            - Связи читаются потоком в порядке первичного ключа
+              (recipe_id, ingredient_id), сигнатуры считаются пакетами
+              по batch_size рецептов, поэтому в памяти одновременно
+              находятся связи одного пакета и готовые ключи полос
+            - Рецепты, добавленные через add_recipe во время построения,
+              добавляются в новый индекс после замены
+        """
+        self._loading = True
+        try:
+            ids_parts: List[np.ndarray] = []
+            keys_parts: List[np.ndarray] = []
+            batch: List[RecipeSet] = []
+            async for recipe in self._stream(session):
+                batch.append(recipe)
+                if len(batch) == self.batch_size:
+                    self._encode(batch, ids_parts, keys_parts)
+                    batch = []
+            self._encode(batch, ids_parts, keys_parts)
+            self._replace(ids_parts, keys_parts)
+        finally:
+            self._loading = False
+            backlog, self._backlog = self._backlog, []
+        for recipe_id, ingredients_ids in backlog:
+            self.add_recipe(recipe_id, ingredients_ids)
+        self.ready = True
+
+    def add_recipe(self, recipe_id: int, ingredients_ids: Iterable[int]) -> None:
+        """
+        Добавляет в индекс только что созданный рецепт.
+
+        Args:
+            recipe_id (int): ID рецепта
+            ingredients_ids (Iterable[int]): ID его ингредиентов
+        """
+        ingredients = sorted(set(ingredients_ids))
+        if self._loading:
+            self._backlog.append((recipe_id, ingredients))
+        if not ingredients:
+            return
+        keys = self.band_keys(
+            np.array([0, len(ingredients)]), np.array(ingredients, dtype=np.int64)
+        )[0]
+        for band, key in enumerate(keys.tolist()):
+            self._delta.setdefault((band, key), []).append(recipe_id)
+        self._delta_ids.append(recipe_id)
+        self._delta_keys.append(keys)
+        if len(self._delta_ids) >= self.compact_threshold:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Вливает добавленные рецепты в отсортированные массивы полос.
+
+        Notes:
+            - Новые ключи вставляются в уже отсортированные массивы
+              (np.insert по позициям из searchsorted) за линейное время
+              без полной пересортировки
+        """
+        if not self._delta_ids:
+            return
+        new_ids = np.array(self._delta_ids, dtype=np.int32)
+        new_keys = np.stack(self._delta_keys)
+        size = self._ids.shape[1] + len(new_ids)
+        keys = np.empty((self.bands, size), dtype=np.uint32)
+        ids = np.empty((self.bands, size), dtype=np.int32)
+        for band in range(self.bands):
+            order = np.argsort(new_keys[:, band], kind="stable")
+            band_keys = new_keys[order, band]
+            positions = np.searchsorted(self._keys[band], band_keys, side="right")
+            keys[band] = np.insert(self._keys[band], positions, band_keys)
+            ids[band] = np.insert(self._ids[band], positions, new_ids[order])
+        self._keys, self._ids = keys, ids
+        self._delta = {}
+        self._delta_ids = []
+        self._delta_keys = []
+
+    def candidates(self, ingredients_ids: Iterable[int], exclude: int = 0) -> List[int]:
+        """
+        Возвращает рецепты, попавшие хотя бы в одну корзину с набором
+        ингредиентов.
+
+        Args:
+            ingredients_ids (Iterable[int]): ID ингредиентов рецепта
+            exclude (int): ID рецепта, который не нужно возвращать
+
+        Returns:
+            List[int]: Не больше max_candidates ID рецептов; при избытке
+            остаются совпавшие в наибольшем числе полос (оно растёт
+            со сходством), а среди них - из корзин меньшего размера
+            (большая корзина - обычно рецепты с одним популярным
+            ингредиентом)
+
+        Notes:
+            - Из корзины просматриваются не больше bucket_limit рецептов,
+              поэтому время запроса не зависит от размера каталога
+        """
+        ingredients = sorted(set(ingredients_ids))
+        if not ingredients:
+            return []
+        keys = self.band_keys(
+            np.array([0, len(ingredients)]), np.array(ingredients, dtype=np.int64)
+        )[0]
+        found: List[np.ndarray] = []
+        weights: List[float] = []
+        for band, key in enumerate(keys):
+            band_keys = self._keys[band]
+            start = int(band_keys.searchsorted(key, side="left"))
+            end = int(band_keys.searchsorted(key, side="right"))
+            bucket = self._delta.get((band, int(key)), ())
+            size = end - start + len(bucket)
+            if not size:
+                continue
+            found.append(self._ids[band, start : min(end, start + self.bucket_limit)])
+            found.append(np.array(bucket[-self.bucket_limit :], dtype=np.int32))
+            # Совпадение полосы - единица, меньшая корзина - меньше единицы
+            # в сумме по всем полосам
+            weights.extend((1 + 1 / size / (self.bands + 1),) * 2)
+        if not found:
+            return []
+        ids, inverse = np.unique(np.concatenate(found), return_inverse=True)
+        scores = np.bincount(
+            inverse,
+            weights=np.repeat(weights, [len(part) for part in found]),
+            minlength=len(ids),
+        )
+        keep = ids != exclude
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > self.max_candidates:
+            ids = ids[np.argsort(-scores, kind="stable")[: self.max_candidates]]
+        return ids.tolist()
+
+    def _encode(
+        self,
+        batch: List[RecipeSet],
+        ids_parts: List[np.ndarray],
+        keys_parts: List[np.ndarray],
+    ) -> None:
+        batch = [
+            (recipe_id, ingredients) for recipe_id, ingredients in batch if ingredients
+        ]
+        if not batch:
+            return
+        lengths = np.fromiter((len(ingredients) for _, ingredients in batch), np.int64)
+        indptr = np.zeros(len(batch) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        ingredients = np.fromiter(
+            (id_ for _, ingredients in batch for id_ in ingredients),
+            np.int64,
+            count=int(indptr[-1]),
+        )
+        ids_parts.append(np.array([recipe_id for recipe_id, _ in batch], np.int32))
+        keys_parts.append(self.band_keys(indptr, ingredients))
+
+    def _replace(
+        self, ids_parts: List[np.ndarray], keys_parts: List[np.ndarray]
+    ) -> None:
+        ids = np.concatenate(ids_parts) if ids_parts else np.empty(0, np.int32)
+        keys = (
+            np.concatenate(keys_parts)
+            if keys_parts
+            else np.empty((0, self.bands), np.uint32)
+        )
+        orders = np.argsort(keys, axis=0, kind="stable").T
+        self._keys = np.ascontiguousarray(np.take_along_axis(keys.T, orders, axis=1))
+        self._ids = np.ascontiguousarray(ids[orders])
+        self._delta = {}
+        self._delta_ids = []
+        self._delta_keys = []
+
+    async def _stream(self, session: AsyncSession) -> AsyncIterator[RecipeSet]:
+        result = await session.stream(
+            select(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id)
+            .order_by(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id)
+            .execution_options(yield_per=self.batch_size * 8)
+        )
+        recipe_id = None
+        ingredients: List[int] = []
+        async for partition in result.partitions():
+            for row_recipe_id, ingredient_id in partition:
+                if row_recipe_id != recipe_id:
+                    if ingredients:
+                        yield recipe_id, ingredients
+                    recipe_id, ingredients = row_recipe_id, []
+                ingredients.append(ingredient_id)
+        if ingredients:
+            yield recipe_id, ingredients
+
+
+similar_recipes = MinHashIndex(
+    bands=get_int("similar", "bands", 16),
+    rows=get_int("similar", "rows", 3),
+    max_candidates=get_int("similar", "max_candidates", 200),
+    bucket_limit=get_int("similar", "bucket_limit", 2048),
+    batch_size=get_int("similar", "batch_size", 4096),
+    compact_threshold=get_int("similar", "compact_threshold", 1024),
+)
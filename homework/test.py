@@ -1,16 +1,107 @@
-from app import app
-from fastapi.testclient import TestClient
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
 
-client = TestClient(app)
+import pytest
 
+TEST_DB_DIR = tempfile.mkdtemp(prefix="recipes-test-")
+os.environ["DATABASE_URL"] = (
+    f"sqlite+aiosqlite:///{os.path.join(TEST_DB_DIR, 'test.db')}"
+)
+os.environ["DATABASE_ECHO"] = "false"
+os.environ["VIEWS_FLUSH_INTERVAL"] = "3600"
+os.environ["APP_SEED"] = "true"
+os.environ["PROFILING_ENABLED"] = "true"
+os.environ["PROFILING_DIRECTORY"] = os.path.join(TEST_DB_DIR, "profiles")
+os.environ["PROFILING_MAX_PROFILES"] = "2"
 
-def test_get_all_recipes():
+import compression  # noqa: E402
+import httpx  # noqa: E402
+from admission import ADMISSION_SHED, Limiter, Overloaded, admission  # noqa: E402
+from app import app, warm_up_tasks  # noqa: E402
+from autocomplete import IngredientAutocomplete  # noqa: E402
+from cache import DiskCache, MemoryCache, recipe_cache  # noqa: E402
+from config import get_int  # noqa: E402
+from database import async_session, engine, read_session, reader_engine  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from generate_data import generate  # noqa: E402
+from ingredient_dictionary import (  # noqa: E402
+    IngredientDictionary,
+    ingredient_dictionary,
+)
+from leaderboard import Leaderboard, leaderboard  # noqa: E402
+from metrics import (  # noqa: E402
+    INGREDIENT_DICTIONARY_MISSES,
+    REQUEST_SQL_STATEMENTS,
+    REQUESTS_IN_FLIGHT,
+)
+from migrations import SCHEMA_VERSION, get_schema_version, migrate  # noqa: E402
+from models import CatalogChange, Ingredient, Recipe, RecipeIngredient  # noqa: E402
+from profiling import request_profiler  # noqa: E402
+from search import SEARCH_QUERY, rebuild_search_index  # noqa: E402
+from similarity import MinHashIndex, rank_by_jaccard  # noqa: E402
+from sqlalchemy import event, select, text, update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from utils import recipes_page_query, recipes_with_ingredients_query  # noqa: E402
+from view_counter import ViewCounter, view_counter  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    """
+    Клиент приложения с выполненными обработчиками startup/shutdown.
+    """
+
+    async def wait_for_warm_up():
+        await asyncio.gather(*warm_up_tasks)
+
+    with TestClient(app) as test_client:
+        test_client.portal.call(wait_for_warm_up)
+        yield test_client
+
+
+@contextmanager
+def count_queries():
+    """
+    Считает SQL-запросы, выполненные движками записи и чтения внутри with.
+
+    Yields:
+        List[str]: Список выполненных SQL-выражений
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engines = {engine.sync_engine, reader_engine.sync_engine}
+    for sync_engine in engines:
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for sync_engine in engines:
+            event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_get_all_recipes(client):
     """
     Тестирование получения списка всех рецептов.
 
     Проверяет:
         - Код ответа 200 OK
-        - Тело ответа - непустой список
+        - Тело ответа - страница с непустым списком items
         - Каждый рецепт содержит обязательные поля:
             * title (название)
             * cooking_time (время приготовления)
@@ -19,15 +110,58 @@ def test_get_all_recipes():
     response = client.get("/recipes/")
     assert response.status_code == 200
     data = response.json()
-    assert isinstance(data, list)
-    assert len(data) > 0
-    for recipe in data:
+    assert isinstance(data["items"], list)
+    assert len(data["items"]) > 0
+    assert "next_cursor" in data
+    for recipe in data["items"]:
         assert "title" in recipe
         assert "cooking_time" in recipe
         assert "views" in recipe
 
 
-def test_get_recipe_by_id():
+def test_get_all_recipes_pagination(client):
+    """
+    Тестирование keyset-пагинации списка рецептов.
+
+    Проверяет:
+        - Обход по next_cursor возвращает те же рецепты и в том же
+          порядке, что и одна большая страница
+        - На последней странице next_cursor равен None
+    """
+    full = client.get("/recipes/", params={"limit": 100}).json()["items"]
+
+    paged = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/recipes/", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) <= 2
+        paged.extend(data["items"])
+        if data["next_cursor"] is None:
+            break
+        params["cursor"] = data["next_cursor"]
+
+    assert paged == full
+    keys = [(-recipe["views"], recipe["cooking_time"]) for recipe in paged]
+    assert keys == sorted(keys)
+
+
+def test_get_all_recipes_invalid_cursor(client):
+    """
+    Тестирование обработки повреждённого курсора.
+
+    Проверяет:
+        - Код ответа 400 Bad Request
+        - Наличие сообщения об ошибке в формате:
+            {"error": "Invalid cursor"}
+    """
+    response = client.get("/recipes/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid cursor"}
+
+
+def test_get_recipe_by_id(client):
     """
     Тестирование получения конкретного рецепта по ID.
 
@@ -49,7 +183,82 @@ def test_get_recipe_by_id():
     assert "list_of_ingredients" in data
 
 
-def test_get_recipe_by_invalid_id():
+def test_get_recipe_by_id_single_query(client):
+    """
+    Тестирование количества запросов к БД при получении рецепта.
+
+    Проверяет:
+        - Рецепт и его ингредиенты загружаются одним SELECT
+        - Список ингредиентов совпадает с данными рецепта
+    """
+    recipe_cache.clear()
+    with count_queries() as statements:
+        response = client.get("/recipes/1")
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert response.json()["list_of_ingredients"] == [
+        "Eggs",
+        "Cheese",
+        "Pancetta",
+        "Pepper",
+    ]
+
+
+def test_view_count_write_behind(client):
+    """
+    Тестирование отложенной записи счётчика просмотров.
+
+    Проверяет:
+        - Просмотры копятся в памяти, а не пишутся в БД при каждом GET
+        - После сброса (view_counter.flush()) views в списке увеличиваются
+          ровно на число просмотров
+    """
+
+    def views_of(title):
+        items = client.get("/recipes/", params={"limit": 100}).json()["items"]
+        return next(item["views"] for item in items if item["title"] == title)
+
+    title = client.get("/recipes/2").json()["title"]
+    client.portal.call(view_counter.flush)
+    before = views_of(title)
+
+    for _ in range(3):
+        assert client.get("/recipes/2").status_code == 200
+    assert view_counter.pending(2) == 3
+
+    assert client.portal.call(view_counter.flush) == 3
+    assert view_counter.pending(2) == 0
+    assert views_of(title) == before + 3
+
+
+def test_get_recipes_batch(client):
+    """
+    Тестирование пакетного чтения рецептов.
+
+    Проверяет:
+        - Рецепты с ингредиентами загружаются одним SQL-запросом
+        - Ответ совпадает с GET /recipes/{id}, для несуществующего ID
+          возвращается {"error": ...}
+        - Просмотр каждого найденного рецепта учитывается один раз
+    """
+    recipe_cache.clear()
+    pending = {recipe_id: view_counter.pending(recipe_id) for recipe_id in (1, 2)}
+    with count_queries() as statements:
+        response = client.get("/recipes/batch", params={"id": [1, 2, 999, 1]})
+    assert response.status_code == 200
+    assert len(statements) == 1
+    recipes = response.json()["recipes"]
+    assert list(recipes) == ["1", "2", "999"]
+    assert recipes["999"] == {"error": "No recipe with this id"}
+    assert recipes["2"] == client.get("/recipes/2").json()
+    assert view_counter.pending(1) == pending[1] + 1
+    assert view_counter.pending(2) == pending[2] + 2
+
+    too_many = {"id": list(range(1, 102))}
+    assert client.get("/recipes/batch", params=too_many).status_code == 422
+
+
+def test_get_recipe_by_invalid_id(client):
     """
     Тестирование обработки запроса несуществующего рецепта.
 
@@ -65,7 +274,7 @@ def test_get_recipe_by_invalid_id():
     assert data["error"] == "No recipe with this id"
 
 
-def test_add_new_recipe():
+def test_add_new_recipe(client):
     """
     Тестирование добавления нового рецепта.
 
@@ -98,7 +307,121 @@ def test_add_new_recipe():
     assert len(data["list_of_ingredients"]) == 2
 
 
-def test_add_duplicate_recipe():
+def test_add_new_recipe_single_transaction(client):
+    """
+    Тестирование пакетного создания рецепта.
+
+    Проверяет:
+        - Рецепт, ингредиенты и связи записываются тремя запросами
+          (рецепт, вставка нового ингредиента, связи): ID существующих
+          берутся из словаря ингредиентов
+        - Существующий ингредиент переиспользуется, новый создаётся
+        - GET /recipes/{id} возвращает тот же список ингредиентов
+    """
+    new_recipe = {
+        "title": "Cheese Omelette",
+        "cooking_time": 10,
+        "description": "Eggs and cheese.",
+        "list_of_ingredients": ["Eggs", "Cheese", "Chives"],
+    }
+    labels = {"method": "POST", "route": "/recipes/"}
+    statements = REQUEST_SQL_STATEMENTS.sum(**labels)
+    response = client.post("/recipes/", json=new_recipe)
+    assert response.status_code == 201
+    # Метрика запроса, а не count_queries(): создание рецепта запускает
+    # фоновое обновление таблицы популярности, его запрос сюда не относится.
+    assert REQUEST_SQL_STATEMENTS.sum(**labels) - statements == 3
+    created = response.json()["list_of_ingredients"]
+    assert sorted(created) == ["Cheese", "Chives", "Eggs"]
+
+    items = client.get("/recipes/", params={"limit": 100}).json()["items"]
+    details = [client.get(f"/recipes/{i}").json() for i in range(1, len(items) + 1)]
+    detail = next(d for d in details if d["title"] == "Cheese Omelette")
+    assert detail["list_of_ingredients"] == created
+
+
+def test_ingredient_dictionary(client):
+    """
+    Тестирование разрешения ингредиентов через словарь в памяти.
+
+    Проверяет:
+        - Рецепт только из известных ингредиентов записывается двумя
+          запросами (рецепт и связи), без обращений к ingredients
+        - Названия, отличающиеся регистром и пробелами, разрешаются
+          в существующий ингредиент с его написанием, повторы
+          в одном рецепте схлопываются
+        - Новый ингредиент сохраняется с нормализованными пробелами
+          и затем тоже разрешается без запросов к БД
+        - Процесс, в словаре которого ингредиента ещё нет, получает
+          существующую строку по ключу названия, а не вставляет дубль
+    """
+    labels = {"method": "POST", "route": "/recipes/"}
+    statements = REQUEST_SQL_STATEMENTS.sum(**labels)
+    misses = INGREDIENT_DICTIONARY_MISSES.value()
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": "Cheesy Eggs",
+            "cooking_time": 5,
+            "description": "Scramble the eggs with cheese.",
+            "list_of_ingredients": [" eggs ", "CHEESE", "Eggs"],
+        },
+    )
+    assert response.status_code == 201
+    assert response.json()["list_of_ingredients"] == ["Eggs", "Cheese"]
+    assert REQUEST_SQL_STATEMENTS.sum(**labels) - statements == 2
+    assert INGREDIENT_DICTIONARY_MISSES.value() == misses
+
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": "Saffron Rice",
+            "cooking_time": 25,
+            "description": "Rice with saffron.",
+            "list_of_ingredients": ["Saffron   Threads", "saffron threads"],
+        },
+    )
+    assert response.json()["list_of_ingredients"] == ["Saffron Threads"]
+    assert INGREDIENT_DICTIONARY_MISSES.value() == misses + 1
+    assert ingredient_dictionary.get(" SAFFRON threads") is not None
+
+    statements = REQUEST_SQL_STATEMENTS.sum(**labels)
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": "Saffron Eggs",
+            "cooking_time": 7,
+            "description": "Eggs with saffron.",
+            "list_of_ingredients": ["saffron threads", "eggs"],
+        },
+    )
+    assert sorted(response.json()["list_of_ingredients"]) == [
+        "Eggs",
+        "Saffron Threads",
+    ]
+    assert REQUEST_SQL_STATEMENTS.sum(**labels) - statements == 2
+
+    async def resolve_in_other_worker():
+        async with async_session() as session:
+            resolved = await IngredientDictionary().resolve(
+                session, ["SAFFRON threads", "Other Worker Herb"]
+            )
+            await session.commit()
+            count = await session.scalar(
+                text(
+                    "SELECT count(*) FROM ingredients "
+                    "WHERE name_key = 'saffron threads'"
+                )
+            )
+            return resolved, count
+
+    resolved, count = client.portal.call(resolve_in_other_worker)
+    assert resolved["Saffron Threads"] == ingredient_dictionary.get("saffron threads")
+    assert "Other Worker Herb" in resolved
+    assert count == 1
+
+
+def test_add_duplicate_recipe(client):
     """
     Тестирование попытки добавления дубликата рецепта.
 
@@ -119,3 +442,1223 @@ def test_add_duplicate_recipe():
     data = response.json()
     assert "error" in data
     assert data["error"] == "Recipe already exists"
+
+
+def test_import_recipes_ndjson(client):
+    """
+    Тестирование пакетного импорта рецептов из NDJSON.
+
+    Проверяет:
+        - Корректные строки создают рецепты, в том числе в нескольких пакетах
+          и при разбиении строки между фрагментами тела
+        - Невалидные строки и повторы названий попадают в errors
+          с номерами строк
+    """
+    lines = [
+        json.dumps(
+            {
+                "title": f"Imported Recipe {i}",
+                "cooking_time": 5 + i,
+                "description": "Imported.",
+                "list_of_ingredients": ["Salt", f"Imported Ingredient {i}"],
+            }
+        )
+        for i in range(5)
+    ]
+    lines.insert(2, "{not json")
+    lines.append(lines[0])
+    lines.append("")
+    lines.append(json.dumps({"title": "No time", "description": "x"}))
+    body = "\n".join(lines).encode()
+
+    response = client.post(
+        "/recipes/import",
+        params={"batch_size": 2},
+        content=iter([body[:37], body[37:]]),
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 5
+    assert data["failed"] == 3
+    assert [error["line"] for error in data["errors"]] == [3, 7, 9]
+    assert data["errors"][1]["error"] == "Recipe already exists"
+
+    items = client.get("/recipes/", params={"limit": 100}).json()["items"]
+    titles = [item["title"] for item in items]
+    for i in range(5):
+        assert titles.count(f"Imported Recipe {i}") == 1
+
+
+def test_import_recipes_normalized_ingredients(client):
+    """
+    Тестирование импорта ингредиентов в другом регистре и с пробелами.
+
+    Проверяет:
+        - Названия, отличающиеся от сохранённого регистром и пробелами,
+          и пустые названия не ломают импорт
+        - Рецепт связывается с уже существующим ингредиентом и попадает
+          в индекс поиска по ингредиентам
+    """
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": "Import Case Recipe",
+            "cooking_time": 5,
+            "description": "Import case test.",
+            "list_of_ingredients": ["Import Eggs"],
+        },
+    )
+    assert response.status_code == 201
+    lines = [
+        json.dumps(
+            {
+                "title": "Imported Case Recipe",
+                "cooking_time": 5,
+                "description": "Imported.",
+                "list_of_ingredients": ["import eggs", " Import  Flour ", ""],
+            }
+        ),
+        json.dumps(
+            {
+                "title": "Imported Case Recipe 2",
+                "cooking_time": 5,
+                "description": "Imported.",
+                "list_of_ingredients": ["IMPORT EGGS", "import flour"],
+            }
+        ),
+    ]
+    response = client.post("/recipes/import", content="\n".join(lines).encode())
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+
+    found = client.get(
+        "/recipes/by-ingredients",
+        params={"ingredient": ["Import Eggs", "Import Flour"]},
+    ).json()["items"]
+    assert [item["title"] for item in found] == [
+        "Imported Case Recipe",
+        "Imported Case Recipe 2",
+    ]
+    for item in found:
+        recipe = client.get(f"/recipes/{item['id']}").json()
+        assert sorted(recipe["list_of_ingredients"]) == ["Import Eggs", "Import Flour"]
+
+
+def test_export_recipes(client):
+    """
+    Тестирование потоковой выгрузки каталога.
+
+    Проверяет:
+        - NDJSON: по одной записи на рецепт, с описанием и ингредиентами
+        - CSV: заголовок и по одной строке на рецепт
+    """
+    items = client.get("/recipes/", params={"limit": 100}).json()["items"]
+
+    response = client.get("/recipes/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == len(items)
+    assert [record["id"] for record in records] == sorted(
+        record["id"] for record in records
+    )
+    first = records[0]
+    assert first["description"]
+    assert first["list_of_ingredients"] == ["Eggs", "Cheese", "Pancetta", "Pepper"]
+
+    response = client.get("/recipes/export", params={"format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "id"
+    assert len(rows) == len(items) + 1
+    assert rows[1][-1] == "Eggs;Cheese;Pancetta;Pepper"
+
+
+def test_recipe_cache(client):
+    """
+    Тестирование кеширования ответов списка и рецепта.
+
+    Проверяет:
+        - Повторный GET /recipes/{id} отдаётся из кеша без запросов к БД,
+          но просмотр всё равно учитывается
+        - Добавление рецепта сбрасывает закешированные страницы списка
+        - Счётчики попаданий и промахов доступны через /cache/stats
+    """
+    recipe_cache.clear()
+    first = client.get("/recipes/3").json()
+    pending = view_counter.pending(3)
+    with count_queries() as statements:
+        assert client.get("/recipes/3").json() == first
+    assert statements == []
+    assert view_counter.pending(3) == pending + 1
+
+    client.get("/recipes/", params={"limit": 100})
+    client.post(
+        "/recipes/",
+        json={
+            "title": "Cached List Breaker",
+            "cooking_time": 1,
+            "description": "Invalidates the list.",
+            "list_of_ingredients": ["Water"],
+        },
+    )
+    items = client.get("/recipes/", params={"limit": 100}).json()["items"]
+    assert "Cached List Breaker" in [item["title"] for item in items]
+
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 3
+
+
+def test_conditional_get_recipe(client):
+    """
+    Тестирование условных запросов рецепта (ETag, Last-Modified).
+
+    Проверяет:
+        - Ответ содержит ETag, Last-Modified и Cache-Control
+        - If-None-Match с текущим ETag даёт 304 без тела и без запросов
+          к БД, если версия рецепта есть в кеше, и с одним запросом
+          updated_at, если её нет
+        - Просмотр при ответе 304 учитывается
+        - If-Modified-Since не раньше Last-Modified даёт 304, другой ETag - 200
+    """
+    response = client.get("/recipes/1")
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"r1-')
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    pending = view_counter.pending(1)
+
+    with count_queries() as statements:
+        response = client.get("/recipes/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert statements == []
+    assert view_counter.pending(1) == pending + 1
+
+    recipe_cache.clear()
+    with count_queries() as statements:
+        response = client.get("/recipes/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(statements) == 1
+    assert "recipe_ingredient" not in statements[0]
+
+    last_modified = response.headers["last-modified"]
+    response = client.get("/recipes/1", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    response = client.get("/recipes/1", headers={"If-None-Match": 'W/"r1-0"'})
+    assert response.status_code == 200
+    assert response.json()["title"]
+    response = client.get("/recipes/100000", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+
+
+def test_conditional_get_all_recipes(client):
+    """
+    Тестирование условных запросов списка рецептов.
+
+    Проверяет:
+        - Повторный запрос страницы с её ETag даёт 304 без запросов к БД
+        - После добавления рецепта ETag списка меняется и возвращается 200
+    """
+    response = client.get("/recipes/", params={"limit": 5})
+    etag = response.headers["etag"]
+    with count_queries() as statements:
+        response = client.get(
+            "/recipes/", params={"limit": 5}, headers={"If-None-Match": etag}
+        )
+    assert response.status_code == 304
+    assert statements == []
+
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": "Conditional Toast",
+            "cooking_time": 3,
+            "description": "Toast the bread.",
+            "list_of_ingredients": ["Bread"],
+        },
+    )
+    assert response.status_code == 201
+    response = client.get(
+        "/recipes/", params={"limit": 5}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_response_compression(client, monkeypatch):
+    """
+    Тестирование сжатия ответов.
+
+    Проверяет:
+        - Ответ меньше compression_minimum_size отдаётся без сжатия,
+          но с Vary: Accept-Encoding
+        - Ответ не меньше порога сжимается gzip, Content-Length
+          соответствует сжатому телу
+        - Потоковая выгрузка сжимается по частям и совпадает с несжатой
+        - Без gzip в Accept-Encoding ответ не сжимается
+    """
+    gzip_headers = {"Accept-Encoding": "gzip"}
+    response = client.get("/recipes/", params={"limit": 2}, headers=gzip_headers)
+    assert len(response.content) < compression.COMPRESSION_MINIMUM_SIZE
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    items = response.json()["items"]
+
+    monkeypatch.setattr(compression, "COMPRESSION_MINIMUM_SIZE", 100)
+    with client.stream(
+        "GET", "/recipes/", params={"limit": 2}, headers=gzip_headers
+    ) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) == len(raw)
+    assert json.loads(gzip.decompress(raw))["items"] == items
+
+    plain = client.get("/recipes/export", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    response = client.get("/recipes/export", headers=gzip_headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == plain.content
+
+
+def test_memory_cache_eviction():
+    """
+    Тестирование вытеснения в MemoryCache.
+
+    Проверяет:
+        - Запись устаревает по истечении TTL
+        - При превышении max_bytes вытесняется давно не читавшаяся запись
+        - Значение больше max_bytes не сохраняется и удаляет прежнее
+          значение ключа
+    """
+    now = [0.0]
+    cache = MemoryCache(ttl=10, max_entries=10, max_bytes=10, clock=lambda: now[0])
+    cache.set("recipe", "1", b"aaaa")
+    cache.set("recipe", "2", b"bbbb")
+    assert cache.get("recipe", "1") == b"aaaa"
+    cache.set("recipe", "3", b"cccc")
+    assert cache.get("recipe", "2") is None
+    assert cache.get("recipe", "1") == b"aaaa"
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("recipe", "1", b"a" * 11)
+    assert cache.get("recipe", "1") is None
+
+    now[0] = 11
+    assert cache.get("recipe", "3") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_cache(tmp_path):
+    """
+    Тестирование DiskCache.
+
+    Проверяет:
+        - Значение читается обратно, в том числе новым экземпляром кеша
+        - clear(namespace) удаляет только записи этого пространства имён
+        - Значение больше max_bytes удаляет прежнее значение ключа
+    """
+    cache = DiskCache(str(tmp_path), ttl=60, max_entries=10, max_bytes=1024)
+    cache.set("list", "20:", b"page")
+    cache.set("recipe", "1", b"recipe")
+
+    reopened = DiskCache(str(tmp_path), ttl=60, max_entries=10, max_bytes=1024)
+    assert reopened.get("list", "20:") == b"page"
+    assert reopened.stats()["bytes"] == 10
+
+    reopened.clear("list")
+    assert reopened.get("list", "20:") is None
+    assert reopened.get("recipe", "1") == b"recipe"
+
+    reopened.set("recipe", "1", b"r" * 1025)
+    assert reopened.get("recipe", "1") is None
+    assert reopened.stats()["entries"] == 0
+
+
+def test_search_recipes(client):
+    """
+    Тестирование полнотекстового поиска.
+
+    Проверяет:
+        - Поиск по слову из описания находит рецепт и подсвечивает совпадение
+        - Рецепты, созданные через POST и импорт, сразу доступны для поиска
+        - Пагинация через next_offset и запрос со спецсимволами FTS5
+        - rebuild_search_index пересобирает индекс без потери результатов
+    """
+    response = client.get("/recipes/search", params={"q": "pasta"})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["title"] for item in items] == ["Spaghetti Carbonara"]
+    assert "<b>pasta</b>" in items[0]["snippet"]
+
+    client.post(
+        "/recipes/",
+        json={
+            "title": "Borscht",
+            "cooking_time": 90,
+            "description": "Beetroot soup.",
+            "list_of_ingredients": ["Beetroot"],
+        },
+    )
+    client.post(
+        "/recipes/import",
+        content=json.dumps(
+            {
+                "title": "Beetroot Salad",
+                "cooking_time": 15,
+                "description": "Cold salad.",
+                "list_of_ingredients": ["Beetroot"],
+            }
+        ),
+    )
+    first = client.get("/recipes/search", params={"q": "beet", "limit": 1}).json()
+    assert first["items"][0]["title"] == "Beetroot Salad"
+    assert first["next_offset"] == 1
+    second = client.get(
+        "/recipes/search", params={"q": "beet", "limit": 1, "offset": 1}
+    ).json()
+    assert [item["title"] for item in second["items"]] == ["Borscht"]
+    assert second["next_offset"] is None
+
+    response = client.get("/recipes/search", params={"q": 'soup" OR NEAR(*'})
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+    async def rebuild():
+        async with engine.begin() as conn:
+            await rebuild_search_index(conn)
+
+    client.portal.call(rebuild)
+    items = client.get("/recipes/search", params={"q": "beetroot"}).json()["items"]
+    assert len(items) == 2
+
+
+def test_recipes_by_ingredients(client):
+    """
+    Тестирование поиска рецептов по ингредиентам.
+
+    Проверяет:
+        - Индекс строится при запуске и дополняется рецептами,
+          созданными после запуска
+        - Режимы all, any и missing (с max_missing)
+        - Неизвестный ингредиент в режиме all даёт пустой результат
+        - Регистр и лишние пробелы в названиях не учитываются
+    """
+    recipes = {
+        "Index Recipe AB": ["Index A", "Index B"],
+        "Index Recipe ABC": ["Index A", "Index B", "Index C"],
+        "Index Recipe C": ["Index C"],
+    }
+    for title, ingredients in recipes.items():
+        client.post(
+            "/recipes/",
+            json={
+                "title": title,
+                "cooking_time": 5,
+                "description": "Index test.",
+                "list_of_ingredients": ingredients,
+            },
+        )
+
+    def titles(**params):
+        response = client.get("/recipes/by-ingredients", params=params)
+        assert response.status_code == 200
+        return [item["title"] for item in response.json()["items"]]
+
+    assert titles(ingredient=["Index A", "Index B"]) == [
+        "Index Recipe AB",
+        "Index Recipe ABC",
+    ]
+    assert titles(ingredient=["index a", "  INDEX   B "]) == [
+        "Index Recipe AB",
+        "Index Recipe ABC",
+    ]
+    assert titles(ingredient=["Index B", "Index C"], match="any") == [
+        "Index Recipe AB",
+        "Index Recipe ABC",
+        "Index Recipe C",
+    ]
+    assert titles(ingredient=["Index A", "Index B"], match="missing") == [
+        "Index Recipe AB"
+    ]
+    data = client.get(
+        "/recipes/by-ingredients",
+        params={
+            "ingredient": ["Index A", "Index B"],
+            "match": "missing",
+            "max_missing": 1,
+        },
+    ).json()
+    assert [(item["title"], item["missing"]) for item in data["items"]] == [
+        ("Index Recipe AB", 0),
+        ("Index Recipe ABC", 1),
+    ]
+    assert titles(ingredient=["Index A", "Unknown"]) == []
+    assert titles(ingredient=["Pancetta"]) == ["Spaghetti Carbonara"]
+
+
+def test_ingredient_autocomplete(client):
+    """
+    Тестирование подсказок ингредиентов.
+
+    Проверяет:
+        - Подсказки упорядочены по числу рецептов, затем по алфавиту,
+          регистр начала названия не учитывается
+        - Новый ингредиент появляется в подсказках сразу после создания
+          рецепта, а число рецептов растёт
+        - Ответ формируется без запросов к БД
+        - Запомненные ответы коротких префиксов обновляются при создании
+          рецептов и совпадают с ответами заново построенного индекса,
+          в том числе при scan_limit по умолчанию
+    """
+
+    def suggest(prefix, limit=10):
+        response = client.get(
+            "/ingredients/autocomplete", params={"prefix": prefix, "limit": limit}
+        )
+        assert response.status_code == 200
+        return [(item["name"], item["recipes"]) for item in response.json()]
+
+    def create(title, ingredients):
+        response = client.post(
+            "/recipes/",
+            json={
+                "title": title,
+                "cooking_time": 5,
+                "description": "Autocomplete test.",
+                "list_of_ingredients": ingredients,
+            },
+        )
+        assert response.status_code == 201
+
+    create("Zest Recipe 1", ["Zesty Lime", "Zesty Lemon"])
+    create("Zest Recipe 2", ["Zesty Lemon"])
+    labels = {"method": "GET", "route": "/ingredients/autocomplete"}
+    assert suggest("zESTY") == [("Zesty Lemon", 2), ("Zesty Lime", 1)]
+    assert REQUEST_SQL_STATEMENTS.sum(**labels) == 0
+    assert suggest("zesty", limit=1) == [("Zesty Lemon", 2)]
+    assert suggest("zesty li") == [("Zesty Lime", 1)]
+    assert suggest("zesty x") == []
+
+    index = IngredientAutocomplete(scan_limit=1)
+    index.build([("Zesty Lime", 1), ("Zesty Lemon", 2), ("zesty  lime", 2)])
+    assert index.suggest("z", 5) == [("Zesty Lime", 3), ("Zesty Lemon", 2)]
+    index.add_recipe({"Zesty Lemon": 1, "Zesty Orange": 3})
+    index.add_recipe({"Zesty Lemon": 1})
+    assert index.suggest("z", 5) == [
+        ("Zesty Lemon", 4),
+        ("Zesty Lime", 3),
+        ("Zesty Orange", 1),
+    ]
+
+    rng = random.Random(0)
+    names = [f"Zest {i}" for i in range(60)]
+    index = IngredientAutocomplete(scan_limit=1)
+    index.build((name, rng.randint(0, 5)) for name in names[:40])
+    prefixes = ["", "z", "zest 1", "zest 5"]
+    for prefix in prefixes:
+        index.suggest(prefix, 1)
+    for _ in range(300):
+        index.add_recipe({name: 0 for name in rng.sample(names, 3)})
+    rebuilt = IngredientAutocomplete(scan_limit=1)
+    rebuilt.build((index._names[key], uses) for key, uses in index._uses.items())
+    for prefix in prefixes:
+        assert index.suggest(prefix, 20) == rebuilt.suggest(prefix, 20)
+
+    index = IngredientAutocomplete()
+    index.build((f"Bulk {i:04d}", 1) for i in range(2 * index.scan_limit))
+    index.add_recipe({"Bulk 0300": 7, "Bulk New": 8})
+    index.add_recipe({"Bulk 0300": 7})
+    assert index.suggest("bulk", 3) == [
+        ("Bulk 0300", 3),
+        ("Bulk 0000", 1),
+        ("Bulk 0001", 1),
+    ]
+    assert ("Bulk New", 1) in index.suggest("bulk n", 5)
+
+
+def test_similar_recipes(client):
+    """
+    Тестирование поиска похожих рецептов.
+
+    Проверяет:
+        - Рецепты, созданные после построения индекса, находятся
+          и упорядочиваются по точному коэффициенту Жаккара
+        - Рецепты без общих ингредиентов не возвращаются
+        - Несуществующий рецепт - 404
+    """
+    recipes = {
+        "Similar Base": ["Sim 1", "Sim 2", "Sim 3", "Sim 4", "Sim 5"],
+        "Similar Twin": ["Sim 1", "Sim 2", "Sim 3", "Sim 4", "Sim 5"],
+        "Similar Variant": ["Sim 1", "Sim 2", "Sim 3", "Sim 4", "Sim 6"],
+        "Similar Other": ["Sim 9"],
+    }
+    for title, ingredients in recipes.items():
+        response = client.post(
+            "/recipes/",
+            json={
+                "title": title,
+                "cooking_time": 10,
+                "description": "Similarity test.",
+                "list_of_ingredients": ingredients,
+            },
+        )
+        assert response.status_code == 201
+    found = client.get(
+        "/recipes/by-ingredients",
+        params={"ingredient": ["Sim 1", "Sim 9"], "match": "any"},
+    ).json()["items"]
+    ids = {item["title"]: item["id"] for item in found}
+
+    response = client.get(f"/recipes/{ids['Similar Base']}/similar")
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [(item["title"], item["similarity"]) for item in items[:2]] == [
+        ("Similar Twin", 1.0),
+        ("Similar Variant", 0.6667),
+    ]
+    assert "Similar Other" not in {item["title"] for item in items}
+    assert set(items[0]) == {"id", "title", "cooking_time", "views", "similarity"}
+
+    response = client.get("/recipes/100000/similar")
+    assert response.status_code == 404
+
+
+def test_minhash_index():
+    """
+    Тестирование индекса MinHash/LSH.
+
+    Проверяет:
+        - Рецепт с тем же составом всегда среди кандидатов, сам рецепт - нет
+        - Добавленные рецепты находятся до и после слияния в массивы полос
+        - Ранжирование по точному коэффициенту Жаккара
+    """
+    index = MinHashIndex(
+        bands=8,
+        rows=2,
+        max_candidates=10,
+        bucket_limit=100,
+        batch_size=2,
+        compact_threshold=3,
+    )
+    index.build([(1, [1, 2, 3]), (2, [1, 2, 3]), (3, [7, 8]), (4, [])])
+    assert len(index) == 3
+    assert index.candidates([1, 2, 3], exclude=1) == [2]
+    assert index.candidates([]) == []
+
+    index.add_recipe(5, [7, 8])
+    index.add_recipe(6, [1, 2, 3])
+    assert 5 in index.candidates([7, 8], exclude=3)
+    assert set(index.candidates([1, 2, 3], exclude=1)) >= {2, 6}
+    index.add_recipe(7, [9])
+    assert len(index) == 6
+    assert index.memory_bytes == 6 * 8 * index.bands
+    assert 5 in index.candidates([7, 8], exclude=3)
+    assert set(index.candidates([1, 2, 3], exclude=1)) >= {2, 6}
+
+    assert rank_by_jaccard(
+        {1, 2, 3}, {2: {1, 2, 3}, 3: {7}, 4: {1, 2, 4}, 5: {1, 2}}, 2
+    ) == [(2, 1.0), (5, 2 / 3)]
+
+
+def test_sqlite_profile(client):
+    """
+    Тестирование профиля SQLite и раздельных движков.
+
+    Проверяет:
+        - Движок записи работает в режиме WAL с synchronous=NORMAL
+        - Соединения пула чтения не могут изменять БД
+    """
+
+    async def check():
+        async with engine.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+            assert (await conn.exec_driver_sql("PRAGMA synchronous")).scalar() == 1
+        async with reader_engine.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA query_only")).scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.exec_driver_sql("UPDATE recipes SET views = views + 1")
+
+    client.portal.call(check)
+
+
+def test_generate_data(tmp_path):
+    """
+    Тестирование генератора синтетического каталога.
+
+    Проверяет:
+        - Создаётся заданное число рецептов и связей с ингредиентами
+        - Частоты ингредиентов убывают по рангу (распределение Ципфа)
+        - Повторный запуск дополняет каталог без конфликтов названий
+        - БД получает последнюю версию схемы, и приложению не нужны миграции
+    """
+    target = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'generated.db'}")
+
+    async def run():
+        first = await generate(target, 300, ingredients=50, batch_size=100)
+        second = await generate(target, 200, ingredients=50, batch_size=100)
+        async with target.connect() as conn:
+            recipes = await conn.scalar(text("SELECT count(*) FROM recipes"))
+            version = await conn.scalar(text("PRAGMA user_version"))
+            usage = dict(
+                (
+                    await conn.execute(
+                        text(
+                            "SELECT ingredients.name, count(*) FROM recipe_ingredient "
+                            "JOIN ingredients ON ingredients.id = ingredient_id "
+                            "GROUP BY ingredients.name"
+                        )
+                    )
+                ).all()
+            )
+        await target.dispose()
+        return first, second, recipes, version, usage
+
+    first, second, recipes, version, usage = asyncio.run(run())
+    assert recipes == 500
+    assert version == SCHEMA_VERSION
+    assert first["links"] + second["links"] == sum(usage.values())
+    assert usage["Ingredient 1"] > usage.get("Ingredient 10", 0)
+    assert usage["Ingredient 10"] > usage.get("Ingredient 50", 0)
+
+
+LEGACY_SCHEMA = (
+    "CREATE TABLE recipes (id INTEGER NOT NULL PRIMARY KEY, title TEXT NOT NULL, "
+    "description TEXT, cooking_time INTEGER NOT NULL, views INTEGER)",
+    "CREATE INDEX ix_recipes_id ON recipes (id)",
+    "CREATE INDEX ix_recipes_title ON recipes (title)",
+    "CREATE INDEX ix_recipes_description ON recipes (description)",
+    "CREATE INDEX ix_recipes_cooking_time ON recipes (cooking_time)",
+    "CREATE TABLE ingredients (id INTEGER NOT NULL PRIMARY KEY, name TEXT, "
+    "UNIQUE (name))",
+    "CREATE INDEX ix_ingredients_id ON ingredients (id)",
+    "CREATE INDEX ix_ingredients_name ON ingredients (name)",
+    "CREATE TABLE recipe_ingredient (recipe_id INTEGER NOT NULL, "
+    "ingredient_id INTEGER NOT NULL, PRIMARY KEY (recipe_id, ingredient_id), "
+    "FOREIGN KEY(recipe_id) REFERENCES recipes (id), "
+    "FOREIGN KEY(ingredient_id) REFERENCES ingredients (id))",
+    "INSERT INTO recipes VALUES (1, 'Old Soup', 'Legacy broth', 30, 7)",
+    "INSERT INTO ingredients VALUES (1, 'Milk'), (2, 'milk '), (3, 'Salt')",
+)
+
+
+def test_migrations(tmp_path):
+    """
+    Тестирование версионирования схемы.
+
+    Проверяет:
+        - Пустая БД создаётся сразу в последней версии
+        - БД со схемой до появления версий мигрирует до последней версии:
+          появляются индекс популярности, уникальность title и поиск
+          по уже существующим рецептам, у них появляется updated_at;
+          ключ названия ингредиента получает только первая из почти
+          одинаковых строк
+        - Повторный запуск на актуальной схеме ничего не делает
+    """
+
+    async def run():
+        fresh = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'fresh.db'}")
+        async with fresh.begin() as conn:
+            assert await migrate(conn) == 0
+            assert await get_schema_version(conn) == SCHEMA_VERSION
+        await fresh.dispose()
+
+        legacy = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+        async with legacy.begin() as conn:
+            for statement in LEGACY_SCHEMA:
+                await conn.execute(text(statement))
+        async with legacy.begin() as conn:
+            assert await migrate(conn) == 1
+        async with legacy.begin() as conn:
+            assert await migrate(conn) == SCHEMA_VERSION
+            indexes = {
+                row.name: row.unique
+                for row in await conn.execute(text("PRAGMA index_list(recipes)"))
+            }
+            found = await conn.scalar(
+                text("SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH 'broth'")
+            )
+            updated_at = await conn.scalar(text("SELECT updated_at FROM recipes"))
+            name_keys = (
+                await conn.execute(
+                    text("SELECT id, name_key FROM ingredients ORDER BY id")
+                )
+            ).all()
+        await legacy.dispose()
+        return indexes, found, updated_at, name_keys
+
+    indexes, found, updated_at, name_keys = asyncio.run(run())
+    assert name_keys == [(1, "milk"), (2, None), (3, "salt")]
+    assert updated_at > 0
+    assert indexes["ix_recipes_title"] == 1
+    assert "ix_recipes_popularity" in indexes
+    assert found == 1
+
+
+def test_metrics(client):
+    """
+    Тестирование метрик /metrics.
+
+    Проверяет:
+        - Для маршрута учитываются запросы, задержка и число SQL-выражений
+          на запрос (GET /recipes/{id} - одно выражение)
+        - Экспортируются счётчики просмотров, поиска ингредиентов, страниц
+          списка и кеша
+    """
+    recipe_cache.clear()
+    labels = {"method": "GET", "route": "/recipes/{recipe_id}"}
+    requests = REQUEST_SQL_STATEMENTS.count(**labels)
+    statements = REQUEST_SQL_STATEMENTS.sum(**labels)
+
+    assert client.get("/recipes/1").status_code == 200
+    assert REQUEST_SQL_STATEMENTS.count(**labels) == requests + 1
+    assert REQUEST_SQL_STATEMENTS.sum(**labels) == statements + 1
+    assert REQUESTS_IN_FLIGHT.value() == 0
+    assert client.get("/recipes/").status_code == 200
+
+    client.portal.call(view_counter.flush)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text_metrics = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/recipes/{recipe_id}"}' in text_metrics
+    )
+    assert "http_request_sql_statements_bucket{" in text_metrics
+    assert 'sql_statements_total{engine="reader"}' in text_metrics
+    assert "view_count_increments_total " in text_metrics
+    assert "ingredient_lookups_total " in text_metrics
+    assert "recipe_list_pages_total{" in text_metrics
+    assert 'recipe_cache{stat="misses"}' in text_metrics
+
+
+def test_config_env_override(monkeypatch):
+    """
+    Тестирование чтения настроек.
+
+    Проверяет:
+        - Значение из файла CONFIG используется, если нет переменной окружения
+        - Переменная окружения SECTION_OPTION имеет приоритет над CONFIG
+    """
+    monkeypatch.delenv("DATABASE_POOL_SIZE", raising=False)
+    assert get_int("database", "pool_size", 0) == 5
+    monkeypatch.setenv("DATABASE_POOL_SIZE", "12")
+    assert get_int("database", "pool_size", 0) == 12
+
+
+def test_request_profiling(client):
+    """
+    Тестирование профилирования отдельных запросов.
+
+    Проверяет:
+        - Запросы без заголовка X-Profile не профилируются
+        - Для запроса с заголовком сохраняются pstats, снимок tracemalloc
+          и выполненные SQL-выражения
+        - Хранится не больше max_profiles последних профилей
+    """
+    recipe_cache.clear()
+    before = len(request_profiler.list())
+    client.get("/recipes/1")
+    assert len(request_profiler.list()) == before
+
+    for _ in range(3):
+        recipe_cache.clear()
+        assert client.get("/recipes/1", headers={"X-Profile": "1"}).status_code == 200
+
+    profiles = client.get("/admin/profiles").json()
+    assert len(profiles) == 2
+    latest = profiles[0]
+    assert latest["path"] == "/recipes/1"
+    assert latest["status"] == 200
+    assert latest["sql_statements"] == 1
+
+    sql = client.get(f"/admin/profiles/{latest['name']}/sql.json").json()
+    assert "FROM recipes" in sql[0]["statement"]
+    pstats_file = client.get(f"/admin/profiles/{latest['name']}/profile.pstats")
+    assert pstats_file.status_code == 200
+    assert client.get(f"/admin/profiles/{latest['name']}/app.py").status_code == 404
+
+
+def test_leaderboard(client):
+    """
+    Тестирование таблицы популярности в памяти.
+
+    Проверяет:
+        - Первая страница списка и /recipes/top отдаются без запросов к БД
+        - Просмотр сразу учитывается в таблице, до записи в БД
+        - Таблица меньше каталога отдаёт только целиком вмещающиеся
+          страницы, остальные читаются из БД
+        - Постраничный обход по курсорам возвращает весь список без
+          пропусков и повторов
+    """
+    client.portal.call(leaderboard.refresh)
+    assert leaderboard.ready
+    with count_queries() as statements:
+        first = client.get("/recipes/", params={"limit": 3}).json()
+        top = client.get("/recipes/top", params={"limit": 3}).json()
+    assert statements == []
+    assert [item["title"] for item in top] == [i["title"] for i in first["items"]]
+
+    last = top[-1]
+    for _ in range(top[0]["views"] - last["views"] + 1):
+        client.get(f"/recipes/{last['id']}")
+    assert client.get("/recipes/top", params={"limit": 1}).json()[0] == {
+        **last,
+        "views": top[0]["views"] + 1,
+    }
+
+    small = Leaderboard(
+        read_session, view_counter.pending, lambda: view_counter.flush_lock, 2, 3600
+    )
+    client.portal.call(small.refresh)
+    assert not small.complete
+    recipes, has_more = small.page(2)
+    assert has_more
+    assert small.page(3) is None
+
+    full = client.get("/recipes/", params={"limit": 100}).json()["items"]
+    after = (recipes[-1].views, recipes[-1].cooking_time, recipes[-1].id)
+    assert small.page(1, after) is None
+    client.portal.call(view_counter.flush)
+    paged = []
+    params = {"limit": 2}
+    while True:
+        page = client.get("/recipes/", params=params).json()
+        paged.extend(page["items"])
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+    assert [item["title"] for item in paged] == [item["title"] for item in full]
+
+
+def test_leaderboard_load_during_flush(client):
+    """
+    Тестирование заполнения таблицы популярности одновременно со сбросом
+    просмотров.
+
+    Проверяет:
+        - Просмотры, ушедшие из очереди в БД во время запроса таблицы,
+          учитываются в ней ровно один раз
+    """
+
+    class GatedSession:
+        # Сессия, которая после выполнения запроса ждёт разрешения.
+        def __init__(self, session, executed, gate):
+            self.session = session
+            self.executed = executed
+            self.gate = gate
+
+        async def execute(self, *args, **kwargs):
+            result = await self.session.execute(*args, **kwargs)
+            self.executed.set()
+            await self.gate.wait()
+            return result
+
+    async def scenario():
+        counter = ViewCounter(async_session, flush_interval=3600, flush_threshold=10**6)
+        board = Leaderboard(
+            read_session, counter.pending, lambda: counter.flush_lock, 1000, 3600
+        )
+        await board.refresh()
+        recipe = next(iter(board._recipes.values()))
+        counter.add(recipe.id, 5)
+        executed, gate = asyncio.Event(), asyncio.Event()
+        async with read_session() as session:
+            load = asyncio.ensure_future(
+                board.load(GatedSession(session, executed, gate))
+            )
+            await executed.wait()
+            flush = asyncio.ensure_future(counter.flush())
+            await asyncio.sleep(0.1)
+            gate.set()
+            await load
+            assert await flush == 5
+        loaded = board._recipes[recipe.id].views
+        await board.refresh()
+        return recipe.views, loaded, board._recipes[recipe.id].views
+
+    before, loaded, refreshed = client.portal.call(scenario)
+    assert loaded == before + 5
+    assert refreshed == before + 5
+
+
+def start_worker(database_url):
+    """
+    Запускает отдельный процесс uvicorn с приложением на свободном порту.
+
+    Returns:
+        Tuple[subprocess.Popen, str]: Процесс и его базовый URL
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "VIEWS_FLUSH_INTERVAL": "0.1",
+        "WORKERS_POLL_INTERVAL": "0.1",
+        "LEADERBOARD_REFRESH_INTERVAL": "3600",
+        "PROFILING_ENABLED": "false",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+def wait_until(check, timeout=10.0):
+    """
+    Повторяет check() до истинного результата; возвращает затраченное время.
+    """
+    started = time.monotonic()
+    while not check():
+        assert time.monotonic() - started < timeout, "condition not met in time"
+        time.sleep(0.05)
+    return time.monotonic() - started
+
+
+def test_multiple_workers(tmp_path):
+    """
+    Тестирование нескольких воркеров с общим файлом БД.
+
+    Проверяет:
+        - Воркеры, запущенные одновременно, готовят и заполняют БД один раз
+        - Рецепт, добавленный через один воркер, появляется в списке
+          и поиске по ингредиентам другого воркера, несмотря на кеш
+          и индексы в памяти
+        - Просмотры, записанные одним воркером, видны в списке другого
+        - После чтения журнала воркеры отдают список с одинаковыми ETag
+          и Last-Modified, и ETag одного воркера даёт 304 у другого
+    """
+    database_url = f"sqlite+aiosqlite:///{tmp_path / 'workers.db'}"
+    workers = [start_worker(database_url) for _ in range(2)]
+    try:
+        clients = [httpx.Client(base_url=url, timeout=5) for _, url in workers]
+        first, second = clients
+
+        def serving(client):
+            try:
+                return client.get("/recipes/top").status_code == 200
+            except httpx.TransportError:
+                return False
+
+        for client in clients:
+            wait_until(lambda: serving(client), timeout=30)
+
+        def second_list():
+            response = second.get("/recipes/", params={"limit": 100})
+            return {item["title"]: item for item in response.json()["items"]}
+
+        assert len(second_list()) == 5
+        params = {"ingredient": "Worker Spice"}
+        assert second.get("/recipes/by-ingredients", params=params).status_code in (
+            200,
+            503,
+        )
+
+        created = first.post(
+            "/recipes/",
+            json={
+                "title": "Shared Stew",
+                "cooking_time": 30,
+                "description": "Seen by every worker.",
+                "list_of_ingredients": ["Worker Spice", "Water"],
+            },
+        )
+        assert created.status_code == 201
+        elapsed = wait_until(lambda: "Shared Stew" in second_list())
+        assert elapsed < 1
+
+        def found_by_ingredient():
+            response = second.get("/recipes/by-ingredients", params=params)
+            return response.status_code == 200 and response.json()["total"] == 1
+
+        wait_until(found_by_ingredient)
+
+        views = second_list()["Shared Stew"]["views"]
+        for _ in range(3):
+            assert first.get("/recipes/6").status_code == 200
+        wait_until(lambda: second_list()["Shared Stew"]["views"] == views + 3)
+
+        def list_headers(client):
+            headers = client.get("/recipes/", params={"limit": 5}).headers
+            return headers["etag"], headers["last-modified"]
+
+        wait_until(lambda: list_headers(first) == list_headers(second))
+        etag = list_headers(first)[0]
+        response = second.get(
+            "/recipes/", params={"limit": 5}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+    finally:
+        for process, _ in workers:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def test_admission_limiter():
+    """
+    Тестирование ограничителя одновременных запросов.
+
+    Проверяет:
+        - Сверх concurrency запросы ждут в очереди и получают место
+          в порядке поступления
+        - При заполненной очереди запрос отклоняется сразу
+        - Запрос, не дождавшийся места за queue_timeout, отклоняется
+    """
+
+    async def scenario():
+        limiter = Limiter(concurrency=1, queue_size=1, queue_timeout=0.05)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        with pytest.raises(Overloaded, match="queue_full"):
+            await limiter.acquire()
+        limiter.release()
+        await waiter
+        assert (limiter.active, limiter.waiting) == (1, 0)
+        with pytest.raises(Overloaded, match="timeout"):
+            await limiter.acquire()
+        assert limiter.waiting == 0
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_admission_control(client, monkeypatch):
+    """
+    Тестирование отказа в обслуживании при перегрузке.
+
+    Проверяет:
+        - Запрос сверх бюджета записи получает 503 с Retry-After
+        - Бюджет чтения от записи не зависит
+        - Отказ учитывается в метрике admission_shed_total
+    """
+    limiter = admission.limiter("write", "/recipes/")
+    monkeypatch.setattr(limiter, "active", limiter.concurrency)
+    monkeypatch.setattr(limiter, "queue_size", 0)
+    labels = {"kind": "write", "route": "/recipes/", "reason": "queue_full"}
+    shed = ADMISSION_SHED.value(**labels)
+
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": "Rejected Recipe",
+            "cooking_time": 5,
+            "description": "Never stored.",
+            "list_of_ingredients": ["Water"],
+        },
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json() == {"error": "Server is overloaded, retry later"}
+    assert client.get("/recipes/").status_code == 200
+    assert ADMISSION_SHED.value(**labels) == shed + 1
+    text_metrics = client.get("/metrics").text
+    assert "admission_queue_depth{" in text_metrics
+    assert "admission_shed_total{" in text_metrics
+
+
+# "SCAN recipes" (SQLite >= 3.36) или "SCAN TABLE recipes": полный просмотр
+# таблицы без индекса. "SCAN ... USING [COVERING] INDEX" и виртуальные
+# таблицы (FTS5) сюда не попадают.
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+$")
+
+HOT_QUERIES = {
+    "list_first_page": recipes_page_query(20),
+    "list_next_page": recipes_page_query(20, (5, 10, 3)),
+    "recipe_detail": recipes_with_ingredients_query().filter(Recipe.id == 1),
+    "recipes_batch": recipes_with_ingredients_query().filter(Recipe.id.in_([1, 2])),
+    "recipes_by_ids": select(
+        Recipe.id, Recipe.title, Recipe.cooking_time, Recipe.views
+    ).filter(Recipe.id.in_([1, 2])),
+    "existing_ingredients": select(Ingredient.id, Ingredient.name).filter(
+        Ingredient.name.in_(["Eggs", "Milk"])
+    ),
+    "recipes_with_ingredient": select(RecipeIngredient.recipe_id).filter(
+        RecipeIngredient.ingredient_id == 1
+    ),
+    "ingredient_index_load": select(
+        RecipeIngredient.ingredient_id, RecipeIngredient.recipe_id
+    ).order_by(RecipeIngredient.ingredient_id, RecipeIngredient.recipe_id),
+    "view_count_update": update(Recipe)
+    .filter(Recipe.id == 1)
+    .values(views=Recipe.views + 1),
+    "change_log_poll": select(CatalogChange.id, CatalogChange.recipe_id)
+    .filter(CatalogChange.id > 0)
+    .order_by(CatalogChange.id),
+    "change_log_ingredients": select(
+        RecipeIngredient.recipe_id, Ingredient.name, Ingredient.id
+    )
+    .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+    .filter(RecipeIngredient.recipe_id.in_([1, 2])),
+    "search": SEARCH_QUERY.bindparams(query='"egg"*', limit=20, offset=0),
+}
+
+
+def explain(client, statement):
+    """
+    Возвращает строки EXPLAIN QUERY PLAN для выражения SQLAlchemy.
+    """
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+
+    async def run():
+        async with engine.connect() as conn:
+            res = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in res]
+
+    return client.portal.call(run)
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_query_plan(client, name):
+    """
+    Тестирование планов частых запросов.
+
+    Проверяет:
+        - Ни один частый запрос не просматривает таблицу целиком
+        - Список и построение индекса ингредиентов читают покрывающие
+          индексы без сортировки во временном B-дереве
+    """
+    plan = explain(client, HOT_QUERIES[name])
+    assert not [step for step in plan if FULL_SCAN.match(step)], plan
+    if name.startswith("list_"):
+        assert any("COVERING INDEX ix_recipes_popularity" in s for s in plan), plan
+    if name in ("list_first_page", "list_next_page", "ingredient_index_load"):
+        assert not [step for step in plan if "TEMP B-TREE" in step], plan
+    if name in ("ingredient_index_load", "recipes_with_ingredient"):
+        assert any("ix_recipe_ingredient_ingredient_id" in s for s in plan), plan
+
+
+def test_schema_indexes(client):
+    """
+    Тестирование набора индексов схемы.
+
+    Проверяет:
+        - Нет индексов, дублирующих первичные ключи, и индексов колонок,
+          по которым запросы не фильтруют (вставка их не обновляет)
+    """
+
+    async def index_names():
+        async with engine.connect() as conn:
+            res = await conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index'")
+            )
+            return {row[0] for row in res if not row[0].startswith("sqlite_")}
+
+    assert client.portal.call(index_names) == {
+        "ix_recipes_popularity",
+        "ix_recipes_title",
+        "ix_ingredients_name",
+        "ix_ingredients_name_key",
+        "ix_recipe_ingredient_ingredient_id",
+    }
@@ -1,83 +1,232 @@
-from typing import Iterable, List, Optional, Sequence, Set
+import base64
+import binascii
+import json
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from database import session
-from models import Ingredient, Recipe, RecipeIngredient
+import orjson
+import schemas
+from ingredient_dictionary import ingredient_dictionary
+from metrics import VIEW_COUNT_INCREMENTS, VIEW_COUNT_UPDATES
+from models import Ingredient, Recipe, RecipeIngredient, ingredient_key
+from sqlalchemy import and_, bindparam, desc, insert, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql import Select
 
+RecipeCursor = Tuple[int, int, int]
 
-async def increase_view_count(recipe_id: Optional[int] = None) -> None:
+# Колонки RecipeOutShort (+ id для курсора) в порядке полей строки выборки.
+RECIPE_SHORT_COLUMNS = (Recipe.title, Recipe.cooking_time, Recipe.views, Recipe.id)
+
+
+def encode_cursor(recipe: Union[Recipe, Row]) -> str:
     """
-    Увеличивает счетчик просмотров для одного или всех рецептов.
+    Кодирует позицию рецепта в выдаче в непрозрачный курсор.
 
     Args:
-        recipe_id (Optional[int]): ID рецепта, для которого нужно
-         увеличить счетчик просмотров.
-         Если не указан, счетчик увеличивается для всех рецептов.
+        recipe (Union[Recipe, Row]): Последний рецепт на текущей странице
+            (объект или строка с колонками views, cooking_time и id)
 
     Returns:
-        None
+        str: Курсор (urlsafe base64 от ключа (views, cooking_time, id))
+    """
+    key: RecipeCursor = (recipe.views, recipe.cooking_time, recipe.id)
+    raw: bytes = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[RecipeCursor]:
+    """
+    Декодирует курсор, полученный от encode_cursor.
+
+    Args:
+        cursor (str): Курсор из параметра запроса
+
+    Returns:
+        Optional[RecipeCursor]: Ключ (views, cooking_time, id)
+        или None, если курсор повреждён
+    """
+    try:
+        raw: bytes = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if (
+        not isinstance(key, list)
+        or len(key) != 3
+        or not all(isinstance(part, int) for part in key)
+    ):
+        return None
+    return key[0], key[1], key[2]
+
+
+def recipes_page_query(limit: int, after: Optional[RecipeCursor] = None) -> Select:
+    """
+    Строит запрос страницы рецептов в порядке популярности.
+
+    Args:
+        limit (int): Максимальное количество рецептов на странице
+        after (Optional[RecipeCursor]): Ключ последнего рецепта
+         предыдущей страницы
+
+    Returns:
+        Select: Запрос, выбирающий колонки RECIPE_SHORT_COLUMNS для
+        limit + 1 рецептов (лишний рецепт показывает, что есть
+        следующая страница)
 
     Notes:
-        - Если передан recipe_id: увеличивает счетчик только для указанного рецепта
-        - Если recipe_id не передан: увеличивает счетчики для всех рецептов
-        - Использует модель Recipe
+        - Порядок (views DESC, cooking_time, id) совпадает с индексом
+          ix_recipes_popularity, поэтому сортировка не выполняется
+        - Условие views <= :views задаёт начало диапазона в индексе,
+          так что стоимость страницы не зависит от её глубины
+        - Выбираются только нужные ответу колонки, без description,
+          и строки не превращаются в объекты ORM
     """
-    if recipe_id:
-        recipe_selection = await session.execute(
-            select(Recipe).filter(Recipe.id == recipe_id)
+    query = (
+        select(*RECIPE_SHORT_COLUMNS)
+        .order_by(desc(Recipe.views), Recipe.cooking_time, Recipe.id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        views, cooking_time, recipe_id = after
+        query = query.filter(
+            Recipe.views <= views,
+            or_(
+                Recipe.views < views,
+                Recipe.cooking_time > cooking_time,
+                and_(Recipe.cooking_time == cooking_time, Recipe.id > recipe_id),
+            ),
         )
-        recipe: Recipe = recipe_selection.scalars().one()
-        recipe.views += 1
-        session.add(recipe)
-    else:
-        recipe_selection = await session.execute(select(Recipe))
-        recipes: Sequence[Recipe] = recipe_selection.scalars().all()
-        for recipe in recipes:
-            recipe.views += 1
-        session.add_all(recipes)
+    return query
+
+
+def dump_json(data: Any) -> bytes:
+    """
+    Кодирует ответ в JSON через orjson.
 
-    await session.commit()
+    Notes:
+        - Применяется к уже проверенным данным из БД вместо валидации
+          через response_model, которая для больших списков дороже запроса
+    """
+    return orjson.dumps(data)
 
 
-async def add_ingredients(current_ingredients: Set[str]) -> None:
+def recipe_page_json(rows: Sequence[Tuple], next_cursor: Optional[str]) -> bytes:
     """
-    Добавляет новые ингредиенты в базу данных.
+    Кодирует страницу списка рецептов (schemas.RecipePage) в JSON.
 
     Args:
-        current_ingredients (Set[str]): Множество названий ингредиентов для добавления
+        rows (Sequence[Tuple]): Рецепты текущей страницы в порядке колонок
+            RECIPE_SHORT_COLUMNS (строки recipes_page_query)
+        next_cursor (Optional[str]): Курсор следующей страницы
+
+    Returns:
+        bytes: Тело ответа
+    """
+    return dump_json(
+        {
+            "items": [
+                {"title": title, "cooking_time": cooking_time, "views": views}
+                for title, cooking_time, views, _ in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+def recipe_detail_json(recipe: Recipe) -> bytes:
+    """
+    Кодирует рецепт с загруженными ингредиентами в JSON (RecipeOutLong).
+    """
+    output = schemas.RecipeOutLong(
+        title=recipe.title,
+        cooking_time=recipe.cooking_time,
+        description=recipe.description,
+        list_of_ingredients=[ingredient.name for ingredient in recipe.ingredients],
+    )
+    return output.model_dump_json().encode()
+
+
+async def increase_view_count(
+    session: AsyncSession, view_counts: Mapping[int, int]
+) -> None:
+    """
+    Увеличивает счетчики просмотров рецептов.
+
+    Args:
+        session (AsyncSession): Сессия, в транзакции которой выполняется
+         обновление
+        view_counts (Mapping[int, int]): Количество новых просмотров
+         по ID рецепта
 
     Returns:
         None
 
     Notes:
-        - Проверяет существующие ингредиенты в базе
-        - Добавляет только новые ингредиенты
-        - Использует модель Ingredient
+        - Выполняет один пакетный UPDATE recipes SET views = views + :n
+          (executemany), без чтения строк рецептов
+        - Не фиксирует транзакцию: это делает вызывающий код
     """
-    ingredients_in_db = await session.execute(
-        select(Ingredient).filter(Ingredient.name.in_(current_ingredients))
+    if not view_counts:
+        return
+    recipes = Recipe.__table__
+    await session.execute(
+        update(recipes)
+        .where(recipes.c.id == bindparam("recipe_id"))
+        .values(views=recipes.c.views + bindparam("n")),
+        [{"recipe_id": recipe_id, "n": n} for recipe_id, n in view_counts.items()],
     )
-    ingredients_in_db = [
-        ingredient.name for ingredient in ingredients_in_db.scalars().all()
-    ]
-    new_ingredients_set: Set[str] = (
-        current_ingredients - set(ingredients_in_db)
-        if ingredients_in_db
-        else current_ingredients
-    )
-    new_ingredients_list: List[Ingredient] = [
-        Ingredient(name=new_ingredient) for new_ingredient in new_ingredients_set
-    ]
-    session.add_all(new_ingredients_list)
+    VIEW_COUNT_UPDATES.inc(len(view_counts))
+    VIEW_COUNT_INCREMENTS.inc(sum(view_counts.values()))
+
+
+async def add_ingredients(
+    session: AsyncSession, current_ingredients: Iterable[str]
+) -> Dict[str, int]:
+    """
+    Добавляет новые ингредиенты в базу данных и возвращает ID всех переданных.
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса
+        current_ingredients (Iterable[str]): Названия ингредиентов (при разном
+         написании нового ингредиента сохраняется первое)
+
+    Returns:
+        Dict[str, int]: ID ингредиента по названию, под которым он хранится
+        в БД (названия, отличающиеся регистром и пробелами, - один
+        ингредиент)
+
+    Notes:
+        - Известные ингредиенты берутся из словаря ingredient_dictionary
+          без запросов к БД, новые вставляются одним
+          INSERT ... ON CONFLICT (name) DO NOTHING RETURNING id, name
+        - Не фиксирует транзакцию: это делает вызывающий код
+    """
+    return await ingredient_dictionary.resolve(session, current_ingredients)
 
 
 async def add_recipe_ingredients(
-    ingredients_ids: Iterable[int], recipe_id: int
+    session: AsyncSession, ingredients_ids: Iterable[int], recipe_id: int
 ) -> None:
     """
     Связывает ингредиенты с рецептом через промежуточную таблицу.
 
     Args:
+        session (AsyncSession): Сессия текущего запроса
         ingredients_ids (Iterable[int]): Коллекция ID ингредиентов
         recipe_id (int): ID рецепта, с которым нужно связать ингредиенты
 
@@ -85,44 +234,229 @@ async def add_recipe_ingredients(
         None
 
     Notes:
-        - Создает связи в таблице RecipeIngredient
-        - Использует модель RecipeIngredient
+        - Вставляет все связи в RecipeIngredient одним пакетным INSERT
+        - Не фиксирует транзакцию: это делает вызывающий код
     """
-    recipe_ingredients_list: List[RecipeIngredient] = [
-        RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id)
+    rows: List[Dict[str, int]] = [
+        {"recipe_id": recipe_id, "ingredient_id": ingredient_id}
         for ingredient_id in ingredients_ids
     ]
+    if rows:
+        await session.execute(insert(RecipeIngredient), rows)
+
+
+async def get_recipe_with_ingredients(
+    session: AsyncSession, recipe_id: int
+) -> Optional[Recipe]:
+    """
+    Загружает рецепт вместе с его ингредиентами одним запросом.
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса
+        recipe_id (int): ID рецепта
+
+    Returns:
+        Optional[Recipe]: Рецепт с загруженными recipe_ingredient и
+        ingredients или None, если рецепта нет
+
+    Notes:
+        - recipe_ingredient и Ingredient подгружаются через LEFT OUTER JOIN
+          (joinedload), поэтому обращение к Recipe.ingredients не выполняет
+          дополнительных запросов
+    """
+    res = await session.execute(
+        recipes_with_ingredients_query().filter(Recipe.id == recipe_id)
+    )
+    return res.unique().scalars().one_or_none()
+
+
+async def get_recipes_with_ingredients(
+    session: AsyncSession, recipes_ids: Iterable[int]
+) -> Dict[int, Recipe]:
+    """
+    Загружает несколько рецептов вместе с ингредиентами одним запросом.
+
+    Args:
+        session (AsyncSession): Сессия текущего запроса
+        recipes_ids (Iterable[int]): ID рецептов
+
+    Returns:
+        Dict[int, Recipe]: Найденные рецепты по ID (несуществующих ID
+        в словаре нет)
+    """
+    res = await session.execute(
+        recipes_with_ingredients_query().filter(Recipe.id.in_(list(recipes_ids)))
+    )
+    return {recipe.id: recipe for recipe in res.unique().scalars()}
 
-    session.add_all(recipe_ingredients_list)
 
+def recipes_with_ingredients_query() -> Select:
+    """
+    Строит запрос рецептов с ингредиентами, подгружаемыми через JOIN.
+    """
+    return select(Recipe).options(
+        joinedload(Recipe.recipe_ingredient).joinedload(RecipeIngredient.ingredients)
+    )
 
-async def get_ingredients_list(recipe_id: int) -> List[str]:
+
+async def import_recipes(
+    session: AsyncSession, recipes: Sequence[schemas.RecipeIn]
+) -> Tuple[List[Optional[int]], Dict[int, Dict[str, int]]]:
     """
-    Возвращает список названий ингредиентов для указанного рецепта.
+    Пакетно добавляет рецепты вместе с ингредиентами.
 
     Args:
-        recipe_id (int): ID рецепта, для которого нужно получить ингредиенты
+        session (AsyncSession): Сессия текущего запроса
+        recipes (Sequence[schemas.RecipeIn]): Рецепты пакета
+         с уникальными названиями
 
     Returns:
-        List[str]: Список названий ингредиентов
+        Tuple[List[Optional[int]], Dict[int, Dict[str, int]]]: ID созданного
+        рецепта для каждого элемента пакета (None, если рецепт с таким
+        названием уже существует) и ID ингредиентов каждого созданного
+        рецепта по названиям, под которыми они хранятся в БД
 
     Notes:
-        - Получает связи из таблицы RecipeIngredient
-        - Возвращает названия ингредиентов из таблицы Ingredient
-        - Использует модели RecipeIngredient и Ingredient
+        - Рецепты вставляются одним INSERT ... ON CONFLICT (title) DO NOTHING
+          RETURNING id, title
+        - Ингредиенты созданных рецептов объединяются (без повторов)
+          и добавляются одним вызовом add_ingredients
+        - Связи вставляются одним пакетным INSERT
+        - Не фиксирует транзакцию: это делает вызывающий код
     """
-    ingredients_ids_res = await session.execute(
-        select(RecipeIngredient).filter(RecipeIngredient.recipe_id == recipe_id)
+    if not recipes:
+        return [], {}
+    inserted = await session.execute(
+        sqlite_insert(Recipe)
+        .values(
+            [recipe.model_dump(exclude={"list_of_ingredients"}) for recipe in recipes]
+        )
+        .on_conflict_do_nothing(index_elements=[Recipe.title])
+        .returning(Recipe.id, Recipe.title)
     )
-    ingredients_ids: List[int] = [
-        ingredient.ingredient_id for ingredient in ingredients_ids_res.scalars().all()
+    recipes_ids: Dict[str, int] = {title: id_ for id_, title in inserted}
+    created: List[schemas.RecipeIn] = [
+        recipe for recipe in recipes if recipe.title in recipes_ids
     ]
 
-    ingredients_res = await session.execute(
-        select(Ingredient).filter(Ingredient.id.in_(ingredients_ids))
+    ingredients_ids: Dict[str, int] = await add_ingredients(
+        session,
+        [name for recipe in created for name in recipe.list_of_ingredients],
     )
-    ingredients: List[str] = [
-        ingredient.name for ingredient in ingredients_res.scalars().all()
+    names_by_key: Dict[str, str] = {
+        ingredient_key(name): name for name in ingredients_ids
+    }
+    recipes_ingredients: Dict[int, Dict[str, int]] = {}
+    for recipe in created:
+        names = {
+            names_by_key[key]
+            for key in map(ingredient_key, recipe.list_of_ingredients)
+            if key
+        }
+        recipes_ingredients[recipes_ids[recipe.title]] = {
+            name: ingredients_ids[name] for name in names
+        }
+    rows: List[Dict[str, int]] = [
+        {"recipe_id": recipe_id, "ingredient_id": ingredient_id}
+        for recipe_id, recipe_ingredients in recipes_ingredients.items()
+        for ingredient_id in recipe_ingredients.values()
     ]
+    if rows:
+        await session.execute(insert(RecipeIngredient), rows)
+    return [recipes_ids.get(recipe.title) for recipe in recipes], recipes_ingredients
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[Optional[bytes]]:
+    """
+    Разбивает поток байтов на строки (NDJSON) с ограничением их длины.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Поток тела запроса
+        max_line_bytes (int): Максимальная длина строки в байтах
+
+    Yields:
+        Optional[bytes]: Очередная строка без перевода строки
+        или None вместо строки длиннее max_line_bytes
+
+    Notes:
+        - В памяти хранится не больше одной неполной строки, поэтому
+          потребление памяти не зависит от размера тела запроса
+    """
+    buffer = b""
+    oversized = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield None if oversized or len(line) > max_line_bytes else line
+            oversized = False
+        if len(buffer) > max_line_bytes:
+            buffer = b""
+            oversized = True
+    if oversized:
+        yield None
+    elif buffer:
+        yield buffer
+
+
+async def stream_recipes(
+    session: AsyncSession, batch_size: int
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Потоково читает все рецепты вместе с их ингредиентами.
+
+    Args:
+        session (AsyncSession): Сессия, которая живёт всё время чтения
+        batch_size (int): Количество строк результата, забираемых
+         из курсора за раз (yield_per)
+
+    Yields:
+        List[Dict[str, Any]]: Очередная порция рецептов с ключами id, title,
+        description, cooking_time, views и list_of_ingredients
 
-    return ingredients
+    Notes:
+        - Один SELECT с LEFT OUTER JOIN recipe_ingredient и ingredients,
+          отсортированный по (recipe.id, ingredient_id), читается
+          серверным курсором (session.stream), поэтому в памяти находится
+          не больше одной порции
+        - Строки одного рецепта идут подряд и собираются в одну запись;
+          незаконченный рецепт переносится в следующую порцию
+    """
+    query = (
+        select(
+            Recipe.id,
+            Recipe.title,
+            Recipe.description,
+            Recipe.cooking_time,
+            Recipe.views,
+            Ingredient.name,
+        )
+        .outerjoin(RecipeIngredient, RecipeIngredient.recipe_id == Recipe.id)
+        .outerjoin(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .order_by(Recipe.id, RecipeIngredient.ingredient_id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(query)
+    current: Optional[Dict[str, Any]] = None
+    async for partition in result.partitions():
+        records: List[Dict[str, Any]] = []
+        for id_, title, description, cooking_time, views, name in partition:
+            if current is None or current["id"] != id_:
+                if current is not None:
+                    records.append(current)
+                current = {
+                    "id": id_,
+                    "title": title,
+                    "description": description,
+                    "cooking_time": cooking_time,
+                    "views": views,
+                    "list_of_ingredients": [],
+                }
+            if name is not None:
+                current["list_of_ingredients"].append(name)
+        if records:
+            yield records
+    if current is not None:
+        yield [current]
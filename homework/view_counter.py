@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from change_feed import record_views_change
+from config import get_float, get_int
+from database import async_session
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils import increase_view_count
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Счётчик просмотров с отложенной записью (write-behind).
+
+    Просмотры копятся в памяти и сбрасываются в БД пакетом: по таймеру
+    (flush_interval) или раньше, если накопилось flush_threshold просмотров.
+    Пакет записывается одним UPDATE ... SET views = views + :n в одной
+    транзакции, поэтому чтение рецепта больше не платит за запись и commit.
+
+    Атрибуты:
+        flush_interval (float): Период сброса в секундах
+        flush_threshold (int): Количество просмотров, при котором сброс
+         выполняется досрочно
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        flush_interval: float,
+        flush_threshold: int,
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._session_factory = session_factory
+        self._pending: Dict[int, int] = {}
+        self._pending_total = 0
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_listeners: List[Callable[[], None]] = []
+        self._view_listeners: List[Callable[[int, int], None]] = []
+
+    def add_flush_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Регистрирует функцию, вызываемую после каждой записи просмотров в БД.
+
+        Args:
+            listener (Callable[[], None]): Например, сброс закешированных
+             страниц списка, в которых views уже устарели
+        """
+        self._flush_listeners.append(listener)
+
+    def add_view_listener(self, listener: Callable[[int, int], None]) -> None:
+        """
+        Регистрирует функцию, вызываемую при каждом учёте просмотров.
+
+        Args:
+            listener (Callable[[int, int], None]): Получает ID рецепта
+             и число просмотров, например, для обновления таблицы
+             популярности в памяти
+        """
+        self._view_listeners.append(listener)
+
+    def add(self, recipe_id: int, n: int = 1) -> None:
+        """
+        Учитывает n просмотров рецепта.
+
+        Args:
+            recipe_id (int): ID рецепта
+            n (int): Количество просмотров
+        """
+        self._pending[recipe_id] = self._pending.get(recipe_id, 0) + n
+        self._pending_total += n
+        for listener in self._view_listeners:
+            listener(recipe_id, n)
+        if self._pending_total >= self.flush_threshold and self._wakeup:
+            self._wakeup.set()
+
+    @property
+    def flush_lock(self) -> asyncio.Lock:
+        """
+        Блокировка сброса: пока она захвачена, накопленные просмотры
+        не уходят из очереди в БД, поэтому БД и pending() согласованы.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
+    def pending(self, recipe_id: int) -> int:
+        """
+        Возвращает количество ещё не записанных просмотров рецепта.
+        """
+        return self._pending.get(recipe_id, 0)
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные просмотры в БД.
+
+        Returns:
+            int: Количество записанных просмотров
+
+        Notes:
+            - При ошибке БД пакет возвращается в очередь и будет записан
+              при следующем сбросе
+        """
+        async with self.flush_lock:
+            batch, self._pending = self._pending, {}
+            written, self._pending_total = self._pending_total, 0
+            if not batch:
+                return 0
+            try:
+                async with self._session_factory() as session:
+                    async with session.begin():
+                        await increase_view_count(session, batch)
+                        await record_views_change(session)
+            except BaseException:
+                for recipe_id, n in batch.items():
+                    self._pending[recipe_id] = self._pending.get(recipe_id, 0) + n
+                self._pending_total += written
+                raise
+            for listener in self._flush_listeners:
+                listener()
+            return written
+
+    async def start(self) -> None:
+        """
+        Запускает фоновую задачу периодического сброса.
+        """
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновую задачу и записывает оставшиеся просмотры.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._wakeup = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except SQLAlchemyError:
+                logger.exception("Failed to flush view counts")
+
+
+view_counter = ViewCounter(
+    async_session,
+    flush_interval=get_float("views", "flush_interval", 1.0),
+    flush_threshold=get_int("views", "flush_threshold", 1000),
+)